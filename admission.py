@@ -0,0 +1,229 @@
+# Admission control for model calls
+#   AdmissionLimiter - at most max_concurrent upstream calls at once. Extra
+#                      callers wait in a FIFO queue of at most max_queue; when
+#                      that's full, or they've waited max_wait seconds, they get
+#                      Overloaded straight away instead of piling onto Gemini
+#                      and all failing on quota together.
+#   TokenBuckets     - per-session rate limit (requests per minute + burst).
+# Both work from threads (Flask) and from the ASGI event loop - a waiting
+# coroutine is woken through its loop, so waiting never takes a thread.
+
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+
+
+class Overloaded(Exception):
+    # Raised instead of making a model call - becomes a 429 with Retry-After
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Server busy ({reason}), retry in {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ('wake', 'granted', 'queued_at')
+
+    def __init__(self, wake):
+        self.wake = wake
+        self.granted = False
+        self.queued_at = time.perf_counter()
+
+
+class AdmissionLimiter:
+
+    def __init__(self, max_concurrent=8, max_queue=32, max_wait=10.0, on_wait=None):
+        # max_concurrent <= 0 means no limit at all
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        # Called with the seconds each admitted caller spent queued
+        self.on_wait = on_wait
+        self.lock = threading.Lock()
+        self.in_use = 0
+        self.waiters = deque()
+        # Moving average of how long a slot is held, for Retry-After
+        self.avg_hold = 1.0
+        self.stats = {'admitted': 0, 'queued': 0, 'rejected_queue_full': 0, 'rejected_timeout': 0,
+                      'max_queue_depth': 0}
+
+    @property
+    def enabled(self):
+        return self.max_concurrent > 0
+
+    def retry_after(self):
+        # Caller holds the lock. Roughly how long until the queue has drained
+        waves = (len(self.waiters) + 1) / self.max_concurrent
+        return max(1, math.ceil(waves * self.avg_hold))
+
+    def _try_admit(self, waiter):
+        # Caller holds the lock. True if admitted now, else queues the waiter
+        if self.in_use < self.max_concurrent and not self.waiters:
+            self.in_use += 1
+            self.stats['admitted'] += 1
+            return True
+        if len(self.waiters) >= self.max_queue:
+            self.stats['rejected_queue_full'] += 1
+            raise Overloaded('queue full', self.retry_after())
+        self.waiters.append(waiter)
+        self.stats['queued'] += 1
+        self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], len(self.waiters))
+        return False
+
+    def _give_up(self, waiter):
+        # Waiting timed out or was cancelled. Returns True if the slot was
+        # handed over at the last moment (the caller then owns it)
+        with self.lock:
+            if waiter.granted:
+                return True
+            self.waiters.remove(waiter)
+            self.stats['rejected_timeout'] += 1
+            retry_after = self.retry_after()
+        raise Overloaded('timed out waiting', retry_after)
+
+    def _admitted(self, waiter):
+        if self.on_wait:
+            self.on_wait(time.perf_counter() - waiter.queued_at if waiter else 0.0)
+
+    def acquire(self):
+        if not self.enabled:
+            return
+        event = threading.Event()
+        waiter = _Waiter(event.set)
+        with self.lock:
+            if self._try_admit(waiter):
+                self._admitted(None)
+                return
+        if not event.wait(self.max_wait):
+            self._give_up(waiter)
+        self._admitted(waiter)
+
+    async def acquire_async(self):
+        if not self.enabled:
+            return
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(True))
+
+        waiter = _Waiter(wake)
+        with self.lock:
+            if self._try_admit(waiter):
+                self._admitted(None)
+                return
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except asyncio.TimeoutError:
+            self._give_up(waiter)
+        except asyncio.CancelledError:
+            # Client went away - don't leak a slot we were just handed
+            try:
+                if self._give_up(waiter):
+                    self.release(0.0)
+            except Overloaded:
+                pass
+            raise
+        self._admitted(waiter)
+
+    def release(self, held_seconds=None):
+        if not self.enabled:
+            return
+        with self.lock:
+            if held_seconds is not None:
+                self.avg_hold = 0.9 * self.avg_hold + 0.1 * held_seconds
+            if self.waiters:
+                # Hand the slot straight to the next in line
+                waiter = self.waiters.popleft()
+                waiter.granted = True
+                self.stats['admitted'] += 1
+                waiter.wake()
+            else:
+                self.in_use -= 1
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    @asynccontextmanager
+    async def slot_async(self):
+        await self.acquire_async()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def check(self):
+        # Fail fast without queueing - for streams, which can't send a 429
+        # once they've started
+        if not self.enabled:
+            return
+        with self.lock:
+            if self.in_use >= self.max_concurrent and len(self.waiters) >= self.max_queue:
+                self.stats['rejected_queue_full'] += 1
+                raise Overloaded('queue full', self.retry_after())
+
+    def snapshot(self):
+        with self.lock:
+            return dict(
+                self.stats,
+                enabled=self.enabled,
+                max_concurrent=self.max_concurrent,
+                max_queue=self.max_queue,
+                max_wait_seconds=self.max_wait,
+                in_use=self.in_use,
+                queue_depth=len(self.waiters),
+                avg_hold_seconds=round(self.avg_hold, 3)
+            )
+
+
+class TokenBuckets:
+    # One bucket per key (session), refilled at rate_per_minute up to burst.
+    # Only the most recent max_keys buckets are kept
+
+    def __init__(self, rate_per_minute=20, burst=10, max_keys=10000):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        # key -> (tokens, last refill time), least recently used first
+        self.buckets = OrderedDict()
+        self.stats = {'allowed': 0, 'limited': 0}
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def take(self, key):
+        # Returns 0 if allowed, otherwise seconds until a token is available
+        if not self.enabled:
+            return 0
+        now = time.monotonic()
+        with self.lock:
+            tokens, last = self.buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+                self.stats['allowed'] += 1
+            else:
+                wait = max(1, math.ceil((1 - tokens) / self.rate))
+                self.stats['limited'] += 1
+            self.buckets[key] = (tokens, now)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return wait
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats, enabled=self.enabled, rate_per_minute=round(self.rate * 60, 2),
+                        burst=self.burst, tracked_keys=len(self.buckets))
@@ -0,0 +1,139 @@
+# Structured fields from a LegalEase answer
+# The analysis prompt asks for eight fixed sections (CATEGORY TAG, SIMPLE
+# EXPLANATION, KEY POINTS...). parse_analysis() splits an answer on those
+# headings once, when it arrives, and pulls out the parts worth querying -
+# risk level, obligations, deadlines, citations... The result is stored with
+# the message, so nobody has to run regexes over the text again.
+# Answers that don't use the format (a quick follow-up) give None.
+
+import re
+
+SECTIONS = {
+    'CATEGORY TAG': 'category',
+    'SIMPLE EXPLANATION': 'summary',
+    'KEY POINTS': 'key_points',
+    'RISK ASSESSMENT': 'risk',
+    'LEGAL TERMINOLOGY': 'terminology',
+    'CITATION FORMAT': 'citations',
+    'RECOMMENDED NEXT STEPS': 'next_steps',
+    'RELATED RESOURCES': 'resources',
+}
+# "3. **KEY POINTS**:", "**KEY POINTS:**", "## Key Points" ...
+HEADING = re.compile(
+    r'^[ \t]*(?:#{1,4}[ \t]*)?(?:\d+[.)][ \t]*)?(?:\*\*)?(' + '|'.join(SECTIONS) + r')(?:\*\*)?[ \t]*:?(?:\*\*)?[ \t]*',
+    re.IGNORECASE | re.MULTILINE
+)
+ITEM = re.compile(r'^[ \t]*(?:[-*•]|\d+[.)])[ \t]+(.*)$')
+LABELLED = re.compile(r'^\*\*([^*]+?)\*\*[ \t]*:?[ \t]*(.*)$|^([^:*]{2,40}):[ \t]+(.*)$')
+KEY_POINT_LABELS = {'obligations': 'obligations', 'rights': 'rights', 'deadlines': 'deadlines', 'risks': 'risks'}
+RISK_LEVEL = re.compile(r'\b(low|medium|moderate|high)\b', re.IGNORECASE)
+RISK_WORD = re.compile(r'^[\s*]*(?:risk\b)?[\s*:.\-–—]*', re.IGNORECASE)
+RISK_SCORES = {'low': 1, 'medium': 2, 'high': 3}
+NOTHING = re.compile(r'^(?:n/?a|none|not applicable|no (?:specific )?\w+ (?:mentioned|referenced|cited))\.?$', re.IGNORECASE)
+
+
+def clean(text):
+    # Drop markdown emphasis and stray punctuation around an item
+    return re.sub(r'\*\*?|__', '', text).strip(' \t-:;')
+
+
+def items(body):
+    # Bullet / numbered items, or the non-empty lines if there are none
+    lines = [line for line in body.splitlines() if line.strip()]
+    found = [ITEM.match(line) for line in lines]
+    if any(found):
+        result = [clean(match.group(1)) for match in found if match]
+    else:
+        result = [clean(line) for line in lines]
+    return [item for item in result if item and not NOTHING.match(item)]
+
+
+def split_sections(text):
+    # {'category': '...', 'summary': '...', ...} for the headings present
+    sections = {}
+    matches = list(HEADING.finditer(text))
+    for index, match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(text)
+        name = SECTIONS[match.group(1).upper()]
+        sections.setdefault(name, text[match.end():end].strip())
+    return sections
+
+
+def parse_key_points(body):
+    # Labelled groups - "**Obligations**: ..." followed by its sub-bullets
+    points = {label: [] for label in KEY_POINT_LABELS.values()}
+    current = None
+    for line in body.splitlines():
+        item = ITEM.match(line)
+        text = (item.group(1) if item else line).strip()
+        if not text:
+            continue
+        labelled = LABELLED.match(text)
+        label = None
+        if labelled:
+            label = KEY_POINT_LABELS.get(clean(labelled.group(1) or labelled.group(3)).lower())
+        if label:
+            current = label
+            rest = clean(labelled.group(2) if labelled.group(1) else labelled.group(4))
+            if rest and not NOTHING.match(rest):
+                points[label].append(rest)
+        elif current and clean(text) and not NOTHING.match(clean(text)):
+            points[current].append(clean(text))
+    return points
+
+
+def parse_terminology(body):
+    terms = []
+    for item in items(body):
+        term, separator, definition = item.partition(':')
+        if separator and definition.strip():
+            terms.append({'term': term.strip(), 'definition': definition.strip()})
+    return terms
+
+
+def parse_risk(body):
+    match = RISK_LEVEL.search(body)
+    if not match:
+        return None, None
+    level = match.group(1).lower()
+    level = 'medium' if level == 'moderate' else level
+    # Whatever follows "Medium (risk) -" is the justification
+    reason = clean(RISK_WORD.sub('', body[match.end():], count=1))
+    return level, reason or None
+
+
+def parse_analysis(text, categories=None):
+    # categories: LEGAL_CATEGORIES, to map the category name to its key
+    sections = split_sections(text or '')
+    if len(sections) < 2:
+        return None
+
+    category = None
+    category_key = None
+    if sections.get('category'):
+        category = clean(sections['category'].splitlines()[0]).strip('[]') or None
+        lowered = (category or '').lower()
+        for key, info in (categories or {}).items():
+            if info['name'].lower() in lowered or key.replace('_', ' ') in lowered:
+                category_key = key
+                break
+
+    risk_level, risk_reason = parse_risk(sections.get('risk', ''))
+    points = parse_key_points(sections.get('key_points', ''))
+    return {
+        'category': category,
+        'category_key': category_key,
+        'risk_level': risk_level,
+        'risk_score': RISK_SCORES.get(risk_level),
+        'risk_reason': risk_reason,
+        'summary': sections.get('summary') or None,
+        'obligations': points['obligations'],
+        'rights': points['rights'],
+        'deadlines': points['deadlines'],
+        'risks': points['risks'],
+        'terminology': parse_terminology(sections.get('terminology', '')),
+        'citations': items(sections.get('citations', '')),
+        'next_steps': items(sections.get('next_steps', '')),
+        'resources': items(sections.get('resources', '')),
+        'sections': sorted(sections),
+    }
@@ -357,26 +357,12 @@ async function sendMessage(message, isDocument) {
     addMessageToChat(message, 'user', isDocument);
 
     try {
-        const response = await fetch('/api/chat', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                message: message,
-                is_document: isDocument
-            })
-        });
-
-        const data = await response.json();
-
-        if (!response.ok) {
-            throw new Error(data.error || 'Failed to get response');
+        // Older browsers can't read a response body as a stream
+        if (window.ReadableStream && window.TextDecoder) {
+            await streamMessage(message, isDocument);
+        } else {
+            await fetchMessage(message, isDocument);
         }
-
-        // Show the response
-        addMessageToChat(data.message, 'assistant');
-
     } catch (error) {
         console.error('Error:', error);
         addMessageToChat(
@@ -389,8 +375,132 @@ async function sendMessage(message, isDocument) {
     }
 }
 
+// Plain request/response version of the chat call
+async function fetchMessage(message, isDocument) {
+    const response = await fetch('/api/chat', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            message: message,
+            is_document: isDocument
+        })
+    });
+
+    const data = await response.json();
+
+    if (!response.ok) {
+        throw new Error(data.error || 'Failed to get response');
+    }
+
+    // Show the response
+    addMessageToChat(data.message, 'assistant', false, data.glossary_terms, data.structured);
+}
+
+// Streaming version - renders the answer chunk by chunk as the server sends it
+async function streamMessage(message, isDocument) {
+    const response = await fetch('/api/chat/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            message: message,
+            is_document: isDocument
+        })
+    });
+
+    // Errors before the stream starts come back as normal JSON
+    if (!response.ok || !response.body) {
+        const data = await response.json().catch(() => ({}));
+        throw new Error(data.error || 'Failed to get response');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let answer = '';
+    let contentDiv = null;
+    let renderPending = false;
+    // Glossary term positions and the parsed sections arrive with the 'done' event
+    let glossaryTerms = null;
+    let structured = null;
+
+    // Re-render at most once per frame, formatResponse isn't free on long answers
+    const render = () => {
+        renderPending = false;
+        contentDiv.innerHTML = formatResponse(answer, glossaryTerms, structured);
+        chatMessages.scrollTop = chatMessages.scrollHeight;
+    };
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            const event = parseSseEvent(rawEvent);
+            if (!event) continue;
+
+            if (event.type === 'chunk') {
+                answer += event.data.text;
+                if (!contentDiv) {
+                    // First chunk - swap the spinner for the real message
+                    loadingIndicator.classList.add('hidden');
+                    contentDiv = addMessageToChat('', 'assistant');
+                }
+                if (!renderPending) {
+                    renderPending = true;
+                    requestAnimationFrame(render);
+                }
+            } else if (event.type === 'status') {
+                // e.g. long documents being analysed in sections first
+                const statusText = loadingIndicator.querySelector('p');
+                if (statusText) statusText.textContent = event.data.status;
+            } else if (event.type === 'done') {
+                glossaryTerms = event.data.glossary_terms;
+                structured = event.data.structured;
+                console.log('Response streamed, time to first byte (ms):', event.data.ttfb_ms);
+            } else if (event.type === 'error') {
+                throw new Error(event.data.error || 'Failed to get response');
+            }
+        }
+    }
+
+    if (contentDiv) {
+        render();
+    } else {
+        throw new Error('Empty response from server');
+    }
+}
+
+// Parse one "event: ...\ndata: ..." block
+function parseSseEvent(rawEvent) {
+    let type = 'message';
+    let data = '';
+    rawEvent.split('\n').forEach(line => {
+        if (line.startsWith('event:')) {
+            type = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            data += line.slice(5).trim();
+        }
+    });
+    if (!data) return null;
+    try {
+        return { type: type, data: JSON.parse(data) };
+    } catch (error) {
+        console.error('Bad event from server:', rawEvent);
+        return null;
+    }
+}
+
 // Add a message to the chat
-function addMessageToChat(content, role, isDocument = false) {
+function addMessageToChat(content, role, isDocument = false, glossaryTerms = null, structured = null) {
     const messageDiv = document.createElement('div');
     messageDiv.className = `message ${role}`;
 
@@ -405,7 +515,7 @@ function addMessageToChat(content, role, isDocument = false) {
         }
     } else {
         // Format the assistant's response
-        contentDiv.innerHTML = formatResponse(content);
+        contentDiv.innerHTML = formatResponse(content, glossaryTerms, structured);
     }
 
     // Add timestamp
@@ -419,15 +529,19 @@ function addMessageToChat(content, role, isDocument = false) {
 
     // Auto scroll to bottom
     chatMessages.scrollTop = chatMessages.scrollHeight;
+
+    return contentDiv;
 }
 
 // Format the response text - convert markdown to HTML
-function formatResponse(text) {
+function formatResponse(text, glossaryTerms = null, structured = null) {
+    const terms = glossaryTerms || [];
+
     // Escape HTML to prevent XSS
-    let formatted = escapeHtml(text);
+    let formatted = escapeHtml(markGlossaryTerms(text, terms));
 
     // Add category badges if found
-    formatted = extractAndFormatCategories(formatted);
+    formatted = extractAndFormatCategories(formatted, structured);
 
     // Bold text **text**
     formatted = formatted.replace(/\*\*(.+?)\*\*/g, '<strong>$1</strong>');
@@ -456,11 +570,36 @@ function formatResponse(text) {
         '<span class="risk-badge risk-$1">$1 Risk</span>'
     );
 
-    return formatted;
+    // Glossary terms - clickable, definition on hover
+    formatted = formatted.replace(/\u0001(\d+)\u0002([^\u0001\u0003]*)\u0003/g, (match, index, inner) => {
+        const term = terms[index];
+        const entry = window.glossaryData && window.glossaryData[term.id];
+        const title = entry ? ` title="${escapeHtml(entry.definition).replace(/"/g, '&quot;')}"` : '';
+        return `<span class="glossary-link" data-term-id="${encodeURIComponent(term.id)}"${title}>${inner}</span>`;
+    });
+
+    // Any markers the markdown steps split up
+    return formatted.replace(/\u0001\d+\u0002|\u0003/g, '');
 }
 
-// Find and format category badges in the text
-function extractAndFormatCategories(text) {
+// Wrap each glossary term the server found in marker characters, so they
+// survive escaping and the markdown steps and can be turned into links last
+function markGlossaryTerms(text, terms) {
+    for (let i = terms.length - 1; i >= 0; i--) {
+        const term = terms[i];
+        // Offsets only fit the text they were computed for
+        if (text.slice(term.start, term.end) !== term.text) continue;
+        text = text.slice(0, term.start) + `\u0001${i}\u0002` + term.text + '\u0003' + text.slice(term.end);
+    }
+    return text;
+}
+
+// Find and format category badges in the text. The server sends the
+// parsed category with finished answers - only guess from the text while
+// an answer is still streaming in. The parsed risk level gets a badge next
+// to it; the answer text itself is always shown as written, since the
+// parser doesn't capture everything in it
+function extractAndFormatCategories(text, structured = null) {
     const categoryMap = {
         'contract': { name: 'Contract Law', class: 'category-contract', icon: '' },
         'contract law': { name: 'Contract Law', class: 'category-contract', icon: '' },
@@ -484,7 +623,13 @@ function extractAndFormatCategories(text) {
     
     // Check for category tag section
     const categoryTagMatch = text.match(/CATEGORY\s+TAG[:\s]+(.+?)(?:\n|$)/i);
-    if (categoryTagMatch) {
+    const parsed = structured && structured.category_key
+        ? categoryMap[structured.category_key.replace('_', ' ')]
+        : null;
+    if (parsed) {
+        categoryBadges = `<span class="legal-category-badge ${parsed.class}">${parsed.name}</span>`;
+        text = text.replace(/CATEGORY\s+TAG[:\s]+.+?(?:\n|$)/i, '');
+    } else if (categoryTagMatch) {
         const categoryText = categoryTagMatch[1].trim().toLowerCase();
         for (const [key, value] of Object.entries(categoryMap)) {
             if (categoryText.includes(key)) {
@@ -504,6 +649,12 @@ function extractAndFormatCategories(text) {
         }
     }
 
+    // "Medium&nbsp;Risk" so the risk badge regex in formatResponse leaves it alone
+    if (structured && structured.risk_level) {
+        const level = structured.risk_level;
+        categoryBadges += `<span class="risk-badge risk-${level}">${level.charAt(0).toUpperCase() + level.slice(1)}&nbsp;Risk</span>`;
+    }
+
     // Prepend category badges if found
     if (categoryBadges) {
         text = categoryBadges + '<br><br>' + text;
@@ -644,6 +795,9 @@ function handleClearConversation() {
 
 // Show or hide the loading spinner
 function setLoading(show) {
+    const statusText = loadingIndicator.querySelector('p');
+    if (statusText) statusText.textContent = 'Analyzing with LegalEase...';
+
     if (show) {
         loadingIndicator.classList.remove('hidden');
         sendBtn.disabled = true;
@@ -699,24 +853,43 @@ function handleFileSelect(e) {
     }
 }
 
-function handleFile(file) {
+async function handleFile(file) {
     if (!disclaimerAccepted) {
         alert('Please accept the disclaimer first.');
         return;
     }
     
-    if (!file.type.match(/text.*/) && !file.name.match(/\.(txt|doc|docx|pdf)$/i)) {
-        alert('Please upload a text file, Word document, or PDF.');
+    if (!file.type.match(/text.*/) && !file.name.match(/\.(txt|docx|pdf)$/i)) {
+        alert('Please upload a text file, Word document (.docx), or PDF.');
         return;
     }
 
-    const reader = new FileReader();
-    reader.onload = (e) => {
-        const content = e.target.result;
-        documentPaste.value = content;
+    // The server pulls the text out (PDF and Word files can't be read as text here)
+    const formData = new FormData();
+    formData.append('file', file);
+    uploadArea.classList.add('uploading');
+    try {
+        const response = await fetch('/api/upload', {
+            method: 'POST',
+            body: formData
+        });
+        const data = await response.json();
+
+        if (!response.ok) {
+            throw new Error(data.error || 'Failed to read file');
+        }
+
+        documentPaste.value = data.text;
         switchTab('document');
-    };
-    reader.readAsText(file);
+        const size = data.pages ? `${data.pages} pages` : `${data.chars.toLocaleString()} characters`;
+        showToast(`Loaded ${file.name} (${size})`, 'success');
+    } catch (error) {
+        console.error('Error uploading file:', error);
+        showToast(error.message, 'error');
+    } finally {
+        uploadArea.classList.remove('uploading');
+        fileInput.value = '';
+    }
 }
 
 // Close disclaimer - not actually used since it's mandatory
@@ -822,6 +995,11 @@ async function loadGlossary() {
                     return term.term.toLowerCase().includes(searchTerm) ||
                            term.definition.toLowerCase().includes(searchTerm);
                 });
+                if (filtered.length === 0 && searchTerm.trim()) {
+                    // Nothing contains it - ask the server, which allows typos
+                    searchGlossary(searchTerm);
+                    return;
+                }
                 renderGlossary(Object.fromEntries(filtered));
             });
         }
@@ -830,6 +1008,20 @@ async function loadGlossary() {
     }
 }
 
+// Typo-tolerant search on the server (/api/glossary/search)
+async function searchGlossary(query) {
+    try {
+        const response = await fetch(`/api/glossary/search?q=${encodeURIComponent(query)}`);
+        const data = await response.json();
+        // Skip stale answers if the user has typed more since
+        const glossarySearch = document.getElementById('glossarySearch');
+        if (glossarySearch && glossarySearch.value.toLowerCase() !== query) return;
+        renderGlossary(Object.fromEntries((data.results || []).map(result => [result.id, result])));
+    } catch (error) {
+        console.error('Error searching glossary:', error);
+    }
+}
+
 // Render glossary items to the page
 function renderGlossary(glossary) {
     const glossaryList = document.getElementById('glossaryList');
@@ -993,6 +1185,16 @@ function setupLegalFeaturesListeners() {
         }
     });
     
+    // Glossary terms linked in answers
+    if (chatMessages) {
+        chatMessages.addEventListener('click', (e) => {
+            const link = e.target.closest('.glossary-link');
+            if (link) {
+                openGlossaryTerm(decodeURIComponent(link.dataset.termId));
+            }
+        });
+    }
+
     // Template modal close button
     const closeTemplateModal = document.getElementById('closeTemplateModal');
     const templateModal = document.getElementById('templateModal');
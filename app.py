@@ -1,14 +1,57 @@
 # Legal chatbot app - using Flask and Gemini API
 # Started this project to help with legal document analysis
 
+import time
+STARTUP_STARTED = time.perf_counter()  # for the startup timing report
+
 import os
 import json
 import sys
-from flask import Flask, render_template, request, jsonify, session
+import csv
+import io
+import re
+import shutil
+import tempfile
+import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Request, render_template, request, jsonify, session, Response, stream_with_context, g
+from werkzeug.exceptions import RequestEntityTooLarge
 from flask_session import Session
-import google.generativeai as genai
-from datetime import datetime
 import uuid
+from document_pipeline import DocumentPipeline
+from document_extractor import EXTRACTOR_VERSION, ExtractionError, extract_text, file_digest
+from fact_extractor import count_facts, extract_facts, facts_summary
+from contract_diff import (change_key, change_prompt, change_to_dict, diff_clauses, needs_analysis,
+                           parse_change_analyses, split_clauses)
+from history_builder import build_history_context, document_digest, summarise_turn
+from response_cache import ResponseCache, make_key
+from semantic_cache import SemanticCache
+from batch_jobs import BatchQueue
+from single_flight import SingleFlight
+from metrics import Registry, SIZE_BUCKETS, TURN_BUCKETS
+from profiler import SlowRequestProfiler
+from admission import AdmissionLimiter, Overloaded, TokenBuckets
+from resilience import TRANSIENT_ERRORS, CircuitBreaker, CircuitOpen, Resilience
+from static_responses import StaticResponses
+from glossary_index import GlossaryIndex, load_glossary
+from analysis_parser import parse_analysis
+from prompts import PromptBuilder, PromptTooLarge, model_char_limit
+from template_engine import TemplateEngine, field_name, in_pieces, normalise_row, zip_stream
+from legal_data import LEGAL_DISCLAIMER, LEGAL_TEMPLATES, LEGAL_GLOSSARY, LEGAL_CATEGORIES
+from category_classifier import CategoryClassifier
+from model_backend import create_backend
+from conversation_store import RISK_LEVELS, ConversationStore, SQLiteConversationStore, Message
+
+# Where startup time goes, in seconds - printed at startup and served at /api/startup
+startup_timings = {'imports': time.perf_counter() - STARTUP_STARTED}
+_phase_started = time.perf_counter()
+
+def mark_startup(phase):
+    global _phase_started
+    now = time.perf_counter()
+    startup_timings[phase] = now - _phase_started
+    _phase_started = now
 
 # Try to load from config file first, fallback to env vars
 try:
@@ -30,20 +73,163 @@ except ImportError:
 SECRET_KEY = os.environ.get('SECRET_KEY', 'legalease-secret-key-change-in-production')
 DEBUG = os.environ.get('DEBUG', 'False').lower() == 'true'
 
+# Which model backend to use - 'gemini' (default) or 'fake' for offline load testing
+MODEL_BACKEND = os.environ.get('MODEL_BACKEND', 'gemini').lower()
+
+# Gemini model discovery: 'background' (default), 'lazy' or 'eager'. The model
+# that gets picked is remembered in MODEL_CACHE_FILE for MODEL_CACHE_TTL seconds.
+MODEL_DISCOVERY = os.environ.get('MODEL_DISCOVERY', 'background').lower()
+MODEL_CACHE_FILE = os.environ.get('MODEL_CACHE_FILE', '.model_cache.json')
+MODEL_CACHE_TTL = int(os.environ.get('MODEL_CACHE_TTL', 86400))
+
+# Conversations are dropped after this many idle seconds, and the least
+# recently used ones go first once they hold more than the memory cap
+CONVERSATION_IDLE_TTL = int(os.environ.get('CONVERSATION_IDLE_TTL', 7200))
+CONVERSATION_MAX_BYTES = int(os.environ.get('CONVERSATION_MAX_BYTES', 256 * 1024 * 1024))
+
+# 'memory' keeps conversations per process; 'sqlite' shares them between all
+# workers through CONVERSATION_DB. With several workers also set
+# SESSION_BACKEND=cookie so the session id itself isn't stuck on one machine's disk.
+CONVERSATION_STORE = os.environ.get('CONVERSATION_STORE', 'memory').lower()
+CONVERSATION_DB = os.environ.get('CONVERSATION_DB', './conversations.db')
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'filesystem').lower()
+
+# Long documents get split up and analysed in parallel (see document_pipeline.py)
+DOCUMENT_CHUNK_CHARS = int(os.environ.get('DOCUMENT_CHUNK_CHARS', 12000))
+DOCUMENT_CHUNK_THRESHOLD = int(os.environ.get('DOCUMENT_CHUNK_THRESHOLD', 20000))
+DOCUMENT_WORKERS = int(os.environ.get('DOCUMENT_WORKERS', 4))
+
+# How much earlier conversation goes into each prompt (characters)
+HISTORY_CHAR_BUDGET = int(os.environ.get('HISTORY_CHAR_BUDGET', 6000))
+HISTORY_RECENT_TURNS = int(os.environ.get('HISTORY_RECENT_TURNS', 6))
+
+# Prompts longer than this are refused with a 413 instead of being sent.
+# 0 = work it out from the model's input window (see prompts.py)
+PROMPT_MAX_CHARS = int(os.environ.get('PROMPT_MAX_CHARS', 0))
+
+# Cache for repeat citation / category questions - set RESPONSE_CACHE_DB to a
+# file path to keep it across restarts
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 1000))
+RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 86400))
+RESPONSE_CACHE_DB = os.environ.get('RESPONSE_CACHE_DB', '')
+# Expired answers are still served while the model is down; ones expired for
+# longer than this are dropped from RESPONSE_CACHE_DB at startup
+RESPONSE_CACHE_STALE_TTL = int(os.environ.get('RESPONSE_CACHE_STALE_TTL', 7 * 86400))
+
+# Reuse answers for stand-alone questions that are worded differently but
+# mean the same ("what does an NDA cover" / "what's covered by an NDA?") -
+# same words apart from grammar words, parties not swapped (semantic_cache.py).
+# SEMANTIC_CACHE_SIZE=0 turns it off. SEMANTIC_CACHE_THRESHOLD is the word
+# overlap (0-1) needed to reuse an answer. A SEMANTIC_CACHE_AUDIT_RATE share
+# of reuses is re-asked in the background to catch answers that didn't fit
+SEMANTIC_CACHE_SIZE = int(os.environ.get('SEMANTIC_CACHE_SIZE', 10000))
+SEMANTIC_CACHE_TTL = int(os.environ.get('SEMANTIC_CACHE_TTL', 86400))
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', 0.8))
+SEMANTIC_CACHE_AUDIT_RATE = float(os.environ.get('SEMANTIC_CACHE_AUDIT_RATE', 0.02))
+
+# Extra glossary terms (JSON or CSV, see glossary_index.load_glossary) added
+# to the built-in ones
+GLOSSARY_FILE = os.environ.get('GLOSSARY_FILE', '')
+
+# How long browsers may reuse templates/glossary/categories before asking again
+# (they revalidate with the ETag after that, which is a bodyless 304)
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 3600))
+
+# /api/analyze-category only calls Gemini when the local classifier is less sure than this
+CATEGORY_CONFIDENCE_THRESHOLD = float(os.environ.get('CATEGORY_CONFIDENCE_THRESHOLD', 0.6))
+
+# Identical prompts already on their way to the model share one call (0 turns it off)
+SINGLE_FLIGHT = os.environ.get('SINGLE_FLIGHT', '1') != '0'
+
+# Admission control - at most MODEL_MAX_CONCURRENCY model calls at once (0 = no
+# limit), up to MODEL_QUEUE_SIZE more wait up to MODEL_QUEUE_TIMEOUT seconds for
+# a slot, anything beyond that gets a 429 with Retry-After straight away
+MODEL_MAX_CONCURRENCY = int(os.environ.get('MODEL_MAX_CONCURRENCY', 16))
+MODEL_QUEUE_SIZE = int(os.environ.get('MODEL_QUEUE_SIZE', 64))
+MODEL_QUEUE_TIMEOUT = float(os.environ.get('MODEL_QUEUE_TIMEOUT', 15))
+# Per-session limit on requests that need the model (0 = off)
+RATE_LIMIT_PER_MINUTE = float(os.environ.get('RATE_LIMIT_PER_MINUTE', 30))
+RATE_LIMIT_BURST = int(os.environ.get('RATE_LIMIT_BURST', 10))
+
+# Resilience - every model call gets MODEL_DEADLINE seconds in total (streams:
+# to the first chunk, then MODEL_STREAM_IDLE_TIMEOUT between chunks), transient
+# errors are retried MODEL_RETRIES times with jittered backoff, MODEL_HEDGE=1
+# sends a second copy of calls slower than the recent p95, and after
+# BREAKER_FAILURES failures in a row we stop calling for BREAKER_RESET seconds
+# and answer from cache / with a reduced answer instead
+MODEL_DEADLINE = float(os.environ.get('MODEL_DEADLINE', 30))
+MODEL_STREAM_IDLE_TIMEOUT = float(os.environ.get('MODEL_STREAM_IDLE_TIMEOUT', 15))
+MODEL_RETRIES = int(os.environ.get('MODEL_RETRIES', 2))
+MODEL_RETRY_BASE = float(os.environ.get('MODEL_RETRY_BASE', 0.5))
+MODEL_HEDGE = os.environ.get('MODEL_HEDGE', '0') == '1'
+MODEL_HEDGE_MIN_DELAY = float(os.environ.get('MODEL_HEDGE_MIN_DELAY', 0.5))
+BREAKER_FAILURES = int(os.environ.get('BREAKER_FAILURES', 5))
+BREAKER_RESET = float(os.environ.get('BREAKER_RESET', 30))
+
+# Opt-in profiler - requests slower than PROFILE_SLOW_MS get their sampled
+# stacks written to PROFILE_DIR as flame graph input (0 = off)
+PROFILE_SLOW_MS = int(os.environ.get('PROFILE_SLOW_MS', 0))
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', 5))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', './profiles')
+
+# Batch analysis (/api/batch) - BATCH_CONCURRENCY is how many model calls
+# batch jobs make at once, across all jobs
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', 4))
+BATCH_MAX_RETRIES = int(os.environ.get('BATCH_MAX_RETRIES', 2))
+BATCH_RETRY_BACKOFF = float(os.environ.get('BATCH_RETRY_BACKOFF', 1.0))
+BATCH_MAX_DOCUMENTS = int(os.environ.get('BATCH_MAX_DOCUMENTS', 500))
+
+# /api/compare - largest version accepted, and how many changed clauses go
+# into one model call (bigger diffs are split over several calls in parallel)
+COMPARE_MAX_CHARS = int(os.environ.get('COMPARE_MAX_CHARS', 2000000))
+COMPARE_CHANGES_PER_CALL = int(os.environ.get('COMPARE_CHANGES_PER_CALL', 20))
+BATCH_JOB_TTL = int(os.environ.get('BATCH_JOB_TTL', 3600))
+
+# Most rows one /api/templates/<id>/fill request may fill
+TEMPLATE_FILL_MAX_ROWS = int(os.environ.get('TEMPLATE_FILL_MAX_ROWS', 100000))
+
+# /api/upload - largest file accepted, most text kept from it, and how many
+# extracted files are remembered by their hash (re-uploading the same
+# contract then skips extraction)
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 20 * 1024 * 1024))
+UPLOAD_MAX_CHARS = int(os.environ.get('UPLOAD_MAX_CHARS', 1000000))
+UPLOAD_CACHE_SIZE = int(os.environ.get('UPLOAD_CACHE_SIZE', 200))
+UPLOAD_CACHE_MAX_BYTES = int(os.environ.get('UPLOAD_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+mark_startup('config')
+
+class AppRequest(Request):
+    # /api/upload gets its own body limit (the other routes have their own
+    # checks). Werkzeug enforces it while reading, so a chunked upload with
+    # no Content-Length is cut off with a 413 as soon as it goes over,
+    # before the multipart body is parsed into memory or temp files
+    @property
+    def max_content_length(self):
+        if self.path == '/api/upload':
+            return UPLOAD_MAX_BYTES + 64 * 1024
+        return super().max_content_length
+
 app = Flask(__name__)
+app.request_class = AppRequest
 app.config['SECRET_KEY'] = SECRET_KEY
-app.config['SESSION_TYPE'] = 'filesystem'
-app.config['SESSION_PERMANENT'] = False
-app.config['SESSION_FILE_DIR'] = './flask_session'
 
-# Make sure session folder exists
-os.makedirs(app.config['SESSION_FILE_DIR'], exist_ok=True)
+# Setup sessions - the session only holds our session_id, so Flask's own
+# signed cookie ('cookie') works too and needs no shared storage between workers
+if SESSION_BACKEND == 'filesystem':
+    app.config['SESSION_TYPE'] = 'filesystem'
+    app.config['SESSION_PERMANENT'] = False
+    app.config['SESSION_FILE_DIR'] = './flask_session'
+
+    # Make sure session folder exists
+    os.makedirs(app.config['SESSION_FILE_DIR'], exist_ok=True)
 
-# Setup sessions
-Session(app)
+    Session(app)
+elif SESSION_BACKEND != 'cookie':
+    raise ValueError(f"Unknown SESSION_BACKEND: {SESSION_BACKEND}")
+mark_startup('flask_setup')
 
-# Check if API key is set up
-if not GEMINI_API_KEY or GEMINI_API_KEY == "your_gemini_api_key_here":
+# Check if API key is set up (the fake backend doesn't need one)
+if MODEL_BACKEND == 'gemini' and (not GEMINI_API_KEY or GEMINI_API_KEY == "your_gemini_api_key_here"):
     print("=" * 60)
     print("WARNING: GEMINI_API_KEY not configured!")
     print("=" * 60)
@@ -52,385 +238,440 @@ if not GEMINI_API_KEY or GEMINI_API_KEY == "your_gemini_api_key_here":
     print("=" * 60)
     GEMINI_API_KEY = ''
 
-genai.configure(api_key=GEMINI_API_KEY)
-
-# Initialize the model - find what's actually available
-model = None
-available_model_name = None
-
-# List available models and find one that works
-if GEMINI_API_KEY:
+# Initialize the model backend (see model_backend.py) - doesn't block on the network
+model = create_backend(
+    MODEL_BACKEND, GEMINI_API_KEY,
+    discovery=MODEL_DISCOVERY, cache_file=MODEL_CACHE_FILE, cache_ttl=MODEL_CACHE_TTL
+)
+mark_startup('model_backend')
+
+# Metrics for /metrics (Prometheus text format)
+metrics = Registry(prefix='legalease_')
+request_latency = metrics.histogram(
+    'http_request_duration_seconds', 'Time to handle a request, including streaming the body', ('route', 'method'))
+requests_total = metrics.counter('http_requests_total', 'Requests by route and status code', ('route', 'method', 'status'))
+model_latency = metrics.histogram('model_call_duration_seconds', 'Upstream model call time', ('mode',))
+model_first_token = metrics.histogram('model_first_token_seconds', 'Time from a streaming model call to its first chunk')
+prompt_size = metrics.histogram('prompt_chars', 'Characters sent to the model per call', buckets=SIZE_BUCKETS)
+response_size = metrics.histogram('response_chars', 'Characters received from the model per call', buckets=SIZE_BUCKETS)
+history_turns = metrics.histogram('history_turns', 'Earlier messages in the conversation for each chat turn', buckets=TURN_BUCKETS)
+history_size = metrics.histogram('history_context_chars', 'Conversation history characters put into a prompt', buckets=SIZE_BUCKETS)
+prompt_sections = metrics.histogram('prompt_section_chars', 'Characters in each section of the prompts built',
+                                    ('prompt', 'section'), buckets=SIZE_BUCKETS)
+template_documents = metrics.counter('template_documents_total', 'Documents filled from templates',
+                                     ('template', 'format'))
+errors_total = metrics.counter('errors_total', 'Errors by where they happened and exception type', ('where', 'type'))
+model_queue_wait = metrics.histogram('model_queue_wait_seconds', 'Time model calls waited for a concurrency slot')
+rejections_total = metrics.counter('admission_rejections_total', 'Requests turned away with a 429', ('reason',))
+fact_extraction = metrics.histogram('fact_extraction_seconds', 'Time to pull facts out of a document before the model call',
+                                    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1))
+facts_found = metrics.histogram('document_facts', 'Facts found in each document by the rule-based extractor',
+                                buckets=TURN_BUCKETS)
+analyses_total = metrics.counter('analyses_total', 'Answers parsed into sections, by assessed risk level', ('risk',))
+uploads_total = metrics.counter('uploads_total', 'Uploaded files by format and outcome', ('format', 'result'))
+upload_extraction = metrics.histogram('upload_extraction_seconds', 'Time to extract the text of an uploaded file',
+                                      ('format',), buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+upload_size = metrics.histogram('upload_bytes', 'Size of uploaded files',
+                                buckets=(1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 2.5e7, 5e7))
+
+admission = AdmissionLimiter(
+    max_concurrent=MODEL_MAX_CONCURRENCY,
+    max_queue=MODEL_QUEUE_SIZE,
+    max_wait=MODEL_QUEUE_TIMEOUT,
+    on_wait=model_queue_wait.observe
+)
+rate_limiter = TokenBuckets(rate_per_minute=RATE_LIMIT_PER_MINUTE, burst=RATE_LIMIT_BURST)
+
+resilience = Resilience(
+    deadline=MODEL_DEADLINE,
+    retries=MODEL_RETRIES,
+    retry_base=MODEL_RETRY_BASE,
+    hedge=MODEL_HEDGE,
+    hedge_min_delay=MODEL_HEDGE_MIN_DELAY,
+    breaker=CircuitBreaker(failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET),
+    stream_idle_timeout=MODEL_STREAM_IDLE_TIMEOUT,
+    # A call past its deadline gives its admission slot back but keeps its
+    # worker thread until the model answers - one thread per slot keeps real
+    # upstream concurrency within MODEL_MAX_CONCURRENCY even then
+    max_workers=MODEL_MAX_CONCURRENCY if MODEL_MAX_CONCURRENCY > 0 else 64
+)
+# What's left when retries run out or the breaker is open - answered with a
+# cached / reduced answer instead of a 500
+UPSTREAM_ERRORS = TRANSIENT_ERRORS + (CircuitOpen,)
+
+profiler = SlowRequestProfiler(PROFILE_SLOW_MS, PROFILE_INTERVAL_MS, PROFILE_DIR) if PROFILE_SLOW_MS > 0 else None
+
+def count_error(where, error):
+    errors_total.inc(where=where, type=type(error).__name__)
+
+def prompt_limit():
+    # Picked model's input window unless PROMPT_MAX_CHARS says otherwise
+    return PROMPT_MAX_CHARS or model_char_limit(model.model_name)
+
+prompt_builder = PromptBuilder(
+    prompt_limit,
+    on_section=lambda kind, section, chars: prompt_sections.observe(chars, prompt=kind, section=section)
+)
+
+def prompt_too_large(error):
+    # 413 for a prompt over the limit, with what it was made of
+    return jsonify(error.to_dict()), 413
+
+def too_busy(error):
+    # 429 for an Overloaded error - tells the client when to try again
+    rejections_total.inc(reason=error.reason)
+    response = jsonify({'error': str(error), 'retry_after': error.retry_after})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
+
+def degraded_response(payload, error, status=200):
+    # Answer given without the model - flagged so the client knows, and
+    # with a hint when it's worth asking again
+    retry_after = getattr(error, 'retry_after', 10)
+    response = jsonify(dict(payload, degraded=True, retry_after=retry_after))
+    response.headers['Retry-After'] = str(retry_after)
+    return response, status
+
+def degraded_chat_answer(user_message):
+    # Stand-in for a chat answer while the model is down or too slow
+    local = category_classifier.classify(user_message)
+    lines = ["**The AI model isn't responding right now**, so this is a limited answer made without it.", ""]
+    if local['confidence'] > 0:
+        lines += [f"**CATEGORY TAG**: {local['name']} (automatic guess)", ""]
+    lines.append("**RECOMMENDED NEXT STEPS**: Please ask again in a minute - your question is still "
+                 "part of this conversation.")
+    return '\n'.join(lines)
+
+def check_rate_limit():
+    # Per-session token bucket for requests that are about to use the model.
+    # No session yet (e.g. scripts without cookies) means we go by IP instead.
+    # Returns a 429 response, or None if the request can go ahead
+    key = session.get('session_id') or f"ip:{request.remote_addr}"
+    wait = rate_limiter.take(key)
+    if wait:
+        return too_busy(Overloaded('rate limited', wait))
+    return None
+
+# Store conversations - in memory by default (bounded), or SQLite shared by all workers
+if CONVERSATION_STORE == 'sqlite':
+    conversation_store = SQLiteConversationStore(CONVERSATION_DB, idle_ttl=CONVERSATION_IDLE_TTL)
+elif CONVERSATION_STORE == 'memory':
+    conversation_store = ConversationStore(
+        idle_ttl=CONVERSATION_IDLE_TTL,
+        max_bytes=CONVERSATION_MAX_BYTES
+    )
+else:
+    raise ValueError(f"Unknown CONVERSATION_STORE: {CONVERSATION_STORE}")
+
+# Time-to-first-byte of the last few streamed answers (milliseconds)
+stream_timings = deque(maxlen=200)
+
+single_flight = SingleFlight(enabled=SINGLE_FLIGHT)
+
+def call_model(prompt):
+    # The actual upstream call, timed and measured
+    started = time.perf_counter()
     try:
-        print("\nChecking available models...")
-        available_models = genai.list_models()
-        print("Available models with generateContent:")
-        for m in available_models:
-            if 'generateContent' in m.supported_generation_methods:
-                print(f"  - {m.name}")
-                # Extract just the model name (remove 'models/' prefix if present)
-                model_name = m.name.replace('models/', '')
-                # Try to use this model
-                if not model:
-                    try:
-                        model = genai.GenerativeModel(model_name)
-                        available_model_name = model_name
-                        print(f"\n✓ Successfully initialized: {model_name}\n")
-                    except Exception as e:
-                        print(f"  ✗ Could not use {model_name}: {str(e)[:80]}")
-                        continue
+        text = model.generate_content(prompt).text
     except Exception as e:
-        print(f"Could not list models: {e}")
-        print("Trying common model names...")
-
-# If listing didn't work, try common names
-if not model:
-    model_names_to_try = [
-        'gemini-pro',  # Try the older one first
-        'gemini-1.5-flash',
-        'gemini-1.5-pro',
-    ]
-    
-    for model_name in model_names_to_try:
-        try:
-            model = genai.GenerativeModel(model_name)
-            available_model_name = model_name
-            print(f"\n✓ Using model: {model_name}\n")
-            break
-        except Exception as e:
-            print(f"✗ {model_name} failed: {str(e)[:80]}")
-            continue
-
-if not model:
-    print("\n" + "=" * 60)
-    print("ERROR: Could not initialize any Gemini model!")
-    print("Please check:")
-    print("  1. Your API key is valid")
-    print("  2. The Generative Language API is enabled in Google Cloud Console")
-    print("  3. Your API key has the correct permissions")
-    print("=" * 60 + "\n")
-    # Set a default - will fail on first use but at least the app starts
-    try:
-        model = genai.GenerativeModel('gemini-pro')
-    except:
-        model = None
-
-# Store conversations in memory (not persistent, but works for now)
-conversation_storage = {}
-
-LEGAL_DISCLAIMER = """
-IMPORTANT DISCLAIMER
-
-This system (LegalEase) is an AI-powered advisory tool designed to assist with understanding legal documents and compliance requirements.
-
-This system is NOT a substitute for professional legal counsel. The information provided is:
-
-- For educational and informational purposes only
-- Not legal advice or opinion
-- Not a replacement for consultation with qualified legal professionals
-- Provided "as-is" without warranties of any kind
-
-You should always consult with a licensed attorney for:
-
-- Important legal decisions
-- Legal document review and drafting
-- Compliance matters affecting your business
-- Any situation with legal or financial consequences
-
-By using this system, you acknowledge and agree that you will not hold the developers, operators, or any related parties liable for any decisions made based on information provided by this tool.
-"""
-
-# Legal document templates - these are just basic ones, could add more later
-LEGAL_TEMPLATES = {
-    'nda': {
-        'name': 'Non-Disclosure Agreement (NDA)',
-        'category': 'Contracts',
-        'description': 'Template for protecting confidential information',
-        'template': """NON-DISCLOSURE AGREEMENT
-
-This Non-Disclosure Agreement ("Agreement") is entered into on [DATE] between:
-Disclosing Party: [NAME], [ADDRESS]
-Receiving Party: [NAME], [ADDRESS]
-
-1. DEFINITION OF CONFIDENTIAL INFORMATION
-Confidential Information includes, but is not limited to: [SPECIFY SCOPE]
-
-2. OBLIGATIONS
-The Receiving Party agrees to:
-- Maintain confidentiality of all Confidential Information
-- Use Confidential Information solely for [PURPOSE]
-- Not disclose Confidential Information to third parties without prior written consent
-
-3. EXCEPTIONS
-Confidential Information does not include information that:
-- Is publicly known at the time of disclosure
-- Was independently developed without use of Confidential Information
-- Is required to be disclosed by law
-
-4. DURATION
-This Agreement shall remain in effect for [DURATION] years from the date of execution.
-
-5. REMEDIES
-Breach of this Agreement may result in irreparable harm, and the Disclosing Party may seek injunctive relief.
-
-IN WITNESS WHEREOF, the parties have executed this Agreement as of the date first written above.
-
-Disclosing Party: _________________    Receiving Party: _________________
-Date: _______________                 Date: _______________"""
-    },
-    'employment_contract': {
-        'name': 'Employment Contract',
-        'category': 'Employment',
-        'description': 'Standard employment agreement template',
-        'template': """EMPLOYMENT AGREEMENT
-
-This Employment Agreement ("Agreement") is made on [DATE] between:
-Employer: [COMPANY NAME], [ADDRESS]
-Employee: [NAME], [ADDRESS]
-
-1. POSITION AND DUTIES
-Employee agrees to serve as [POSITION] and perform duties as assigned by Employer.
-
-2. COMPENSATION
-- Base Salary: $[AMOUNT] per [PERIOD]
-- Benefits: [SPECIFY BENEFITS]
-- Bonus: [IF APPLICABLE]
-
-3. TERM
-Employment shall commence on [START DATE] and continue until terminated by either party with [NOTICE PERIOD] notice.
-
-4. CONFIDENTIALITY
-Employee agrees to maintain confidentiality of all proprietary information during and after employment.
-
-5. NON-COMPETE
-[IF APPLICABLE: Specify geographic and temporal restrictions]
-
-6. TERMINATION
-Either party may terminate this Agreement with or without cause, subject to notice requirements.
-
-IN WITNESS WHEREOF, the parties have executed this Agreement.
-
-Employer: _________________           Employee: _________________
-Date: _______________                 Date: _______________"""
-    },
-    'privacy_policy': {
-        'name': 'Privacy Policy',
-        'category': 'Compliance',
-        'description': 'Website privacy policy template',
-        'template': """PRIVACY POLICY
-
-Effective Date: [DATE]
-
-[COMPANY NAME] ("we," "our," or "us") respects your privacy. This Privacy Policy explains how we collect, use, and protect your personal information.
-
-1. INFORMATION WE COLLECT
-- Personal Information: Name, email, address, phone number
-- Technical Information: IP address, browser type, device information
-- Usage Data: How you interact with our services
-
-2. HOW WE USE YOUR INFORMATION
-We use collected information to:
-- Provide and improve our services
-- Communicate with you
-- Comply with legal obligations
-- Protect our rights and prevent fraud
-
-3. INFORMATION SHARING
-We do not sell your personal information. We may share information with:
-- Service providers who assist in operations
-- Legal authorities when required by law
-- Business partners with your consent
-
-4. DATA SECURITY
-We implement reasonable security measures to protect your information.
-
-5. YOUR RIGHTS
-You have the right to:
-- Access your personal information
-- Request correction or deletion
-- Opt-out of certain communications
-- File a complaint with relevant authorities
-
-6. COOKIES
-We use cookies to enhance user experience. You can control cookies through your browser settings.
-
-7. CHANGES TO THIS POLICY
-We may update this Privacy Policy. Continued use constitutes acceptance of changes.
-
-Contact Us: [EMAIL] | [ADDRESS]"""
-    },
-    'service_agreement': {
-        'name': 'Service Agreement',
-        'category': 'Contracts',
-        'description': 'Template for service provider agreements',
-        'template': """SERVICE AGREEMENT
-
-This Service Agreement ("Agreement") is entered into on [DATE] between:
-Service Provider: [NAME], [ADDRESS]
-Client: [NAME], [ADDRESS]
-
-1. SERVICES
-Service Provider agrees to provide the following services: [DESCRIBE SERVICES]
-
-2. PAYMENT
-- Service Fee: $[AMOUNT]
-- Payment Terms: [NET 30/UPFRONT/etc.]
-- Late Fees: [IF APPLICABLE]
-
-3. TERM AND TERMINATION
-This Agreement shall commence on [START DATE] and continue until [END DATE] or terminated by either party with [NOTICE] days' notice.
-
-4. INTELLECTUAL PROPERTY
-All work product shall be owned by [SPECIFY OWNERSHIP].
-
-5. WARRANTIES AND DISCLAIMERS
-Service Provider warrants services will be performed in a professional manner. [DISCLAIMERS]
+        count_error('model', e)
+        raise
+    finally:
+        model_latency.observe(time.perf_counter() - started, mode='sync')
+    prompt_size.observe(len(prompt))
+    response_size.observe(len(text))
+    return text
+
+def generate_text(prompt):
+    # Single model call that just returns the text. If the same prompt is
+    # already in flight we wait for that answer instead of asking again.
+    # resilience.py adds the deadline, retries, hedging and circuit breaker.
+    # The admission slot is taken here, not inside call_model: a call that
+    # runs past the deadline is left running on its worker thread, and
+    # would hold the slot until it finally returned
+    prompt_builder.check('other', len(prompt))
+    def call():
+        with admission.slot():
+            return resilience.call(lambda: call_model(prompt))
+    return single_flight.do(make_key('prompt', model.model_name, prompt), call)
+
+response_cache = ResponseCache(
+    max_entries=RESPONSE_CACHE_SIZE,
+    ttl_seconds=RESPONSE_CACHE_TTL,
+    db_path=RESPONSE_CACHE_DB or None,
+    stale_ttl_seconds=RESPONSE_CACHE_STALE_TTL
+)
+
+# Extracted text of uploads, by file hash - memory only, since the text is
+# big and cheap enough to redo after a restart
+upload_cache = ResponseCache(
+    max_entries=UPLOAD_CACHE_SIZE,
+    ttl_seconds=RESPONSE_CACHE_TTL,
+    max_bytes=UPLOAD_CACHE_MAX_BYTES
+)
+
+semantic_cache = SemanticCache(
+    max_entries=SEMANTIC_CACHE_SIZE,
+    ttl_seconds=SEMANTIC_CACHE_TTL,
+    threshold=SEMANTIC_CACHE_THRESHOLD
+)
+# One background model call at a time for reuse audits
+audit_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='semantic-audit')
+
+glossary = load_glossary(GLOSSARY_FILE, LEGAL_GLOSSARY)
+# Finds glossary terms in answers, and backs /api/glossary/search
+glossary_index = GlossaryIndex(glossary)
+
+# Templates split into text + placeholder slots once, for bulk filling
+template_engine = TemplateEngine(LEGAL_TEMPLATES)
+
+category_classifier = CategoryClassifier.from_reference_data(
+    LEGAL_CATEGORIES, glossary, LEGAL_TEMPLATES
+)
+
+document_pipeline = DocumentPipeline(
+    generate_text,
+    chunk_chars=DOCUMENT_CHUNK_CHARS,
+    threshold_chars=DOCUMENT_CHUNK_THRESHOLD,
+    max_workers=DOCUMENT_WORKERS
+)
+
+def analyse_document(text):
+    # One stand-alone document analysis (no conversation) - used by batch jobs
+    facts = find_facts(text)
+    if document_pipeline.should_chunk(text):
+        text, _ = document_pipeline.condense(text)
+    return generate_text(create_legal_analysis_prompt(text, facts=facts))
+
+def find_facts(text):
+    # Dates, amounts, parties... pulled out of a document without the model
+    started = time.perf_counter()
+    facts = extract_facts(text)
+    fact_extraction.observe(time.perf_counter() - started)
+    facts_found.observe(count_facts(facts))
+    return facts
+
+def parse_answer(text):
+    # Answer text -> its sections as fields (None if it isn't a full analysis)
+    structured = parse_analysis(text, LEGAL_CATEGORIES)
+    analyses_total.inc(risk=(structured or {}).get('risk_level') or 'unrated')
+    return structured
+
+batch_queue = BatchQueue(
+    analyse_document,
+    concurrency=BATCH_CONCURRENCY,
+    max_retries=BATCH_MAX_RETRIES,
+    retry_backoff=BATCH_RETRY_BACKOFF,
+    job_ttl=BATCH_JOB_TTL,
+    parse=parse_answer
+)
+
+# Numbers the caches/stores already keep, read when /metrics is scraped
+metrics.collected('response_cache_requests_total', 'Response cache lookups by result', 'counter', lambda: [
+    ({'result': 'hit'}, response_cache.snapshot()['hits']),
+    ({'result': 'miss'}, response_cache.snapshot()['misses'])
+])
+metrics.collected('response_cache_hit_ratio', 'Response cache hit rate since start', 'gauge',
+                  lambda: response_cache.snapshot()['hit_rate'])
+metrics.collected('response_cache_entries', 'Entries in the response cache', 'gauge',
+                  lambda: response_cache.snapshot()['entries'])
+metrics.collected('upload_cache_requests_total', 'Upload text cache lookups by result', 'counter', lambda: [
+    ({'result': 'hit'}, upload_cache.snapshot()['hits']),
+    ({'result': 'miss'}, upload_cache.snapshot()['misses'])
+])
+metrics.collected('semantic_cache_requests_total', 'Near-duplicate question cache lookups by result', 'counter', lambda: [
+    ({'result': result}, semantic_cache.snapshot()[key])
+    for result, key in (('hit', 'hits'), ('miss', 'misses'), ('skipped', 'skipped'))
+])
+metrics.collected('semantic_cache_false_reuses_total', 'Reused answers flagged as not fitting the question', 'counter',
+                  lambda: semantic_cache.snapshot()['false_reuses'])
+metrics.collected('semantic_cache_entries', 'Entries in the near-duplicate question cache', 'gauge',
+                  lambda: semantic_cache.snapshot()['entries'])
+metrics.collected('model_requests_collapsed_total', 'Model calls saved by sharing an identical in-flight prompt', 'counter',
+                  lambda: single_flight.snapshot()['collapsed'])
+metrics.collected('model_upstream_calls_total', 'Non-streaming calls that actually went to the model', 'counter',
+                  lambda: single_flight.snapshot()['upstream_calls'])
+metrics.collected('conversation_sessions', 'Live conversation sessions', 'gauge',
+                  lambda: conversation_store.stats()['live_sessions'])
+metrics.collected('conversation_bytes', 'Bytes of conversation content held', 'gauge',
+                  lambda: conversation_store.stats()['bytes_held'])
+metrics.collected('model_queue_depth', 'Model calls waiting for a concurrency slot', 'gauge',
+                  lambda: admission.snapshot()['queue_depth'])
+metrics.collected('model_calls_in_flight', 'Model calls holding a concurrency slot', 'gauge',
+                  lambda: admission.snapshot()['in_use'])
+metrics.collected('model_retries_total', 'Model call attempts retried after a transient error', 'counter',
+                  lambda: resilience.snapshot()['retries'])
+metrics.collected('model_hedges_total', 'Hedged (duplicate) model requests sent', 'counter',
+                  lambda: resilience.snapshot()['hedges'])
+metrics.collected('model_deadline_exceeded_total', 'Model calls that ran out of time', 'counter',
+                  lambda: resilience.snapshot()['deadline_exceeded'])
+metrics.collected('circuit_breaker_open', 'Model circuit breaker state (0 closed, 1 half open, 2 open)', 'gauge',
+                  lambda: {'closed': 0, 'half_open': 1, 'open': 2}[resilience.breaker.snapshot()['state']])
+metrics.collected('circuit_breaker_rejections_total', 'Calls failed fast by the open circuit breaker', 'counter',
+                  lambda: resilience.breaker.snapshot()['rejected'])
+metrics.collected('static_responses_total', 'Precomputed reference-data responses by result', 'counter', lambda: [
+    ({'result': 'served'}, static_responses.snapshot()['served'] - static_responses.snapshot()['served_gzip']),
+    ({'result': 'served_gzip'}, static_responses.snapshot()['served_gzip']),
+    ({'result': 'not_modified'}, static_responses.snapshot()['not_modified'])
+])
+metrics.collected('batch_pending_documents', 'Batch documents waiting for or being analysed', 'gauge',
+                  lambda: batch_queue.stats()['pending_documents'])
+metrics.collected('prompts_rejected_total', 'Prompts refused for being over the size limit, by kind', 'counter', lambda: [
+    ({'prompt': kind}, counts['rejected']) for kind, counts in prompt_builder.snapshot()['prompts'].items()
+])
+metrics.collected('profiles_written_total', 'Slow-request profiles written to PROFILE_DIR', 'counter',
+                  lambda: profiler.snapshot()['profiles_written'] if profiler else None)
+mark_startup('caches_and_classifier')
+
+def create_legal_analysis_prompt(user_input, conversation_history=None, facts=None):
+    # Builds the prompt we send to Gemini (sections and instructions are in
+    # prompts.py). facts: from extract_facts() for documents
+    history_context = None
+    # Add conversation history if we have it - kept under HISTORY_CHAR_BUDGET,
+    # documents are referenced by digest instead of being pasted again
+    if conversation_history:
+        history_context, stats = build_history_context(
+            conversation_history, HISTORY_CHAR_BUDGET, HISTORY_RECENT_TURNS
+        )
+        history_size.observe(stats['sent_bytes'])
+        print(f"[history] turns={stats['turns']} full={stats['full_turns']} "
+              f"summarised={stats['summarised_turns']} sent={stats['sent_bytes']}B "
+              f"saved={stats['saved_bytes']}B")
 
-6. LIMITATION OF LIABILITY
-Service Provider's liability is limited to the amount paid for services.
+    return prompt_builder.analysis(user_input, history_context, facts_summary(facts) if facts else None)
 
-7. GOVERNING LAW
-This Agreement shall be governed by the laws of [JURISDICTION].
+def create_citation_prompt(citation_text):
+    return prompt_builder.citation(citation_text)
 
-IN WITNESS WHEREOF, the parties have executed this Agreement.
+def create_category_prompt(text):
+    return prompt_builder.category(text)
 
-Service Provider: _________________    Client: _________________
-Date: _______________                 Date: _______________"""
-    }
-}
-
-# Legal terms dictionary - common terms users might not know
-LEGAL_GLOSSARY = {
-    'nda': {
-        'term': 'Non-Disclosure Agreement (NDA)',
-        'definition': 'A legal contract that creates a confidential relationship between parties to protect sensitive information from being disclosed to third parties.',
-        'example': 'An NDA is commonly used when companies discuss potential business partnerships.'
-    },
-    'consideration': {
-        'term': 'Consideration',
-        'definition': 'Something of value given in exchange for a promise, necessary for a contract to be legally binding.',
-        'example': 'In a sale contract, money is the consideration given in exchange for goods.'
-    },
-    'liability': {
-        'term': 'Liability',
-        'definition': 'Legal responsibility or obligation. A person or entity can be held liable for damages, debts, or legal obligations.',
-        'example': 'If a company breaches a contract, it may face liability for resulting damages.'
-    },
-    'jurisdiction': {
-        'term': 'Jurisdiction',
-        'definition': 'The authority of a court to hear and decide a case, or the geographic area over which a court has authority.',
-        'example': 'A contract may specify that disputes will be resolved in California courts.'
-    },
-    'indemnification': {
-        'term': 'Indemnification',
-        'definition': 'A contractual obligation where one party agrees to compensate another for losses or damages arising from specific circumstances.',
-        'example': 'A service agreement may include indemnification clauses protecting one party from third-party claims.'
-    },
-    'force_majeure': {
-        'term': 'Force Majeure',
-        'definition': 'A clause that excuses a party from performing contractual obligations due to extraordinary circumstances beyond their control (e.g., natural disasters, war).',
-        'example': 'A force majeure clause may excuse performance during a pandemic or natural disaster.'
-    },
-    'arbitration': {
-        'term': 'Arbitration',
-        'definition': 'A method of dispute resolution where parties submit their case to a neutral third party (arbitrator) instead of going to court.',
-        'example': 'Many contracts include arbitration clauses requiring disputes to be resolved through arbitration rather than litigation.'
-    },
-    'intellectual_property': {
-        'term': 'Intellectual Property (IP)',
-        'definition': 'Legal rights protecting creations of the mind, including patents, trademarks, copyrights, and trade secrets.',
-        'example': 'A software company may protect its code through copyright and trade secret laws.'
-    },
-    'statute_of_limitations': {
-        'term': 'Statute of Limitations',
-        'definition': 'A law that sets the maximum time period after an event within which legal proceedings may be initiated.',
-        'example': 'Many states have a 3-year statute of limitations for breach of contract claims.'
-    },
-    'due_diligence': {
-        'term': 'Due Diligence',
-        'definition': 'The investigation or audit of a business or person before signing a contract or agreement.',
-        'example': 'Before acquiring a company, the buyer conducts due diligence to review financial records and legal matters.'
-    }
-}
-
-# Categories for organizing legal stuff
-LEGAL_CATEGORIES = {
-    'contract': {'name': 'Contract Law', 'color': '#2563eb', 'icon': ''},
-    'employment': {'name': 'Employment Law', 'color': '#10b981', 'icon': ''},
-    'intellectual_property': {'name': 'Intellectual Property', 'color': '#8b5cf6', 'icon': ''},
-    'compliance': {'name': 'Compliance', 'color': '#f59e0b', 'icon': ''},
-    'litigation': {'name': 'Litigation', 'color': '#ef4444', 'icon': ''},
-    'corporate': {'name': 'Corporate Law', 'color': '#6366f1', 'icon': ''},
-    'privacy': {'name': 'Privacy & Data', 'color': '#06b6d4', 'icon': ''},
-    'real_estate': {'name': 'Real Estate', 'color': '#ec4899', 'icon': ''}
-}
-
-def create_legal_analysis_prompt(user_input, conversation_history=None):
-    # Builds the prompt we send to Gemini
-    # Tried a few different formats, this one seems to work best
-    base_prompt = """You are LegalEase, an expert legal document analysis and compliance advisory AI assistant. Your role is to help users understand legal documents and compliance requirements in clear, layman-friendly language.
-
-LEGAL EXPERTISE AREAS:
-- Contract Law (NDAs, service agreements, employment contracts)
-- Employment Law (hiring, termination, workplace policies)
-- Intellectual Property (patents, trademarks, copyrights, trade secrets)
-- Corporate Law (business formation, governance, mergers)
-- Privacy & Data Protection (GDPR, CCPA, privacy policies)
-- Compliance (regulatory requirements, industry standards)
-- Real Estate Law (leases, property transactions)
-- Litigation (disputes, settlements, court procedures)
-
-Your responses should be structured and include the following sections when analyzing legal content:
-
-1. **CATEGORY TAG**: Identify the primary legal category (Contract Law, Employment, IP, Compliance, etc.)
-
-2. **SIMPLE EXPLANATION**: Provide a clear, jargon-free explanation of the legal content or question (2-3 paragraphs).
-
-3. **KEY POINTS**:
-   - **Obligations**: What the user must do or comply with
-   - **Rights**: What rights or protections the user has
-   - **Deadlines**: Any time-sensitive requirements or dates mentioned
-   - **Risks**: Potential issues or concerns to be aware of
-
-4. **RISK ASSESSMENT**: Provide a risk score (Low / Medium / High) with a brief justification.
-
-5. **LEGAL TERMINOLOGY**: If complex legal terms are used, provide brief definitions in plain language.
-
-6. **CITATION FORMAT**: If referencing specific laws, statutes, or regulations, format citations appropriately (e.g., "Title 15 U.S.C. § 45" or "Cal. Civ. Code § 1542").
-
-7. **RECOMMENDED NEXT STEPS**: Actionable advice on what the user should consider doing next (2-3 specific recommendations).
-
-8. **RELATED RESOURCES**: Suggest relevant legal resources, templates, or further reading when applicable.
-
-IMPORTANT GUIDELINES:
-- Use simple, accessible language. Avoid legal jargon when possible, or explain it clearly when necessary.
-- Be accurate but conversational. Help users feel informed, not intimidated.
-- Focus on practical implications and actionable insights.
-- If the input is a question rather than document analysis, adapt the format accordingly.
-- Always maintain professional tone while being approachable.
-- Do NOT provide definitive legal advice - frame suggestions as "you may want to consider" or "it would be wise to consult about"
-- When appropriate, reference applicable statutes, regulations, or case law (with proper citations)
-- Identify potential compliance issues and regulatory considerations
-
-Now, analyze the following legal content or question:"""
-
-    # Add conversation history if we have it (last 6 messages for context)
-    if conversation_history:
-        history_context = "\n\nPrevious conversation context:\n"
-        for msg in conversation_history[-6:]:
-            role = "User" if msg.get('role') == 'user' else "Assistant"
-            history_context += f"{role}: {msg.get('content', '')}\n"
-        base_prompt += history_context
-    
-    base_prompt += f"\n\nUser Input:\n{user_input}\n\nPlease provide your analysis in the structured format above."
-    
-    return base_prompt
+def get_session_id():
+    # Create session if it doesn't exist
+    if 'session_id' not in session:
+        session['session_id'] = str(uuid.uuid4())
+        conversation_store.ensure(session['session_id'])
+    return session['session_id']
+
+def start_chat_turn(session_id, user_message, is_document, facts=None):
+    # Save the user's message and build the prompt from everything before it.
+    # Also says whether the question stands alone (no history, no document) -
+    # only those answers can be shared between users
+    conversation_history = conversation_store.history(session_id)
+    history_turns.observe(len(conversation_history))
+
+    analysis_input = user_message
+    if is_document and document_pipeline.should_chunk(user_message):
+        # Too big for one prompt - analyse it in pieces and send the merged notes
+        started = time.perf_counter()
+        analysis_input, chunk_count = document_pipeline.condense(user_message)
+        print(f"[document] {len(user_message):,} chars in {chunk_count} chunks, "
+              f"map step took {time.perf_counter() - started:.1f}s")
+    # Built before the message is saved, so a prompt that's too big
+    # (PromptTooLarge) doesn't leave an unanswered message in the history
+    prompt = create_legal_analysis_prompt(analysis_input, conversation_history, facts=facts)
+
+    # Documents get a digest - later prompts point at it instead of re-sending the whole thing
+    message = Message('user', user_message, is_document=is_document,
+                      digest=document_digest(user_message) if is_document else None)
+    # Summarised once, here - the store keeps it for when this is an old turn
+    summarise_turn(message)
+    conversation_store.append(session_id, message)
+    stateless = not conversation_history and not is_document
+    return prompt, stateless
+
+def finish_chat_turn(session_id, assistant_message):
+    # Save the assistant's answer once we have all of it, parsed into its
+    # sections so history and the frontend never have to re-parse the text
+    structured = parse_answer(assistant_message)
+    message = Message('assistant', assistant_message, structured=structured)
+    summarise_turn(message)
+    conversation_store.append(session_id, message)
+    return structured
+
+def reused_answer(user_message, stateless):
+    # (answer, reuse record) from an earlier near-identical question, or None
+    if not stateless or not semantic_cache.enabled():
+        return None
+    return semantic_cache.get(user_message, model.model_name)
+
+def remember_answer(user_message, answer, stateless):
+    if stateless and semantic_cache.enabled():
+        semantic_cache.set(user_message, model.model_name, answer)
+
+def audit_reuse(reuse, prompt, answer):
+    # Every so often ask the model again for a reused answer, off the request
+    # path. A different category or risk level means the earlier answer
+    # probably didn't fit this question, and the reuse gets flagged
+    if random.random() >= SEMANTIC_CACHE_AUDIT_RATE:
+        return
+
+    def check():
+        try:
+            fresh = generate_text(prompt)
+        except Exception as e:
+            count_error('semantic_audit', e)
+            return
+        reused = parse_analysis(answer, LEGAL_CATEGORIES) or {}
+        fresh = parse_analysis(fresh, LEGAL_CATEGORIES) or {}
+        semantic_cache.record_audit(reuse['reuse_id'], all(
+            reused.get(field) == fresh.get(field) for field in ('category_key', 'risk_level')))
+    audit_executor.submit(check)
+
+def reuse_info(reuse):
+    return {'reuse_id': reuse['reuse_id'], 'similarity': reuse['similarity'],
+            'matched_question': reuse['matched_question']}
+
+def glossary_terms(text):
+    # Where glossary terms appear in an answer, as JavaScript string offsets
+    return glossary_index.annotate(text, utf16=True)
+
+def read_chat_request():
+    # Pull message + document flag out of the JSON body
+    data = request.json or {}
+    return data.get('message', '').strip(), data.get('is_document', False)
+
+def percentile(values, pct):
+    # Nearest-rank percentile, good enough for the stats endpoints
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+def sse_event(event, payload):
+    # Format one Server-Sent Event
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if profiler:
+        g.profile_started = profiler.start()
+
+@app.after_request
+def remember_status(response):
+    g.response_status = response.status_code
+    return response
+
+@app.teardown_request
+def record_request(error=None):
+    # Runs after a streamed body has finished too, so streams are timed in full
+    started = g.get('request_started')
+    if started is None:
+        return
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    request_latency.observe(time.perf_counter() - started, route=route, method=request.method)
+    requests_total.inc(route=route, method=request.method, status=str(500 if error else g.get('response_status', 500)))
+    if error:
+        count_error('request', error)
+    if profiler:
+        profiler.stop(g.profile_started, f"{request.method} {route}")
 
 @app.route('/')
 def index():
     # Main page - just render the template
-    if 'session_id' not in session:
-        session['session_id'] = str(uuid.uuid4())
-        conversation_storage[session['session_id']] = []
+    get_session_id()
     return render_template('index.html', disclaimer=LEGAL_DISCLAIMER)
 
 @app.route('/api/chat', methods=['POST'])
@@ -441,113 +682,380 @@ def chat():
             'error': 'Gemini API not configured. Please set GEMINI_API_KEY environment variable.'
         }), 500
 
-    data = request.json
-    user_message = data.get('message', '').strip()
-    is_document = data.get('is_document', False)
+    user_message, is_document = read_chat_request()
     
     if not user_message:
         return jsonify({'error': 'Message cannot be empty'}), 400
 
-    # Create session if it doesn't exist
-    if 'session_id' not in session:
-        session['session_id'] = str(uuid.uuid4())
-        conversation_storage[session['session_id']] = []
+    limited = check_rate_limit()
+    if limited:
+        return limited
 
-    session_id = session['session_id']
-    
-    # Get the conversation history
-    conversation_history = conversation_storage.get(session_id, [])
-    
-    # Save user's message
-    conversation_history.append({
-        'role': 'user',
-        'content': user_message,
-        'timestamp': datetime.now().isoformat(),
-        'is_document': is_document
-    })
+    session_id = get_session_id()
+    # Documents: dates, amounts, parties... found locally, before the model
+    facts = find_facts(user_message) if is_document else None
     
     try:
-        # Build the prompt with conversation history
-        prompt = create_legal_analysis_prompt(user_message, conversation_history[:-1])
+        # Save user's message and build the prompt with conversation history
+        prompt, stateless = start_chat_turn(session_id, user_message, is_document, facts)
         
-        # Call Gemini
-        response = model.generate_content(prompt)
-        assistant_message = response.text
+        # Someone may already have asked this, in other words
+        reused = reused_answer(user_message, stateless)
+        if reused:
+            assistant_message, reuse = reused
+            audit_reuse(reuse, prompt, assistant_message)
+        else:
+            # Call Gemini
+            assistant_message = generate_text(prompt)
+            remember_answer(user_message, assistant_message, stateless)
         
         # Save the response too
-        conversation_history.append({
-            'role': 'assistant',
-            'content': assistant_message,
-            'timestamp': datetime.now().isoformat()
-        })
+        structured = finish_chat_turn(session_id, assistant_message)
         
-        # Update the storage
-        conversation_storage[session_id] = conversation_history
-        
-        return jsonify({
+        payload = {
             'message': assistant_message,
-            'session_id': session_id
-        })
+            'session_id': session_id,
+            'structured': structured,
+            'glossary_terms': glossary_terms(assistant_message)
+        }
+        if facts is not None:
+            payload['facts'] = facts
+        if reused:
+            payload['reused'] = reuse_info(reuse)
+        return jsonify(payload)
         
+    except PromptTooLarge as e:
+        return prompt_too_large(e)
+    except Overloaded as e:
+        return too_busy(e)
+    except UPSTREAM_ERRORS as e:
+        count_error('chat', e)
+        answer = degraded_chat_answer(user_message)
+        payload = {'message': answer, 'session_id': session_id, 'glossary_terms': glossary_terms(answer)}
+        if facts is not None:
+            payload['facts'] = facts
+        return degraded_response(payload, e)
     except Exception as e:
+        count_error('chat', e)
         error_msg = f"Error processing request: {str(e)}"
         print(error_msg)  # TODO: maybe use proper logging later
         return jsonify({'error': error_msg}), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    # Same as chat() but sends the answer back as Server-Sent Events while
+    # Gemini is still generating it, so the user sees text right away
+    started = time.perf_counter()
+    if not model:
+        return jsonify({
+            'error': 'Gemini API not configured. Please set GEMINI_API_KEY environment variable.'
+        }), 500
+
+    user_message, is_document = read_chat_request()
+
+    if not user_message:
+        return jsonify({'error': 'Message cannot be empty'}), 400
+
+    limited = check_rate_limit()
+    if limited:
+        return limited
+    # Once the stream has started we can't send a 429 any more, so turn the
+    # request away now if the model queue is already full
+    try:
+        admission.check()
+    except Overloaded as e:
+        return too_busy(e)
+
+    session_id = get_session_id()
+
+    def generate():
+        parts = []
+        ttfb_ms = None
+        try:
+            if is_document and document_pipeline.should_chunk(user_message):
+                # Let the browser know why the first words will take a bit longer
+                yield sse_event('status', {'status': 'Analysing long document in sections...'})
+            facts = None
+            if is_document:
+                # Found locally in milliseconds - the browser gets them before the model starts
+                facts = find_facts(user_message)
+                yield sse_event('facts', facts)
+            prompt, stateless = start_chat_turn(session_id, user_message, is_document, facts)
+            reused = reused_answer(user_message, stateless)
+            if reused:
+                # Already answered in other words - send it all as one chunk
+                assistant_message, reuse = reused
+                ttfb_ms = (time.perf_counter() - started) * 1000
+                yield sse_event('chunk', {'text': assistant_message})
+                audit_reuse(reuse, prompt, assistant_message)
+            else:
+                # Streams can't be retried or hedged once text has gone out, but
+                # they still go through the breaker and get timed out if the
+                # model stalls before or between chunks
+                with admission.slot(), resilience.guard():
+                    model_started = time.perf_counter()
+                    for chunk in resilience.stream(lambda: model.generate_content(prompt, stream=True)):
+                        text = chunk.text
+                        if not text:
+                            continue
+                        if ttfb_ms is None:
+                            ttfb_ms = (time.perf_counter() - started) * 1000
+                            stream_timings.append(ttfb_ms)
+                            model_first_token.observe(time.perf_counter() - model_started)
+                        parts.append(text)
+                        yield sse_event('chunk', {'text': text})
+                    model_latency.observe(time.perf_counter() - model_started, mode='stream')
+
+                assistant_message = ''.join(parts)
+                prompt_size.observe(len(prompt))
+                response_size.observe(len(assistant_message))
+                remember_answer(user_message, assistant_message, stateless)
+            structured = finish_chat_turn(session_id, assistant_message)
+            total_ms = (time.perf_counter() - started) * 1000
+            print(f"[stream] session={session_id[:8]} ttfb={ttfb_ms or 0:.0f}ms total={total_ms:.0f}ms chars={len(assistant_message)}"
+                  + (" (reused)" if reused else ""))
+            done = {
+                'session_id': session_id,
+                'ttfb_ms': round(ttfb_ms, 1) if ttfb_ms is not None else None,
+                'total_ms': round(total_ms, 1),
+                'structured': structured,
+                'glossary_terms': glossary_terms(assistant_message)
+            }
+            if reused:
+                done['reused'] = reuse_info(reuse)
+            yield sse_event('done', done)
+        except PromptTooLarge as e:
+            yield sse_event('error', e.to_dict())
+        except Overloaded as e:
+            rejections_total.inc(reason=e.reason)
+            yield sse_event('error', {'error': str(e), 'retry_after': e.retry_after})
+        except UPSTREAM_ERRORS as e:
+            count_error('chat_stream', e)
+            if parts:
+                yield sse_event('error', {'error': f"Error processing request: {str(e)}"})
+            else:
+                answer = degraded_chat_answer(user_message)
+                yield sse_event('chunk', {'text': answer})
+                yield sse_event('done', {'session_id': session_id, 'degraded': True,
+                                         'retry_after': getattr(e, 'retry_after', 10),
+                                         'glossary_terms': glossary_terms(answer)})
+        except Exception as e:
+            count_error('chat_stream', e)
+            error_msg = f"Error processing request: {str(e)}"
+            print(error_msg)
+            yield sse_event('error', {'error': error_msg})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # stop nginx from buffering the stream
+    })
+
+@app.route('/api/chat/stream/stats', methods=['GET'])
+def chat_stream_stats():
+    # Time-to-first-byte numbers for recent streamed answers
+    timings = list(stream_timings)
+    return jsonify({
+        'count': len(timings),
+        'ttfb_ms_p50': percentile(timings, 50),
+        'ttfb_ms_p95': percentile(timings, 95),
+        'ttfb_ms_max': max(timings) if timings else None
+    })
+
 @app.route('/api/clear', methods=['POST'])
 def clear_session():
     # Clear the conversation - user clicked clear button
     if 'session_id' in session:
-        session_id = session['session_id']
-        if session_id in conversation_storage:
-            del conversation_storage[session_id]
+        conversation_store.delete(session['session_id'])
     session.clear()
     return jsonify({'status': 'session cleared'})
 
+# The reference data never changes while we run, so these responses are
+# serialized, gzipped and ETagged once here (see static_responses.py)
+static_responses = StaticResponses(max_age=STATIC_MAX_AGE)
+
+def build_static_responses():
+    def add(name, payload):
+        # Same bytes jsonify would send
+        static_responses.add(name, app.json.response(payload).get_data())
+
+    add('disclaimer', {'disclaimer': LEGAL_DISCLAIMER})
+    # Template list is just the metadata
+    add('templates', {'templates': {key: {
+        'name': val['name'],
+        'category': val['category'],
+        'description': val['description']
+    } for key, val in LEGAL_TEMPLATES.items()}})
+    for template_id, template in LEGAL_TEMPLATES.items():
+        add(f'templates/{template_id}', {'id': template_id, 'template': template,
+                                         'fields': template_engine.get(template_id).describe()})
+    add('glossary', {'glossary': glossary})
+    for term_id, term in glossary.items():
+        add(f'glossary/{term_id}', {'id': term_id, 'term_data': term})
+    add('categories', {'categories': LEGAL_CATEGORIES})
+
+with app.app_context():
+    build_static_responses()
+
+def static_reply(name):
+    # The precomputed response (or a 304), None if there's no such entry
+    reply = static_responses.respond(
+        name, request.headers.get('If-None-Match', ''), request.headers.get('Accept-Encoding', '')
+    )
+    if reply is None:
+        return None
+    status, body, headers = reply
+    return Response(body, status=status, headers=headers)
+
 @app.route('/api/disclaimer', methods=['GET'])
 def get_disclaimer():
     # Return the disclaimer text
-    return jsonify({'disclaimer': LEGAL_DISCLAIMER})
+    return static_reply('disclaimer')
 
 @app.route('/api/templates', methods=['GET'])
 def get_templates():
     # Get list of all templates (just metadata)
-    templates_list = {key: {
-        'name': val['name'],
-        'category': val['category'],
-        'description': val['description']
-    } for key, val in LEGAL_TEMPLATES.items()}
-    return jsonify({'templates': templates_list})
+    return static_reply('templates')
 
 @app.route('/api/templates/<template_id>', methods=['GET'])
 def get_template(template_id):
     # Get a specific template by ID
-    if template_id in LEGAL_TEMPLATES:
-        return jsonify({
-            'id': template_id,
-            'template': LEGAL_TEMPLATES[template_id]
+    return static_reply(f'templates/{template_id}') or (jsonify({'error': 'Template not found'}), 404)
+
+@app.route('/api/templates/<template_id>/fill', methods=['POST'])
+def fill_template(template_id):
+    # Fill one template for many rows (e.g. a CSV of counterparties) and
+    # stream the documents back as NDJSON lines or a zip, a row at a time.
+    # Rows: a CSV body (text/csv) or upload (multipart "file"), read a row
+    # at a time, or JSON {"rows": [...], "defaults": {...}}. For CSV, query string
+    # values other than format / filename_field are the same for every row
+    template = template_engine.get(template_id)
+    if template is None:
+        return jsonify({'error': 'Template not found'}), 404
+    output = request.args.get('format', 'ndjson')
+    if output not in ('ndjson', 'zip'):
+        return jsonify({'error': 'format must be ndjson or zip'}), 400
+    filename_field = field_name(request.args.get('filename_field', '')) or None
+    defaults = normalise_row({key: value for key, value in request.args.items()
+                              if key not in ('format', 'filename_field')})
+
+    if request.mimetype == 'multipart/form-data' or request.mimetype in ('text/csv', 'application/csv'):
+        if request.mimetype == 'multipart/form-data':
+            upload = request.files.get('file')
+            if upload is None:
+                return jsonify({'error': 'No file uploaded'}), 400
+            source = upload.stream
+        else:
+            # Read the whole body before answering (spilling to disk past
+            # 1MB) - a client that sends everything before it reads would
+            # otherwise deadlock against our streamed response
+            source = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+            shutil.copyfileobj(request.stream, source)
+            source.seek(0)
+        reader = csv.DictReader(io.TextIOWrapper(source, encoding='utf-8-sig', newline=''))
+        columns = {field_name(column) for column in (reader.fieldnames or []) if column}
+        missing = [field for field in template.required if field not in columns and field not in defaults]
+        if missing:
+            return jsonify({'error': 'CSV is missing columns for some fields', 'missing': missing,
+                            **template.describe()}), 400
+        rows = reader
+    else:
+        data = request.get_json(silent=True) or {}
+        rows = data.get('rows')
+        if not isinstance(rows, list) or not rows or not all(isinstance(row, dict) for row in rows):
+            return jsonify({'error': 'rows must be a non-empty list of objects', **template.describe()}), 400
+        defaults.update(normalise_row(data.get('defaults') or {}))
+
+    def filled():
+        # (row number, values, document or None, missing fields)
+        for number, row in enumerate(rows, 1):
+            if number > TEMPLATE_FILL_MAX_ROWS:
+                yield number, None, None, f'more than {TEMPLATE_FILL_MAX_ROWS} rows, stopped here'
+                return
+            values = dict(defaults)
+            values.update(normalise_row(row))
+            missing = template.missing(values)
+            yield number, values, None if missing else template.render(values), missing
+
+    def error_line(number, missing):
+        if isinstance(missing, str):
+            return {'row': number, 'error': missing}
+        return {'row': number, 'error': 'Missing fields', 'missing': missing}
+
+    def ndjson():
+        count = 0
+
+        def lines():
+            nonlocal count
+            for number, values, document, missing in filled():
+                if document is None:
+                    line = error_line(number, missing)
+                else:
+                    count += 1
+                    line = {'row': number, 'document': document}
+                    if filename_field:
+                        line['id'] = values.get(filename_field)
+                yield (json.dumps(line) + '\n').encode('utf-8')
+
+        try:
+            yield from in_pieces(lines())
+        finally:
+            template_documents.inc(count, template=template_id, format='ndjson')
+
+    def archive():
+        errors = []
+        count = 0
+
+        def files():
+            nonlocal count
+            for number, values, document, missing in filled():
+                if document is None:
+                    errors.append(json.dumps(error_line(number, missing)))
+                    continue
+                count += 1
+                suffix = ''
+                if filename_field and values.get(filename_field):
+                    suffix = '-' + re.sub(r'[^A-Za-z0-9_.-]+', '_', values[filename_field]).strip('_')[:60]
+                yield f"{template_id}-{number:06d}{suffix}.txt", document
+            if errors:
+                yield 'errors.ndjson', '\n'.join(errors) + '\n'
+
+        try:
+            yield from in_pieces(zip_stream(files()))
+        finally:
+            template_documents.inc(count, template=template_id, format='zip')
+
+    if output == 'zip':
+        return Response(stream_with_context(archive()), mimetype='application/zip', headers={
+            'Content-Disposition': f'attachment; filename="{template_id}-filled.zip"'
         })
-    return jsonify({'error': 'Template not found'}), 404
+    return Response(stream_with_context(ndjson()), mimetype='application/x-ndjson')
 
 @app.route('/api/glossary', methods=['GET'])
 def get_glossary():
     # Return all glossary terms
-    return jsonify({'glossary': LEGAL_GLOSSARY})
+    return static_reply('glossary')
 
 @app.route('/api/glossary/<term_id>', methods=['GET'])
 def get_term(term_id):
     # Get a specific term definition
-    if term_id in LEGAL_GLOSSARY:
-        return jsonify({
-            'id': term_id,
-            'term_data': LEGAL_GLOSSARY[term_id]
-        })
-    return jsonify({'error': 'Term not found'}), 404
+    return static_reply(f'glossary/{term_id}') or (jsonify({'error': 'Term not found'}), 404)
+
+@app.route('/api/glossary/search', methods=['GET'])
+def search_glossary():
+    # Prefix + typo-tolerant term lookup, e.g. ?q=indemn or ?q=arbitartion
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'No search query provided'}), 400
+    try:
+        limit = max(1, min(50, int(request.args.get('limit', 10))))
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+    return jsonify({'query': query, 'results': glossary_index.search(query, limit=limit)})
 
 @app.route('/api/categories', methods=['GET'])
 def get_categories():
     # Return the categories we have
-    return jsonify({'categories': LEGAL_CATEGORIES})
+    return static_reply('categories')
 
 @app.route('/api/cite', methods=['POST'])
 def format_citation():
@@ -558,29 +1066,58 @@ def format_citation():
     if not citation_text:
         return jsonify({'error': 'Citation text required'}), 400
     
-    try:
-        # Ask Gemini to format it properly
-        citation_prompt = f"""Format the following legal citation in proper Bluebook or standard legal citation format:
-
-"{citation_text}"
+    # Same citation + same model = same answer, no need to ask again
+    cache_key = make_key('cite', model.model_name, citation_text)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return jsonify({
+            'original': citation_text,
+            'formatted': cached
+        })
 
-Provide:
-1. Formatted citation in proper legal style
-2. Citation type (Case, Statute, Regulation, etc.)
-3. Jurisdiction (if applicable)
-4. Brief explanation of the source
+    limited = check_rate_limit()
+    if limited:
+        return limited
 
-Format your response as JSON with keys: formatted_citation, citation_type, jurisdiction, explanation"""
-        
-        response = model.generate_content(citation_prompt)
+    try:
+        # Ask Gemini to format it properly
+        formatted = generate_text(create_citation_prompt(citation_text))
+        response_cache.set(cache_key, formatted)
         
         return jsonify({
             'original': citation_text,
-            'formatted': response.text
+            'formatted': formatted
         })
+    except PromptTooLarge as e:
+        return prompt_too_large(e)
+    except Overloaded as e:
+        return too_busy(e)
+    except UPSTREAM_ERRORS as e:
+        # An expired answer beats no answer for a citation
+        count_error('cite', e)
+        stale = response_cache.get_stale(cache_key)
+        if stale is not None:
+            return degraded_response({'original': citation_text, 'formatted': stale, 'stale': True}, e)
+        return degraded_response({'error': 'Citation formatting is temporarily unavailable'}, e, 503)
     except Exception as e:
+        count_error('cite', e)
         return jsonify({'error': f'Error formatting citation: {str(e)}'}), 500
 
+def classify_with_model(text):
+    # Ask Gemini for the category - used when the local classifier isn't confident
+    return generate_text(create_category_prompt(text))
+
+def local_category_answer(local, short_text):
+    # Response from the local classifier (sure about it, or the model is down)
+    return {
+        'text': short_text,
+        'category_analysis': (f"{local['name']} - the text mentions {', '.join(local['matched'])}."
+                              if local['matched'] else f"{local['name']} - best guess, no clear keywords."),
+        'category': local['category'],
+        'confidence': local['confidence'],
+        'source': 'local'
+    }
+
 @app.route('/api/analyze-category', methods=['POST'])
 def analyze_category():
     # Figure out what category of law this is
@@ -589,25 +1126,347 @@ def analyze_category():
     
     if not text:
         return jsonify({'error': 'Text required'}), 400
-    
-    try:
-        category_prompt = f"""Analyze the following legal text/question and identify the primary legal category:
 
-"{text}"
+    short_text = text[:100] + '...' if len(text) > 100 else text
 
-Categories: Contract Law, Employment Law, Intellectual Property, Compliance, Corporate Law, Privacy & Data, Real Estate, Litigation, or Other.
+    # Local classifier first - most questions don't need a model round trip
+    local = category_classifier.classify(text)
+    if local['confidence'] >= CATEGORY_CONFIDENCE_THRESHOLD:
+        return jsonify(local_category_answer(local, short_text))
 
-Respond with only the category name and a brief 1-sentence explanation."""
-        
-        response = model.generate_content(category_prompt)
+    cache_key = make_key('category', model.model_name, text)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return jsonify({
+            'text': short_text,
+            'category_analysis': cached,
+            'confidence': local['confidence'],
+            'source': 'cache'
+        })
+
+    limited = check_rate_limit()
+    if limited:
+        return limited
+
+    try:
+        category_analysis = classify_with_model(text)
+        response_cache.set(cache_key, category_analysis)
         
         return jsonify({
-            'text': text[:100] + '...' if len(text) > 100 else text,
-            'category_analysis': response.text
+            'text': short_text,
+            'category_analysis': category_analysis,
+            'confidence': local['confidence'],
+            'source': 'model'
         })
+    except PromptTooLarge as e:
+        return prompt_too_large(e)
+    except Overloaded as e:
+        return too_busy(e)
+    except UPSTREAM_ERRORS as e:
+        # Fall back to an old answer, or the local classifier's best guess
+        count_error('analyze_category', e)
+        stale = response_cache.get_stale(cache_key)
+        if stale is not None:
+            return degraded_response({'text': short_text, 'category_analysis': stale,
+                                      'confidence': local['confidence'], 'source': 'stale-cache'}, e)
+        return degraded_response(dict(local_category_answer(local, short_text), source='local-fallback'), e)
     except Exception as e:
+        count_error('analyze_category', e)
         return jsonify({'error': f'Error analyzing category: {str(e)}'}), 500
 
+@app.route('/api/batch', methods=['POST'])
+def submit_batch():
+    # Queue a list of documents for analysis - either plain strings or
+    # {"id": ..., "text": ...}. Returns straight away with a job id
+    data = request.json or {}
+    documents = data.get('documents')
+    if not isinstance(documents, list) or not documents:
+        return jsonify({'error': 'documents must be a non-empty list'}), 400
+    if len(documents) > BATCH_MAX_DOCUMENTS:
+        return jsonify({'error': f'Too many documents (max {BATCH_MAX_DOCUMENTS} per batch)'}), 413
+
+    cleaned = []
+    for index, document in enumerate(documents):
+        if isinstance(document, str):
+            document = {'text': document}
+        text = document.get('text', '').strip() if isinstance(document, dict) else ''
+        if not text:
+            return jsonify({'error': f'Document {index} has no text'}), 400
+        cleaned.append({'id': str(document.get('id', index)), 'text': text})
+
+    job = batch_queue.submit(cleaned)
+    if job is None:
+        return jsonify({'error': 'Too many batch jobs running, try again later'}), 503
+
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status(),
+        'total': job.total,
+        'status_url': f'/api/batch/{job.id}',
+        'results_url': f'/api/batch/{job.id}/results'
+    }), 202
+
+@app.route('/api/batch/<job_id>', methods=['GET'])
+def batch_status(job_id):
+    # Progress plus whatever has finished so far (?results=0 for just the counts)
+    job = batch_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'Batch job not found'}), 404
+    return jsonify(job.progress(include_results=request.args.get('results', '1') != '0'))
+
+@app.route('/api/batch/<job_id>/results', methods=['GET'])
+def batch_results(job_id):
+    # Finished results as NDJSON, one line per document as soon as it's done
+    job = batch_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'Batch job not found'}), 404
+
+    def generate():
+        for result in batch_queue.stream_results(job):
+            yield json.dumps(result) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def analyse_changes(changes, title):
+    # Model view of each changed clause, keyed by id(change). Changes seen
+    # before (same clause text before and after) come from the cache
+    results = {}
+    missing = []
+    for change in changes:
+        cached = response_cache.get(make_key('clause-change', model.model_name, change_key(change)))
+        if cached is not None:
+            results[id(change)] = cached
+        else:
+            missing.append(change)
+
+    batches = [missing[i:i + COMPARE_CHANGES_PER_CALL] for i in range(0, len(missing), COMPARE_CHANGES_PER_CALL)]
+    prompts = [change_prompt(batch, title) for batch in batches]
+    futures = [document_pipeline.executor.submit(generate_text, prompt) for prompt in prompts]
+    for batch, future in zip(batches, futures):
+        for change, analysis in zip(batch, parse_change_analyses(future.result(), len(batch))):
+            if analysis is not None:
+                response_cache.set(make_key('clause-change', model.model_name, change_key(change)), analysis)
+                results[id(change)] = analysis
+    return results, {'cached': len(changes) - len(missing), 'analysed': len(missing),
+                     'model_calls': len(prompts), 'prompt_chars': sum(len(p) for p in prompts)}
+
+@app.route('/api/compare', methods=['POST'])
+def compare_documents():
+    # What changed between two versions of an agreement, clause by clause.
+    # The diff is worked out here; only the changed clauses are sent to the
+    # model for a risk read ("analyse": false to skip that)
+    started = time.perf_counter()
+    data = request.json or {}
+    original = (data.get('original') or '').strip()
+    revised = (data.get('revised') or '').strip()
+    if not original or not revised:
+        return jsonify({'error': 'Both original and revised text are required'}), 400
+    if max(len(original), len(revised)) > COMPARE_MAX_CHARS:
+        return jsonify({'error': f'Documents can be at most {COMPARE_MAX_CHARS:,} characters'}), 413
+
+    old_clauses = split_clauses(original)
+    new_clauses = split_clauses(revised)
+    changes, unchanged = diff_clauses(old_clauses, new_clauses)
+    summary = dict.fromkeys(('added', 'removed', 'modified', 'moved'), 0)
+    for change in changes:
+        summary[change['type']] += 1
+    payload = {
+        'clauses': {'original': len(old_clauses), 'revised': len(new_clauses), 'unchanged': unchanged},
+        'summary': summary,
+        'changes': [change_to_dict(change) for change in changes],
+    }
+
+    to_analyse = [change for change in changes if needs_analysis(change)]
+    if not data.get('analyse', True) or not to_analyse:
+        payload['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return jsonify(payload)
+    if not model:
+        return jsonify({
+            'error': 'Gemini API not configured. Please set GEMINI_API_KEY environment variable.'
+        }), 500
+
+    limited = check_rate_limit()
+    if limited:
+        return limited
+
+    try:
+        analyses, payload['analysis'] = analyse_changes(to_analyse, new_clauses[0].heading if new_clauses else '')
+    except PromptTooLarge as e:
+        return prompt_too_large(e)
+    except Overloaded as e:
+        return too_busy(e)
+    except UPSTREAM_ERRORS as e:
+        # The diff itself doesn't need the model
+        count_error('compare', e)
+        return degraded_response(payload, e)
+    except Exception as e:
+        count_error('compare', e)
+        return jsonify({'error': f'Error comparing documents: {str(e)}'}), 500
+
+    for change, described in zip(changes, payload['changes']):
+        if needs_analysis(change):
+            described['analysis'] = analyses.get(id(change))
+    payload['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return jsonify(payload)
+
+@app.route('/api/upload', methods=['POST'])
+def upload_document():
+    # Multipart upload (field "file") of a PDF, Word (.docx) or text file ->
+    # its text, ready to paste into the document box. Werkzeug spools big
+    # uploads to a temp file, and extraction reads it a page/paragraph at a
+    # time, so only the extracted text is ever held in memory
+    started = time.perf_counter()
+    try:
+        # Over the limit (by Content-Length, or part way through a chunked
+        # body) Werkzeug stops before parsing - see AppRequest
+        upload = request.files.get('file')
+    except RequestEntityTooLarge:
+        uploads_total.inc(format='unknown', result='too_large')
+        return jsonify({'error': f'Files can be at most {UPLOAD_MAX_BYTES // (1024 * 1024)} MB'}), 413
+    if upload is None or not upload.filename:
+        return jsonify({'error': 'No file uploaded (send it as multipart field "file")'}), 400
+
+    try:
+        digest, size = file_digest(upload.stream, UPLOAD_MAX_BYTES)
+        upload_size.observe(size)
+        cache_key = f'{digest}:{EXTRACTOR_VERSION}'
+        result = upload_cache.get(cache_key)
+        cached = result is not None
+        if cached:
+            if result['chars'] > UPLOAD_MAX_CHARS:
+                raise ExtractionError(f'This file has more than {UPLOAD_MAX_CHARS:,} characters of text', status=413)
+        else:
+            extract_started = time.perf_counter()
+            result = extract_text(upload.stream, UPLOAD_MAX_CHARS)
+            upload_extraction.observe(time.perf_counter() - extract_started, format=result['format'])
+            upload_cache.set(cache_key, result)
+    except ExtractionError as e:
+        uploads_total.inc(format='unknown', result=f'rejected_{e.status}')
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        count_error('upload', e)
+        return jsonify({'error': f'Error reading file: {str(e)}'}), 500
+
+    uploads_total.inc(format=result['format'], result='cached' if cached else 'extracted')
+    return jsonify(dict(
+        result,
+        filename=upload.filename,
+        bytes=size,
+        sha256=digest,
+        cached=cached,
+        elapsed_ms=round((time.perf_counter() - started) * 1000, 1)
+    ))
+
+@app.route('/api/history', methods=['GET'])
+def get_history():
+    # One page of this session's messages, newest page first - pass the
+    # returned next_before back as ?before= to get the page before it.
+    # ?risk=high only returns answers assessed at that level
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        before = request.args.get('before')
+        before = int(before) if before else None
+    except ValueError:
+        return jsonify({'error': 'limit and before must be integers'}), 400
+    risk = request.args.get('risk', '').lower() or None
+    if risk is not None and risk not in RISK_LEVELS:
+        return jsonify({'error': f"risk must be one of: {', '.join(RISK_LEVELS)}"}), 400
+
+    session_id = get_session_id()
+    messages, has_more = conversation_store.page(session_id, limit=limit, before=before, risk=risk)
+    return jsonify({
+        'session_id': session_id,
+        'messages': [msg.to_dict() for msg in messages],
+        'has_more': has_more,
+        'next_before': messages[0].id if has_more and messages else None
+    })
+
+@app.route('/api/history/risk', methods=['GET'])
+def history_risk():
+    # How many of this session's answers came back low / medium / high risk
+    session_id = get_session_id()
+    return jsonify({'session_id': session_id, 'risk_levels': conversation_store.risk_counts(session_id)})
+
+@app.route('/api/conversations/stats', methods=['GET'])
+def conversation_stats():
+    # Live sessions and memory held by the conversation store
+    return jsonify({'conversations': conversation_store.stats()})
+
+@app.route('/api/semantic-cache/stats', methods=['GET'])
+def semantic_cache_stats():
+    # Hit rate and false-reuse counts for the near-duplicate question cache
+    return jsonify({'semantic_cache': semantic_cache.snapshot()})
+
+@app.route('/api/semantic-cache/audit', methods=['GET'])
+def semantic_cache_audit():
+    # Recent reused answers, newest first - which question got which earlier
+    # question's answer. ?flagged=1 for only the ones flagged as wrong
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 200)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    flagged_only = request.args.get('flagged', '').lower() in ('1', 'true', 'yes')
+    return jsonify({'reuses': semantic_cache.recent(limit, flagged_only=flagged_only),
+                    'semantic_cache': semantic_cache.snapshot()})
+
+@app.route('/api/semantic-cache/audit/<int:reuse_id>/flag', methods=['POST'])
+def flag_semantic_reuse(reuse_id):
+    # Report a reused answer that didn't fit the question. The cached answer
+    # is dropped so it isn't handed out again
+    reuse = semantic_cache.flag(reuse_id)
+    if reuse is None:
+        return jsonify({'error': 'Reuse not found (only recent ones are kept)'}), 404
+    return jsonify({'reuse': reuse})
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    # Hit/miss counters for the response cache
+    return jsonify({'response_cache': response_cache.snapshot(), 'upload_cache': upload_cache.snapshot()})
+
+@app.route('/api/prompts/stats', methods=['GET'])
+def prompt_stats():
+    # Current prompt size limit, and prompts built / refused by kind
+    return jsonify({'prompts': prompt_builder.snapshot()})
+
+@app.route('/api/coalescing/stats', methods=['GET'])
+def coalescing_stats():
+    # How many model calls were saved by sharing identical in-flight prompts
+    return jsonify({'single_flight': single_flight.snapshot()})
+
+@app.route('/api/admission/stats', methods=['GET'])
+def admission_stats():
+    # Model concurrency slots, queue depth and rate-limit counters - for sizing capacity
+    return jsonify({'admission': admission.snapshot(), 'rate_limit': rate_limiter.snapshot()})
+
+@app.route('/api/resilience/stats', methods=['GET'])
+def resilience_stats():
+    # Retries, hedges, deadlines hit and circuit breaker state
+    return jsonify({'resilience': resilience.snapshot()})
+
+@app.route('/api/batch/stats', methods=['GET'])
+def batch_stats():
+    # Jobs in memory and documents still waiting for the worker pool
+    return jsonify({'batch': batch_queue.stats()})
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    # Everything above in Prometheus text format
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/startup', methods=['GET'])
+def startup_report():
+    # Where worker start-up time went, and whether the model is picked yet
+    return jsonify({
+        'timings_ms': {phase: round(seconds * 1000, 2) for phase, seconds in startup_timings.items()},
+        'model': model.discovery_status(),
+        'glossary': glossary_index.snapshot()
+    })
+
+mark_startup('routes')
+startup_timings['total'] = time.perf_counter() - STARTUP_STARTED
+print("[startup] " + " ".join(f"{phase}={seconds * 1000:.0f}ms" for phase, seconds in startup_timings.items()))
+
 if __name__ == '__main__':
     # Startup message
     print("\n" + "=" * 60)
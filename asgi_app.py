@@ -0,0 +1,324 @@
+# ASGI entry point - the same app, but the three routes that wait on the
+# model (chat, cite, analyze-category) are async, so a 30 second generation
+# doesn't hold a worker thread. One process can keep hundreds of model calls
+# in flight while /api/templates etc. still answer straight away.
+# Everything else (pages, streaming, stats...) is the normal Flask app,
+# mounted underneath and run on a small thread pool.
+#
+#   pip install starlette uvicorn a2wsgi
+#   uvicorn asgi_app:asgi_app --host 0.0.0.0 --port 5000
+#
+# Routes and JSON shapes are exactly the same as app.py - the Flask session
+# cookie is read and written here too, so both modes share sessions.
+
+import os
+import time
+
+from a2wsgi import WSGIMiddleware
+from flask import Response as FlaskResponse
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+import app as legal_app
+from admission import Overloaded
+from prompts import PromptTooLarge
+from app import (
+    CATEGORY_CONFIDENCE_THRESHOLD, UPSTREAM_ERRORS, admission, category_classifier, count_error,
+    create_category_prompt, degraded_chat_answer, glossary_terms, resilience,
+    create_citation_prompt, document_pipeline, finish_chat_turn, local_category_answer, make_key, model,
+    model_latency, prompt_size, rate_limiter, rejections_total, request_latency, requests_total,
+    response_cache, response_size, single_flight, start_chat_turn,
+    audit_reuse, remember_answer, reuse_info, reused_answer, find_facts, prompt_builder
+)
+
+flask_app = legal_app.app
+
+# Threads for the routes that still go through Flask - they're all quick
+# apart from /api/chat/stream, which keeps its thread while it streams
+ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 16))
+
+
+def open_session(request):
+    # Run Flask's own session handling against this request's cookies, so
+    # we get the same session_id the Flask routes would. Returns the
+    # session_id and any Set-Cookie headers to send back.
+    with flask_app.test_request_context(request.url.path, headers={'Cookie': request.headers.get('cookie', '')}) as ctx:
+        session_id = legal_app.get_session_id()
+        cookie_response = FlaskResponse()
+        flask_app.session_interface.save_session(flask_app, ctx.session, cookie_response)
+    return session_id, cookie_response.headers.getlist('Set-Cookie')
+
+
+def existing_session_id(request):
+    # The request's session_id if it already has one - doesn't create a session
+    cookie = request.headers.get('cookie')
+    if not cookie:
+        return None
+    with flask_app.test_request_context(request.url.path, headers={'Cookie': cookie}) as ctx:
+        return ctx.session.get('session_id')
+
+
+def json_response(payload, status_code=200, cookies=()):
+    response = JSONResponse(payload, status_code=status_code)
+    for cookie in cookies:
+        response.headers.append('set-cookie', cookie)
+    return response
+
+
+def degraded_response(payload, error, status_code=200, cookies=()):
+    # Same as app.degraded_response
+    retry_after = getattr(error, 'retry_after', 10)
+    response = json_response(dict(payload, degraded=True, retry_after=retry_after), status_code, cookies)
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def prompt_too_large(error, cookies=()):
+    return json_response(error.to_dict(), 413, cookies)
+
+
+def too_busy(error, cookies=()):
+    rejections_total.inc(reason=error.reason)
+    response = json_response({'error': str(error), 'retry_after': error.retry_after}, 429, cookies)
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+async def check_rate_limit(request):
+    # Same per-session token bucket as app.check_rate_limit
+    session_id = await run_in_threadpool(existing_session_id, request)
+    wait = rate_limiter.take(session_id or f"ip:{request.client.host if request.client else ''}")
+    if wait:
+        return too_busy(Overloaded('rate limited', wait))
+    return None
+
+
+async def read_json(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def timed(route):
+    # Same request metrics the Flask hooks record, for the async routes
+    def wrap(handler):
+        async def timed_handler(request):
+            started = time.perf_counter()
+            status = 500
+            try:
+                response = await handler(request)
+                status = response.status_code
+                return response
+            finally:
+                request_latency.observe(time.perf_counter() - started, route=route, method=request.method)
+                requests_total.inc(route=route, method=request.method, status=str(status))
+        return timed_handler
+    return wrap
+
+
+async def generate_text(prompt):
+    # Async twin of app.generate_text - identical prompts in flight share one
+    # call. One admission slot covers all of a call's attempts, as in app.py,
+    # so MODEL_MAX_CONCURRENCY means the same in both serving modes
+    prompt_builder.check('other', len(prompt))
+    async def call_model():
+        started = time.perf_counter()
+        try:
+            response = await model.generate_content_async(prompt)
+        except Exception as e:
+            count_error('model', e)
+            raise
+        finally:
+            model_latency.observe(time.perf_counter() - started, mode='async')
+        prompt_size.observe(len(prompt))
+        response_size.observe(len(response.text))
+        return response.text
+
+    async def call():
+        async with admission.slot_async():
+            return await resilience.call_async(call_model)
+    return await single_flight.do_async(make_key('prompt', model.model_name, prompt), call)
+
+
+@timed('/api/chat')
+async def chat(request):
+    await model.wait_until_ready_async()
+    if not model:
+        return json_response({
+            'error': 'Gemini API not configured. Please set GEMINI_API_KEY environment variable.'
+        }, 500)
+
+    data = await read_json(request) or {}
+    user_message = data.get('message', '').strip()
+    is_document = data.get('is_document', False)
+
+    if not user_message:
+        return json_response({'error': 'Message cannot be empty'}, 400)
+
+    limited = await check_rate_limit(request)
+    if limited:
+        return limited
+
+    # Filesystem sessions mean disk I/O - keep it off the event loop
+    session_id, cookies = await run_in_threadpool(open_session, request)
+
+    facts = None
+    try:
+        # The conversation store (sqlite), the cache lookups and the document
+        # map step all block - keep them off the event loop
+        facts = await run_in_threadpool(find_facts, user_message) if is_document else None
+        prompt, stateless = await run_in_threadpool(start_chat_turn, session_id, user_message, is_document, facts)
+
+        reused = await run_in_threadpool(reused_answer, user_message, stateless)
+        if reused:
+            assistant_message, reuse = reused
+            audit_reuse(reuse, prompt, assistant_message)
+        else:
+            assistant_message = await generate_text(prompt)
+            await run_in_threadpool(remember_answer, user_message, assistant_message, stateless)
+        structured = await run_in_threadpool(finish_chat_turn, session_id, assistant_message)
+
+        payload = {
+            'message': assistant_message,
+            'session_id': session_id,
+            'structured': structured,
+            'glossary_terms': glossary_terms(assistant_message)
+        }
+        if facts is not None:
+            payload['facts'] = facts
+        if reused:
+            payload['reused'] = reuse_info(reuse)
+        return json_response(payload, cookies=cookies)
+
+    except PromptTooLarge as e:
+        return prompt_too_large(e, cookies)
+    except Overloaded as e:
+        return too_busy(e, cookies)
+    except UPSTREAM_ERRORS as e:
+        count_error('chat', e)
+        answer = degraded_chat_answer(user_message)
+        payload = {'message': answer, 'session_id': session_id, 'glossary_terms': glossary_terms(answer)}
+        if facts is not None:
+            # Found without the model, so still good
+            payload['facts'] = facts
+        return degraded_response(payload, e, cookies=cookies)
+    except Exception as e:
+        count_error('chat', e)
+        return json_response({'error': f"Error processing request: {str(e)}"}, 500, cookies)
+
+
+@timed('/api/cite')
+async def format_citation(request):
+    data = await read_json(request)
+    if data is None:
+        return json_response({'error': 'Invalid JSON body'}, 400)
+    citation_text = data.get('citation', '').strip()
+
+    if not citation_text:
+        return json_response({'error': 'Citation text required'}, 400)
+
+    await model.wait_until_ready_async()
+    cache_key = make_key('cite', model.model_name, citation_text)
+    # With RESPONSE_CACHE_DB set every cache call is a sqlite query - keep
+    # them off the event loop (same in analyze_category)
+    cached = await run_in_threadpool(response_cache.get, cache_key)
+    if cached is not None:
+        return json_response({
+            'original': citation_text,
+            'formatted': cached
+        })
+
+    limited = await check_rate_limit(request)
+    if limited:
+        return limited
+
+    try:
+        formatted = await generate_text(create_citation_prompt(citation_text))
+        await run_in_threadpool(response_cache.set, cache_key, formatted)
+
+        return json_response({
+            'original': citation_text,
+            'formatted': formatted
+        })
+    except PromptTooLarge as e:
+        return prompt_too_large(e)
+    except Overloaded as e:
+        return too_busy(e)
+    except UPSTREAM_ERRORS as e:
+        count_error('cite', e)
+        stale = await run_in_threadpool(response_cache.get_stale, cache_key)
+        if stale is not None:
+            return degraded_response({'original': citation_text, 'formatted': stale, 'stale': True}, e)
+        return degraded_response({'error': 'Citation formatting is temporarily unavailable'}, e, 503)
+    except Exception as e:
+        count_error('cite', e)
+        return json_response({'error': f'Error formatting citation: {str(e)}'}, 500)
+
+
+@timed('/api/analyze-category')
+async def analyze_category(request):
+    data = await read_json(request)
+    if data is None:
+        return json_response({'error': 'Invalid JSON body'}, 400)
+    text = data.get('text', '').strip()
+
+    if not text:
+        return json_response({'error': 'Text required'}, 400)
+
+    short_text = text[:100] + '...' if len(text) > 100 else text
+
+    local = category_classifier.classify(text)
+    if local['confidence'] >= CATEGORY_CONFIDENCE_THRESHOLD:
+        return json_response(local_category_answer(local, short_text))
+
+    await model.wait_until_ready_async()
+    cache_key = make_key('category', model.model_name, text)
+    cached = await run_in_threadpool(response_cache.get, cache_key)
+    if cached is not None:
+        return json_response({
+            'text': short_text,
+            'category_analysis': cached,
+            'confidence': local['confidence'],
+            'source': 'cache'
+        })
+
+    limited = await check_rate_limit(request)
+    if limited:
+        return limited
+
+    try:
+        category_analysis = await generate_text(create_category_prompt(text))
+        await run_in_threadpool(response_cache.set, cache_key, category_analysis)
+
+        return json_response({
+            'text': short_text,
+            'category_analysis': category_analysis,
+            'confidence': local['confidence'],
+            'source': 'model'
+        })
+    except PromptTooLarge as e:
+        return prompt_too_large(e)
+    except Overloaded as e:
+        return too_busy(e)
+    except UPSTREAM_ERRORS as e:
+        count_error('analyze_category', e)
+        stale = await run_in_threadpool(response_cache.get_stale, cache_key)
+        if stale is not None:
+            return degraded_response({'text': short_text, 'category_analysis': stale,
+                                      'confidence': local['confidence'], 'source': 'stale-cache'}, e)
+        return degraded_response(dict(local_category_answer(local, short_text), source='local-fallback'), e)
+    except Exception as e:
+        count_error('analyze_category', e)
+        return json_response({'error': f'Error analyzing category: {str(e)}'}, 500)
+
+
+asgi_app = Starlette(routes=[
+    Route('/api/chat', chat, methods=['POST']),
+    Route('/api/cite', format_citation, methods=['POST']),
+    Route('/api/analyze-category', analyze_category, methods=['POST']),
+    Mount('/', app=WSGIMiddleware(flask_app, workers=ASGI_WSGI_THREADS)),
+])
@@ -0,0 +1,184 @@
+# Background queue for /api/batch
+# A batch job is a list of documents analysed on a shared worker pool, so at
+# most `concurrency` model calls are running no matter how many jobs are
+# queued. Transient API errors (503, quota, timeouts, a full admission
+# queue, an open circuit) are retried with exponential backoff - the retry
+# waits on a timer, not in a worker, so it doesn't hold up the rest of the queue.
+# Jobs live in memory in the process that accepted them.
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from admission import Overloaded
+from resilience import TRANSIENT_ERRORS, CircuitOpen
+
+# Model calls already retry briefly (resilience.py) - these are retried
+# again here, with longer waits, since a batch isn't in a hurry
+RETRYABLE_ERRORS = (Overloaded, CircuitOpen) + TRANSIENT_ERRORS
+
+
+class BatchJob:
+
+    def __init__(self, documents):
+        self.id = uuid.uuid4().hex
+        self.documents = documents
+        self.created_at = time.time()
+        self.started = False
+        self.finished_at = None
+        # Finished items in the order they finished - what /results streams
+        self.results = []
+        self.succeeded = 0
+        self.failed = 0
+        self.retries = 0
+        self.condition = threading.Condition()
+
+    @property
+    def total(self):
+        return len(self.documents)
+
+    @property
+    def done(self):
+        return len(self.results) == self.total
+
+    def status(self):
+        if self.done:
+            return 'completed'
+        return 'running' if self.started else 'queued'
+
+    def progress(self, include_results=True):
+        with self.condition:
+            data = {
+                'job_id': self.id,
+                'status': self.status(),
+                'total': self.total,
+                'completed': len(self.results),
+                'succeeded': self.succeeded,
+                'failed': self.failed,
+                'pending': self.total - len(self.results),
+                'retries': self.retries,
+                'elapsed_s': round((self.finished_at or time.time()) - self.created_at, 3),
+            }
+            if include_results:
+                data['results'] = list(self.results)
+        return data
+
+
+class BatchQueue:
+
+    def __init__(self, analyse, concurrency=4, max_retries=2, retry_backoff=1.0, job_ttl=3600, max_jobs=100,
+                 parse=None):
+        self.analyse = analyse
+        # Optional analysis text -> structured fields, added to each result
+        self.parse = parse
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.job_ttl = job_ttl
+        self.max_jobs = max_jobs
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch')
+        self.lock = threading.Lock()
+        self.jobs = OrderedDict()
+
+    def _prune(self):
+        # Caller holds the lock. Drops finished jobs past their TTL, then the
+        # oldest finished ones if there are still too many
+        now = time.time()
+        for job_id, job in list(self.jobs.items()):
+            if job.finished_at and now - job.finished_at > self.job_ttl:
+                del self.jobs[job_id]
+        for job_id, job in list(self.jobs.items()):
+            if len(self.jobs) < self.max_jobs:
+                break
+            if job.finished_at:
+                del self.jobs[job_id]
+
+    def submit(self, documents):
+        # documents: list of {'id': ..., 'text': ...}. Returns the job, or
+        # None if too many jobs are still running
+        with self.lock:
+            self._prune()
+            if len(self.jobs) >= self.max_jobs:
+                return None
+            job = BatchJob(documents)
+            self.jobs[job.id] = job
+        for index in range(job.total):
+            self.executor.submit(self._run, job, index, 1)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _run(self, job, index, attempt):
+        document = job.documents[index]
+        job.started = True
+        started = time.perf_counter()
+        try:
+            analysis = self.analyse(document['text'])
+        except RETRYABLE_ERRORS as e:
+            if attempt <= self.max_retries:
+                with job.condition:
+                    job.retries += 1
+                delay = self.retry_backoff * (2 ** (attempt - 1))
+                timer = threading.Timer(delay, self.executor.submit, (self._run, job, index, attempt + 1))
+                timer.daemon = True
+                timer.start()
+                return
+            self._finish(job, index, attempt, started, error=f"{type(e).__name__}: {e}")
+        except Exception as e:
+            self._finish(job, index, attempt, started, error=f"{type(e).__name__}: {e}")
+        else:
+            self._finish(job, index, attempt, started, analysis=analysis)
+
+    def _finish(self, job, index, attempt, started, analysis=None, error=None):
+        result = {
+            'index': index,
+            'id': job.documents[index]['id'],
+            'status': 'error' if error else 'ok',
+            'attempts': attempt,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+        }
+        if error:
+            result['error'] = error
+        else:
+            result['analysis'] = analysis
+            if self.parse:
+                result['structured'] = self.parse(analysis)
+        with job.condition:
+            job.results.append(result)
+            if error:
+                job.failed += 1
+            else:
+                job.succeeded += 1
+            if job.done:
+                job.finished_at = time.time()
+            job.condition.notify_all()
+
+    def stream_results(self, job, poll_seconds=15):
+        # Yields each result as it finishes (earlier ones straight away),
+        # returns once the whole job is done
+        sent = 0
+        while True:
+            with job.condition:
+                while sent == len(job.results) and not job.done:
+                    job.condition.wait(poll_seconds)
+                new_results = job.results[sent:]
+                finished = job.done
+            for result in new_results:
+                yield result
+            sent += len(new_results)
+            if finished and sent == job.total:
+                return
+
+    def stats(self):
+        with self.lock:
+            jobs = list(self.jobs.values())
+        return {
+            'concurrency': self.concurrency,
+            'jobs': len(jobs),
+            'running_jobs': sum(1 for job in jobs if not job.done),
+            'pending_documents': sum(job.total - len(job.results) for job in jobs),
+        }
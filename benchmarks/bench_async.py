@@ -0,0 +1,209 @@
+# Threaded WSGI vs async ASGI under slow model calls
+# Both modes get the same fake backend (fixed latency, default 2 s). N
+# clients keep /api/chat busy while a probe keeps calling /api/templates.
+# Threaded mode is the Flask app on a fixed pool of worker threads (like
+# gunicorn --threads); async mode is asgi_app under uvicorn in one process.
+#
+#   python benchmarks/bench_async.py
+#   python benchmarks/bench_async.py --clients 200 --threads 16 --latency 5 --duration 20
+#   python benchmarks/bench_async.py --modes async --output async.json
+#
+# Reports chat throughput/latency and templates latency for each mode as JSON.
+
+import argparse
+import asyncio
+import contextlib
+import http.client
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_endpoints import SAMPLE_QUESTIONS, distribution, git_revision
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_threaded(flask_app, port, threads):
+    from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    class PooledWSGIServer(socketserver.ThreadingMixIn, BaseWSGIServer):
+        # A fixed number of worker threads, queueing the rest - what a
+        # threaded gunicorn/waitress worker looks like
+        request_queue_size = 1024
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.pool = ThreadPoolExecutor(max_workers=threads)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self.process_request_thread, request, client_address)
+
+    server = PooledWSGIServer('127.0.0.1', port, flask_app, handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.shutdown
+
+
+def start_async(asgi_app, port):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(asgi_app, host='127.0.0.1', port=port, log_level='warning',
+                                           backlog=2048, limit_concurrency=None))
+    thread = threading.Thread(target=lambda: asyncio.run(server.serve()), daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+        thread.join(5)
+    return stop
+
+
+def call(port, method, path, body=None):
+    # New connection per request, so a waiting client never pins a server thread
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=300)
+    try:
+        headers = {'Connection': 'close'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        connection.request(method, path, body=payload, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def run_load(port, clients, duration):
+    deadline = time.perf_counter() + duration
+    chat_latencies, probe_latencies = [], []
+    errors = {'chat': 0, 'templates': 0}
+    lock = threading.Lock()
+
+    def chat_client(index):
+        n = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                ok = call(port, 'POST', '/api/chat',
+                          {'message': SAMPLE_QUESTIONS[(index + n) % len(SAMPLE_QUESTIONS)]}) == 200
+            except OSError:
+                ok = False
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                chat_latencies.append(elapsed)
+                errors['chat'] += not ok
+            n += 1
+
+    def probe():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                ok = call(port, 'GET', '/api/templates') == 200
+            except OSError:
+                ok = False
+            with lock:
+                probe_latencies.append((time.perf_counter() - started) * 1000)
+                errors['templates'] += not ok
+            time.sleep(0.1)
+
+    threads = [threading.Thread(target=chat_client, args=(i,)) for i in range(clients)]
+    threads.append(threading.Thread(target=probe))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'duration_s': round(elapsed, 2),
+        'chat_completed': len(chat_latencies),
+        'chat_per_second': round(len(chat_latencies) / elapsed, 2),
+        'chat_latency_ms': distribution(chat_latencies, digits=1),
+        'templates_latency_ms': distribution(probe_latencies, digits=1),
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Threaded WSGI vs async ASGI with a slow model')
+    parser.add_argument('--clients', type=int, default=100, help='concurrent /api/chat clients')
+    parser.add_argument('--threads', type=int, default=8, help='worker threads in threaded mode')
+    parser.add_argument('--latency', type=float, default=2.0, help='fake model latency in seconds')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of load per mode')
+    parser.add_argument('--modes', default='threaded,async')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    os.environ['MODEL_BACKEND'] = 'fake'
+    os.environ['FAKE_LATENCY'] = f'fixed:{args.latency}'
+    # Compare the serving modes themselves, not the admission limits
+    os.environ.setdefault('MODEL_MAX_CONCURRENCY', '0')
+    os.environ.setdefault('RATE_LIMIT_PER_MINUTE', '0')
+    # Every client asks the same kind of question - without these most chats
+    # would be served from the reworded-question cache or share one in-flight call
+    os.environ.setdefault('SEMANTIC_CACHE_SIZE', '0')
+    os.environ.setdefault('SINGLE_FLIGHT', '0')
+
+    with contextlib.redirect_stdout(sys.stderr):
+        import app as legal_app
+        from asgi_app import asgi_app
+
+    results = {}
+    for mode in args.modes.split(','):
+        port = free_port()
+        if mode == 'threaded':
+            stop = start_threaded(legal_app.app, port, args.threads)
+        elif mode == 'async':
+            stop = start_async(asgi_app, port)
+        else:
+            raise SystemExit(f"Unknown mode: {mode}")
+        print(f"[bench] {mode}: {args.clients} clients for {args.duration}s", file=sys.stderr)
+        with contextlib.redirect_stdout(sys.stderr):
+            results[mode] = run_load(port, args.clients, args.duration)
+        stop()
+
+    report = {
+        'benchmark': 'async_vs_threaded',
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'git_revision': git_revision(),
+        'config': {
+            'clients': args.clients,
+            'threads': args.threads,
+            'fake_latency_s': args.latency,
+            'duration_s': args.duration,
+        },
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# /api/batch throughput against the fake backend
+# Submits one batch of N documents and streams the NDJSON results back,
+# for each BATCH_CONCURRENCY value given. With a fixed model latency the
+# ideal is concurrency / latency documents per second - the report shows
+# how close the queue gets to it.
+#
+#   python benchmarks/bench_batch.py
+#   python benchmarks/bench_batch.py --documents 400 --concurrency 4,16,64 --latency 0.5
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_endpoints import git_revision, sample_document
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch analysis throughput')
+    parser.add_argument('--documents', type=int, default=200)
+    parser.add_argument('--concurrency', default='1,4,16,32')
+    parser.add_argument('--latency', type=float, default=0.25, help='fake model latency in seconds')
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    os.environ['MODEL_BACKEND'] = 'fake'
+    os.environ['FAKE_LATENCY'] = f'fixed:{args.latency}'
+    # Let BATCH_CONCURRENCY be the only limit
+    os.environ.setdefault('MODEL_MAX_CONCURRENCY', '0')
+
+    with contextlib.redirect_stdout(sys.stderr):
+        import app as legal_app
+    from batch_jobs import BatchQueue
+
+    rng = random.Random(args.seed)
+    documents = [{'id': f'contract-{i}', 'text': sample_document(rng, clauses=rng.randint(5, 30))}
+                 for i in range(args.documents)]
+
+    results = []
+    for concurrency in (int(c) for c in args.concurrency.split(',')):
+        # Fresh queue per run so each one gets exactly this many workers
+        legal_app.batch_queue = BatchQueue(legal_app.analyse_document, concurrency=concurrency)
+        client = legal_app.app.test_client()
+
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stderr):
+            job = client.post('/api/batch', json={'documents': documents}).get_json()
+            first_result = None
+            lines = 0
+            for line in client.get(job['results_url']).response:
+                if first_result is None:
+                    first_result = time.perf_counter() - started
+                lines += line.count(b'\n')
+        elapsed = time.perf_counter() - started
+        legal_app.batch_queue.executor.shutdown()
+
+        results.append({
+            'concurrency': concurrency,
+            'documents': lines,
+            'duration_s': round(elapsed, 3),
+            'first_result_s': round(first_result, 3),
+            'docs_per_second': round(lines / elapsed, 2),
+            'ideal_docs_per_second': round(concurrency / args.latency, 2),
+        })
+
+    print(json.dumps({
+        'benchmark': 'batch',
+        'git_revision': git_revision(),
+        'fake_latency_s': args.latency,
+        'results': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# Accuracy + latency of the local category classifier vs the Gemini path
+#
+#   python benchmarks/bench_category.py            # local classifier only
+#   python benchmarks/bench_category.py --llm      # also run every example through the model
+#
+# Prints a JSON report to stdout.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from category_classifier import CategoryClassifier
+from legal_data import LEGAL_CATEGORIES, LEGAL_GLOSSARY, LEGAL_TEMPLATES
+
+EVAL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'category_eval.json')
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def category_from_answer(answer):
+    # The model answers with a category name, map it back to our keys
+    lowered = answer.lower()
+    positions = []
+    for key, info in LEGAL_CATEGORIES.items():
+        for name in (info['name'].lower(), key.replace('_', ' ')):
+            index = lowered.find(name)
+            if index != -1:
+                positions.append((index, key))
+    return min(positions)[1] if positions else None
+
+
+def summarise(name, examples, predictions, latencies, extra=None):
+    correct = sum(1 for example, predicted in zip(examples, predictions) if predicted == example['category'])
+    report = {
+        'path': name,
+        'examples': len(examples),
+        'accuracy': round(correct / len(examples), 4),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 4),
+            'p95': round(percentile(latencies, 95), 4),
+            'p99': round(percentile(latencies, 99), 4),
+            'mean': round(sum(latencies) / len(latencies), 4),
+        },
+    }
+    report.update(extra or {})
+    return report
+
+
+def run_local(examples, threshold, repeat):
+    started = time.perf_counter()
+    classifier = CategoryClassifier.from_reference_data(LEGAL_CATEGORIES, LEGAL_GLOSSARY, LEGAL_TEMPLATES)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    predictions = []
+    latencies = []
+    confident = 0
+    confident_correct = 0
+    for example in examples:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = classifier.classify(example['text'])
+            latencies.append((time.perf_counter() - started) * 1000)
+        predictions.append(result['category'])
+        if result['confidence'] >= threshold:
+            confident += 1
+            confident_correct += result['category'] == example['category']
+
+    return summarise('local', examples, predictions, latencies, {
+        'build_ms': round(build_ms, 3),
+        'threshold': threshold,
+        'answered_locally': round(confident / len(examples), 4),
+        'accuracy_when_answered_locally': round(confident_correct / confident, 4) if confident else None,
+    })
+
+
+def run_llm(examples):
+    # Imports the app so it uses whatever model backend it's configured with
+    import app
+
+    predictions = []
+    latencies = []
+    errors = 0
+    for example in examples:
+        started = time.perf_counter()
+        try:
+            answer = app.classify_with_model(example['text'])
+        except Exception:
+            answer = ''
+            errors += 1
+        latencies.append((time.perf_counter() - started) * 1000)
+        predictions.append(category_from_answer(answer))
+    return summarise('llm', examples, predictions, latencies, {
+        'model': app.model.model_name,
+        'errors': errors,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local vs Gemini category classification')
+    parser.add_argument('--llm', action='store_true', help='also benchmark the Gemini path')
+    parser.add_argument('--repeat', type=int, default=50, help='local classifications per example')
+    parser.add_argument('--threshold', type=float,
+                        default=float(os.environ.get('CATEGORY_CONFIDENCE_THRESHOLD', 0.6)))
+    args = parser.parse_args()
+
+    with open(EVAL_FILE) as f:
+        examples = json.load(f)
+
+    results = [run_local(examples, args.threshold, args.repeat)]
+    if args.llm:
+        results.append(run_llm(examples))
+    print(json.dumps({'benchmark': 'category', 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# /api/compare cost vs contract size
+# Makes synthetic agreements of growing length, edits three clauses (one
+# reworded, one removed, one added) and posts both versions to /api/compare
+# with the fake model. Prompt size should stay flat as the contract grows -
+# only the changes are sent - while re-analysing the revised version from
+# scratch grows with it. A second identical request shows the clause cache.
+# Then two worst cases for the diff itself, without the model: every clause
+# reworded (a global rename) and two unrelated agreements. Diff time must
+# stay under --max-diff-seconds, or the script exits non-zero.
+#
+#   python benchmarks/bench_compare.py
+#   python benchmarks/bench_compare.py --clauses 50,500,2000 --latency fixed:0.5
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_endpoints import git_revision
+
+WORDS = ("party shall provide services payment invoice days notice terminate agreement confidential information "
+         "liability damages warranty license property obligations rights").split()
+
+
+def agreement(rng, clauses):
+    parts = ["MASTER SERVICES AGREEMENT\n\nThis agreement is made between Acme Corp and Beta LLC."]
+    for number in range(1, clauses + 1):
+        body = ' '.join(' '.join(rng.choice(WORDS) for _ in range(12)).capitalize() + '.' for _ in range(4))
+        parts.append(f"{number}. CLAUSE {number}\n{body}")
+    return parts
+
+
+def revise(parts):
+    parts = list(parts)
+    middle = len(parts) // 2
+    parts[1] += ' Liability is capped at the fees paid in the previous twelve months.'
+    del parts[middle]
+    parts.insert(middle + 1, "NON-SOLICITATION\nNeither party shall solicit the other party's employees for 12 months.")
+    return parts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Clause-level comparison cost')
+    parser.add_argument('--clauses', default='20,200,2000')
+    parser.add_argument('--latency', default='fixed:0.2', help='fake model latency per call')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--max-diff-seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    os.environ['MODEL_BACKEND'] = 'fake'
+    os.environ['FAKE_LATENCY'] = args.latency
+    os.environ['RATE_LIMIT_PER_MINUTE'] = '0'
+    # The full re-analysis prompt is only measured, never sent - don't cap it
+    os.environ['PROMPT_MAX_CHARS'] = str(10 ** 9)
+    with contextlib.redirect_stdout(sys.stderr):
+        import app as legal_app
+
+    rng = random.Random(args.seed)
+    client = legal_app.app.test_client()
+    results = []
+    for clauses in (int(c) for c in args.clauses.split(',')):
+        parts = agreement(rng, clauses)
+        original = '\n\n'.join(parts)
+        revised = '\n\n'.join(revise(parts))
+        row = {'clauses': clauses, 'document_chars': len(revised),
+               'full_analysis_prompt_chars': len(legal_app.create_legal_analysis_prompt(revised))}
+        for attempt in ('first', 'repeat'):
+            started = time.perf_counter()
+            response = client.post('/api/compare', json={'original': original, 'revised': revised})
+            data = response.get_json()
+            if response.status_code != 200:
+                sys.exit(f"{clauses} clauses: HTTP {response.status_code} {data}")
+            row[attempt] = {
+                'ms': round((time.perf_counter() - started) * 1000, 1),
+                'changes': data['summary'],
+                'model_calls': data['analysis']['model_calls'],
+                'prompt_chars': data['analysis']['prompt_chars'],
+                'cached': data['analysis']['cached'],
+            }
+        started = time.perf_counter()
+        client.post('/api/compare', json={'original': original, 'revised': revised, 'analyse': False})
+        row['diff_only_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        results.append(row)
+
+    rewrites = []
+    for clauses in (int(c) for c in args.clauses.split(',')):
+        parts = agreement(rng, clauses)
+        original = '\n\n'.join(parts)
+        for name, revised in (('rename', original.replace('party', 'vendor')),
+                              ('unrelated', '\n\n'.join(agreement(rng, clauses)))):
+            started = time.perf_counter()
+            response = client.post('/api/compare', json={'original': original, 'revised': revised, 'analyse': False})
+            rewrites.append({'clauses': clauses, 'case': name, 'summary': response.get_json()['summary'],
+                             'seconds': round(time.perf_counter() - started, 3)})
+
+    print(json.dumps({
+        'benchmark': 'compare',
+        'git_revision': git_revision(),
+        'latency': args.latency,
+        'results': results,
+        'rewrites': rewrites,
+    }, indent=2))
+    slow = [r for r in rewrites if r['seconds'] > args.max_diff_seconds]
+    if slow:
+        sys.exit(f"diff took longer than {args.max_diff_seconds}s: {slow}")
+
+
+if __name__ == '__main__':
+    main()
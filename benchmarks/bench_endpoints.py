@@ -0,0 +1,305 @@
+# Load benchmark for every Flask endpoint
+# Drives the app with N concurrent simulated sessions, either in-process
+# through the Flask test client or over HTTP against a local threaded WSGI
+# server, with the fake model backend by default so no key or network is needed.
+#
+#   python benchmarks/bench_endpoints.py --sessions 16 --requests 50
+#   python benchmarks/bench_endpoints.py --mode server --output bench.json
+#   FAKE_LATENCY=fixed:0.2 python benchmarks/bench_endpoints.py
+#
+# Reports p50/p95/p99 latency and error counts per endpoint, overall
+# requests/second, peak RSS and prompt-size statistics as JSON.
+
+import argparse
+import contextlib
+import http.client
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SAMPLE_QUESTIONS = [
+    "What is a non-disclosure agreement and when do I need one?",
+    "Can my employer enforce a non-compete after I quit?",
+    "My landlord won't return my security deposit, what can I do?",
+    "Does GDPR apply to a small US online store?",
+    "What does an indemnification clause actually mean?",
+    "How do I register a trademark for my company name?",
+]
+FOLLOW_UPS = [
+    "Can you explain the obligations in more detail?",
+    "What are the biggest risks for me here?",
+    "What should I do next?",
+]
+CITATIONS = ["15 usc 45", "cal civ code 1542", "brown v board of education 347 us 483", "42 usc 1983"]
+
+# (name, weight) - roughly what a browsing + chatting user does
+SCENARIO = [
+    ('templates', 3), ('template', 2), ('glossary', 3), ('glossary_term', 2), ('categories', 2),
+    ('disclaimer', 1), ('analyze_category', 3), ('cite', 2), ('chat', 4), ('chat_follow_up', 2),
+    ('chat_stream', 2), ('chat_document', 1),
+]
+
+
+def sample_document(rng, clauses=40):
+    lines = ["MASTER SERVICES AGREEMENT", "",
+             "This Agreement is entered into on January 1, 2024 between Acme Corp and Widget LLC.", ""]
+    for i in range(1, clauses + 1):
+        lines.append(f"{i}. CLAUSE {i}")
+        lines.append(f"The Supplier shall deliver the services described in Schedule {i} within "
+                     f"{rng.choice([10, 30, 60, 90])} days of the Effective Date. Fees of "
+                     f"${rng.randint(1, 500) * 100:,} are payable net 30. Either party may terminate "
+                     f"on {rng.choice([30, 60, 90])} days' written notice.")
+        lines.append("")
+    return '\n'.join(lines)
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def distribution(values, digits=3):
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'p50': round(percentile(values, 50), digits),
+        'p95': round(percentile(values, 95), digits),
+        'p99': round(percentile(values, 99), digits),
+        'max': round(max(values), digits),
+        'mean': round(sum(values) / len(values), digits),
+    }
+
+
+class TestClientTransport:
+    # In-process: each session gets its own test client (and cookie jar)
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None):
+        if method == 'GET':
+            response = self.client.get(path)
+        else:
+            response = self.client.post(path, json=body)
+        data = response.get_data()  # drains streamed responses too
+        return response.status_code, data
+
+
+class HttpTransport:
+    # Over a real socket to the local WSGI server, one keep-alive connection per session
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.cookie = None
+        self.connection = http.client.HTTPConnection(host, port, timeout=120)
+
+    def request(self, method, path, body=None):
+        headers = {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        try:
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            # Server closed the keep-alive connection, reconnect once
+            self.connection.close()
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=120)
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+        data = response.read()
+        set_cookie = response.getheader('Set-Cookie')
+        if set_cookie:
+            self.cookie = set_cookie.split(';', 1)[0]
+        return response.status, data
+
+
+def run_session(session_index, transport, requests_per_session, seed, record):
+    rng = random.Random(seed + session_index)
+    names = [name for name, _ in SCENARIO]
+    weights = [weight for _, weight in SCENARIO]
+    chatted = False
+
+    transport.request('GET', '/')
+    for _ in range(requests_per_session):
+        name = rng.choices(names, weights)[0]
+        if name == 'chat_follow_up' and not chatted:
+            name = 'chat'
+
+        if name == 'templates':
+            call = ('GET', '/api/templates', None)
+        elif name == 'template':
+            call = ('GET', '/api/templates/' + rng.choice(['nda', 'employment_contract', 'privacy_policy', 'service_agreement']), None)
+        elif name == 'glossary':
+            call = ('GET', '/api/glossary', None)
+        elif name == 'glossary_term':
+            call = ('GET', '/api/glossary/' + rng.choice(['nda', 'liability', 'arbitration', 'force_majeure']), None)
+        elif name == 'categories':
+            call = ('GET', '/api/categories', None)
+        elif name == 'disclaimer':
+            call = ('GET', '/api/disclaimer', None)
+        elif name == 'analyze_category':
+            call = ('POST', '/api/analyze-category', {'text': rng.choice(SAMPLE_QUESTIONS)})
+        elif name == 'cite':
+            call = ('POST', '/api/cite', {'citation': rng.choice(CITATIONS)})
+        elif name == 'chat':
+            call = ('POST', '/api/chat', {'message': rng.choice(SAMPLE_QUESTIONS), 'is_document': False})
+        elif name == 'chat_follow_up':
+            call = ('POST', '/api/chat', {'message': rng.choice(FOLLOW_UPS), 'is_document': False})
+        elif name == 'chat_stream':
+            call = ('POST', '/api/chat/stream', {'message': rng.choice(SAMPLE_QUESTIONS), 'is_document': False})
+        else:
+            call = ('POST', '/api/chat', {'message': sample_document(rng), 'is_document': True})
+
+        method, path, body = call
+        started = time.perf_counter()
+        try:
+            status, data = transport.request(method, path, body)
+            ok = status < 400 and b'event: error' not in data[:200000]
+        except Exception:
+            ok = False
+        record(name, (time.perf_counter() - started) * 1000, ok)
+        chatted = chatted or name.startswith('chat')
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent load benchmark for the LegalEase endpoints')
+    parser.add_argument('--sessions', type=int, default=8, help='concurrent simulated sessions')
+    parser.add_argument('--requests', type=int, default=40, help='requests per session')
+    parser.add_argument('--mode', choices=['client', 'server'], default='client',
+                        help='Flask test client in-process, or HTTP against a local WSGI server')
+    parser.add_argument('--backend', default=os.environ.get('MODEL_BACKEND', 'fake'),
+                        help='model backend to benchmark against (default: fake)')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    os.environ['MODEL_BACKEND'] = args.backend
+    os.environ.setdefault('FAKE_SEED', str(args.seed))
+    os.environ.setdefault('FAKE_LATENCY', 'lognormal:-2.5,0.5')
+    # Measure raw capacity - simulated sessions are far chattier than the per-session limit
+    os.environ.setdefault('RATE_LIMIT_PER_MINUTE', '0')
+    # Every chat should reach the model, not the reworded-question cache or
+    # another session's identical in-flight call
+    os.environ.setdefault('SEMANTIC_CACHE_SIZE', '0')
+    os.environ.setdefault('SINGLE_FLIGHT', '0')
+
+    # App logging goes to stderr so stdout stays clean JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        import app as legal_app
+
+    # Record every prompt that reaches the model, whichever backend it is
+    prompt_sizes = []
+    prompt_lock = threading.Lock()
+    original_generate = legal_app.model.generate_content
+
+    def recording_generate(prompt, *a, **kw):
+        with prompt_lock:
+            prompt_sizes.append(len(prompt))
+        return original_generate(prompt, *a, **kw)
+
+    legal_app.model.generate_content = recording_generate
+
+    latencies = {}
+    errors = {}
+    lock = threading.Lock()
+
+    def record(name, elapsed_ms, ok):
+        with lock:
+            latencies.setdefault(name, []).append(elapsed_ms)
+            if not ok:
+                errors[name] = errors.get(name, 0) + 1
+
+    server = None
+    if args.mode == 'server':
+        from werkzeug.serving import make_server
+        server = make_server('127.0.0.1', 0, legal_app.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        def make_transport():
+            return HttpTransport('127.0.0.1', server.server_port)
+    else:
+        def make_transport():
+            return TestClientTransport(legal_app.app)
+
+    threads = [
+        threading.Thread(target=run_session, args=(i, make_transport(), args.requests, args.seed, record))
+        for i in range(args.sessions)
+    ]
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+
+    if server is not None:
+        server.shutdown()
+
+    total = sum(len(values) for values in latencies.values())
+    all_latencies = [value for values in latencies.values() for value in values]
+    report = {
+        'benchmark': 'endpoints',
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'config': {
+            'mode': args.mode,
+            'sessions': args.sessions,
+            'requests_per_session': args.requests,
+            'backend': args.backend,
+            'model': legal_app.model.model_name,
+            'fake_latency': os.environ.get('FAKE_LATENCY') if args.backend == 'fake' else None,
+            'seed': args.seed,
+        },
+        'duration_s': round(elapsed, 3),
+        'requests': total,
+        'errors': sum(errors.values()),
+        'requests_per_second': round(total / elapsed, 2) if elapsed else None,
+        'latency_ms': distribution(all_latencies),
+        'endpoints': {
+            name: dict(distribution(values), errors=errors.get(name, 0))
+            for name, values in sorted(latencies.items())
+        },
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                             / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1),
+        'prompt_chars': distribution(prompt_sizes, digits=1),
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
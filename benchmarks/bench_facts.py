@@ -0,0 +1,125 @@
+# Rule-based fact extraction throughput on large synthetic contracts
+# Each contract is built from numbered clauses of filler text, with known
+# dates, amounts, notice periods and deadlines planted in some of them, plus
+# parties and governing law in the opening and closing clauses. Reports time
+# per page (3,000 characters), pages per second and how many of the planted
+# facts were found.
+#
+#   python benchmarks/bench_facts.py
+#   python benchmarks/bench_facts.py --pages 10,100,1000 --repeat 5
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_endpoints import git_revision, percentile
+from fact_extractor import MAX_PER_KIND, count_facts, extract_facts
+
+PAGE_CHARS = 3000
+FILLER = ("The parties agree that the obligations set out in this clause apply to all services provided under this "
+          "agreement and to any statement of work entered into under it, and that nothing in this clause limits "
+          "any other right or remedy available at law or in equity. ")
+OPENING = ('MASTER SERVICES AGREEMENT\n\nThis Master Services Agreement is entered into by and between Acme Corp, '
+           'a Delaware corporation ("Customer"), and Beta Systems LLC, a New York limited liability company '
+           '("Supplier").')
+CLOSING = 'This Agreement shall be governed by the laws of the State of California.'
+
+
+def planted_fact(rng, number):
+    # One sentence with a known fact, and how to recognise it in the output
+    kind = rng.choice(('date', 'amount', 'notice', 'deadline'))
+    if kind == 'date':
+        day = date(2024, 1, 1) + timedelta(days=rng.randrange(1500))
+        return f"The milestone falls due on {day.strftime('%B %-d, %Y')}.", ('dates', day.isoformat())
+    if kind == 'amount':
+        value = rng.randrange(1000, 5000000)
+        return f"The fee for this phase is ${value:,}.", ('amounts', float(value))
+    if kind == 'notice':
+        days = rng.choice((10, 15, 30, 45, 60, 90))
+        return f"Either party may end this phase on {days} days' written notice.", ('notice_periods', (days, str(number)))
+    days = rng.choice((5, 10, 14, 20, 30))
+    return (f"The Supplier shall deliver the report within {days} business days of the request.",
+            ('deadlines', (days, str(number))))
+
+
+def contract(rng, pages):
+    parts = [OPENING]
+    expected = []
+    size = len(OPENING)
+    number = 1
+    while size < pages * PAGE_CHARS:
+        body = FILLER * rng.randint(1, 3)
+        if rng.random() < 0.3:
+            sentence, fact = planted_fact(rng, number)
+            body += sentence
+            expected.append(fact)
+        parts.append(f"{number}. CLAUSE {number}\n{body}")
+        size += len(parts[-1]) + 2
+        number += 1
+    parts.append(f"{number}. GOVERNING LAW\n{CLOSING}")
+    return '\n\n'.join(parts), expected
+
+
+def found(facts, kind, value):
+    if kind == 'dates':
+        return any(f['date'] == value for f in facts['dates'])
+    if kind == 'amounts':
+        return any(f['value'] == value for f in facts['amounts'])
+    count, clause = value
+    return any(f['count'] == count and f['clause'] == clause for f in facts[kind])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fact extraction throughput')
+    parser.add_argument('--pages', default='1,10,100,500')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = []
+    for pages in (int(p) for p in args.pages.split(',')):
+        text, expected = contract(rng, pages)
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            facts = extract_facts(text)
+            timings.append(time.perf_counter() - started)
+        median = percentile(timings, 50)
+        # Only the first MAX_PER_KIND of each kind are kept, so check recall on those
+        seen, checkable = {}, []
+        for kind, value in expected:
+            seen[kind] = seen.get(kind, 0) + 1
+            if seen[kind] <= MAX_PER_KIND:
+                checkable.append((kind, value))
+        results.append({
+            'pages': pages,
+            'chars': len(text),
+            'ms': round(median * 1000, 2),
+            'ms_per_page': round(median * 1000 / (len(text) / PAGE_CHARS), 3),
+            'pages_per_second': round(len(text) / PAGE_CHARS / median),
+            'facts_found': count_facts(facts),
+            'planted_checked': len(checkable),
+            'planted_found': sum(found(facts, kind, value) for kind, value in checkable),
+            'parties': [p['name'] for p in facts['parties']],
+            'governing_law': [g['place'] for g in facts['governing_law']],
+        })
+
+    print(json.dumps({
+        'benchmark': 'facts',
+        'git_revision': git_revision(),
+        'page_chars': PAGE_CHARS,
+        'results': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# Glossary annotation cost vs glossary size
+# Builds synthetic glossaries of growing size (on top of the real terms),
+# then times annotating answers with the Aho-Corasick index and with one
+# regex search per term - the obvious alternative, which grows with the
+# glossary. Also times prefix and fuzzy /api/glossary/search lookups.
+#
+#   python benchmarks/bench_glossary.py
+#   python benchmarks/bench_glossary.py --sizes 10,1000,10000 --answer-chars 2000,20000
+
+import argparse
+import json
+import os
+import random
+import re
+import string
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_endpoints import git_revision, percentile
+from glossary_index import GlossaryIndex, surface_forms
+from legal_data import LEGAL_GLOSSARY
+
+
+def synthetic_glossary(rng, size):
+    glossary = dict(LEGAL_GLOSSARY)
+    for index in range(max(0, size - len(glossary))):
+        word = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 11)))
+        glossary[f'term_{index}'] = {'term': f'{word.title()} Clause', 'definition': 'Synthetic term.',
+                                     'synonyms': [word]}
+    return glossary
+
+
+def sample_answer(rng, glossary, chars):
+    # Filler text with a glossary term every ~200 characters
+    filler = "the parties agree that this section applies to all obligations under the agreement and "
+    names = [entry['term'] for entry in glossary.values()]
+    parts = []
+    size = 0
+    while size < chars:
+        parts.append(filler[:rng.randint(60, len(filler))])
+        parts.append(rng.choice(names) + '. ')
+        size += len(parts[-2]) + len(parts[-1])
+    return ''.join(parts)[:chars]
+
+
+def naive_annotate(patterns, text):
+    found = []
+    for pattern, term_id in patterns:
+        for match in pattern.finditer(text):
+            found.append((match.start(), match.end(), term_id))
+    return found
+
+
+def time_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(percentile(timings, 50), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Glossary annotation and search')
+    parser.add_argument('--sizes', default='10,100,1000,10000')
+    parser.add_argument('--answer-chars', default='2000,20000')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--regex-max-terms', type=int, default=1000,
+                        help='skip the per-term regex comparison above this size (it gets very slow)')
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = []
+    for size in (int(s) for s in args.sizes.split(',')):
+        glossary = synthetic_glossary(rng, size)
+        index = GlossaryIndex(glossary)
+        patterns = []
+        if len(glossary) <= args.regex_max_terms:
+            patterns = [(re.compile(r'\b' + re.escape(form) + r'\b', re.IGNORECASE), term_id)
+                        for term_id, entry in glossary.items() for form in surface_forms(term_id, entry)]
+        row = {'terms': len(glossary), 'forms': index.forms, 'build_ms': round(index.build_seconds * 1000, 2),
+               'annotate_ms': {}, 'regex_per_term_ms': {}}
+        for chars in (int(c) for c in args.answer_chars.split(',')):
+            answer = sample_answer(rng, glossary, chars)
+            row['annotate_ms'][chars] = time_ms(lambda: index.annotate(answer, utf16=True), args.repeat)
+            if patterns:
+                row['regex_per_term_ms'][chars] = time_ms(lambda: naive_annotate(patterns, answer),
+                                                          max(1, args.repeat // 4))
+        queries = [entry['term'][:4] for entry in list(glossary.values())[:50]]
+        typos = [entry['term'][:-2] + 'xx' for entry in list(glossary.values())[:50]]
+        row['prefix_search_ms'] = round(time_ms(lambda: [index.search(q) for q in queries], 3) / len(queries), 3)
+        row['fuzzy_search_ms'] = round(time_ms(lambda: [index.search(q, limit=3) for q in typos], 3) / len(typos), 3)
+        results.append(row)
+
+    print(json.dumps({
+        'benchmark': 'glossary',
+        'git_revision': git_revision(),
+        'results': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
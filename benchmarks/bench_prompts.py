@@ -0,0 +1,74 @@
+# Analysis prompt assembly: the prompts.py builder vs the old += concatenation
+# Times both for inputs of growing size, with conversation history and a
+# facts summary, and prints the section sizes the builder reports. Both
+# take microseconds - next to a model call, assembly cost doesn't matter;
+# the builder is there for the size accounting and the limit.
+#
+#   python benchmarks/bench_prompts.py
+#   python benchmarks/bench_prompts.py --sizes 1000,20000,100000 --repeat 2000
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_endpoints import git_revision
+from prompts import ANALYSIS_INSTRUCTIONS, FACTS_HEADER, PromptBuilder
+
+HISTORY = 'User: What does clause 4 mean?\nAssistant: Clause 4 sets the payment terms. ' * 60
+FACTS = '- Dates: 2025-01-01 (cl. 2); 2026-01-01 (cl. 9)\n- Notice periods: "30 days\' written notice" (cl. 12)\n' * 5
+
+
+def concatenate(user_input, history_context, facts_summary):
+    # The old create_legal_analysis_prompt, minus the history building
+    base_prompt = ANALYSIS_INSTRUCTIONS
+    if history_context:
+        base_prompt += "\n\nPrevious conversation context:\n" + history_context
+    if facts_summary:
+        base_prompt += FACTS_HEADER + facts_summary
+    base_prompt += f"\n\nUser Input:\n{user_input}\n\nPlease provide your analysis in the structured format above."
+    return base_prompt
+
+
+def time_calls(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return round((time.perf_counter() - started) / repeat * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prompt assembly cost')
+    parser.add_argument('--sizes', default='1000,20000,100000')
+    parser.add_argument('--repeat', type=int, default=5000)
+    args = parser.parse_args()
+
+    sections = []
+    builder = PromptBuilder(0, on_section=lambda kind, section, chars: sections.append((section, chars)))
+    results = []
+    for size in (int(s) for s in args.sizes.split(',')):
+        user_input = ('The Supplier shall deliver the services in accordance with Schedule 2. ' * (size // 70 + 1))[:size]
+        assert concatenate(user_input, HISTORY, FACTS) == builder.analysis(user_input, HISTORY, FACTS)
+        sections.clear()
+        builder.analysis(user_input, HISTORY, FACTS)
+        results.append({
+            'input_chars': size,
+            'sections': dict(sections),
+            'concatenate_us': time_calls(lambda: concatenate(user_input, HISTORY, FACTS), args.repeat),
+            'builder_us': time_calls(lambda: builder.analysis(user_input, HISTORY, FACTS), args.repeat),
+        })
+
+    print(json.dumps({
+        'benchmark': 'prompts',
+        'git_revision': git_revision(),
+        'results': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
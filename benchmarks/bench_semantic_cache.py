@@ -0,0 +1,180 @@
+# Near-duplicate question cache: lookup time, memory and answer reuse
+#   lookups - fill the cache with N synthetic questions and time get() for
+#             misses and for reworded copies of cached questions
+#   reuse   - a small labelled set of legal questions, each asked in several
+#             wordings. Counts reuses within the same topic (good) and across
+#             topics (false reuse) at a few thresholds
+#   reversed - questions with the same words but the parties swapped ("can
+#             my landlord sue me" / "can I sue my landlord"). None of them may
+#             reuse the other's answer; the script exits non-zero if one does
+#   reworded - the same question reworded (passive, contractions, fillers).
+#             Each must reuse the other's answer, or the script exits non-zero
+#
+#   python benchmarks/bench_semantic_cache.py
+#   python benchmarks/bench_semantic_cache.py --sizes 1000,100000 --thresholds 0.6,0.8
+
+import argparse
+import json
+import os
+import random
+import resource
+import string
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_endpoints import git_revision, percentile
+from semantic_cache import SemanticCache
+
+# topic -> ways of asking about it
+TOPICS = {
+    'nda_scope': ['What does an NDA cover?', 'what is covered by a NDA', 'What do NDAs usually cover',
+                  'what does a non-disclosure agreement cover?'],
+    'nda_length': ['How long does an NDA last?', 'how long do NDAs last', 'NDA length - how long does it last?'],
+    'non_compete': ['Is a non-compete clause enforceable?', 'are non-compete clauses enforceable',
+                    'Can a non-compete clause be enforced?'],
+    'lease_break': ['Can I break my lease early?', 'can I break a lease early', 'Is it possible to break my lease early?'],
+    'deposit': ['When must a landlord return the security deposit?', 'when does the landlord have to return a security deposit',
+                'landlord return security deposit when?'],
+    'notice_30': ['Is 30 days notice enough to terminate the contract?', 'is 30 days notice enough to terminate a contract'],
+    'notice_60': ['Is 60 days notice enough to terminate the contract?', 'is 60 days notice enough to terminate a contract'],
+    'copyright': ['Who owns the copyright in work made by a contractor?', 'who owns copyright for contractor work',
+                  'does a contractor own the copyright in their work?'],
+    'gdpr_breach': ['How quickly must a data breach be reported under GDPR?', 'GDPR data breach reporting deadline',
+                    'how fast do I need to report a GDPR data breach'],
+    'arbitration': ['What is an arbitration clause?', 'what does an arbitration clause mean', 'explain arbitration clauses'],
+    'indemnity': ['What is an indemnification clause?', 'what does an indemnification clause mean',
+                  'explain indemnification clauses'],
+}
+
+# Same words, opposite question - must never share an answer
+ROLE_REVERSED = [
+    ('Can my landlord sue me?', 'Can I sue my landlord?'),
+    ('Does my employer have to pay me overtime?', 'Do I have to pay my employer overtime?'),
+    ('Can my employer fire me for being sick?', 'Can I fire my employer for being sick?'),
+    ('Do I owe my tenant the security deposit?', 'Does my tenant owe me the security deposit?'),
+    ('Can the contractor terminate the contract with me?', 'Can I terminate the contract with the contractor?'),
+    ('Should I indemnify the supplier?', 'Should the supplier indemnify me?'),
+    ('Does the buyer have to pay the seller damages?', 'Does the seller have to pay the buyer damages?'),
+]
+
+# Same question, other words - must share an answer
+REWORDED = [
+    ('What does an NDA cover?', "What's covered by an NDA?"),
+    ('What does an NDA cover?', 'what is covered by a NDA'),
+    ('What does an NDA cover?', 'What exactly does an NDA cover?'),
+    ('How long does an NDA last?', 'how long do NDAs last'),
+    ('Can I break my lease early?', 'please, can I break my lease early'),
+    ('Who owns the copyright in work made by a contractor?', 'Who owns the copyright in work a contractor made?'),
+    ('Is 30 days notice enough to terminate the contract?', 'is 30 days notice enough to terminate a contract'),
+]
+
+
+def random_question(rng, vocabulary):
+    return ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(4, 10))) + '?'
+
+
+def bench_lookups(rng, size, repeat):
+    vocabulary = [''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9))) for _ in range(5000)]
+    questions = [random_question(rng, vocabulary) for _ in range(size)]
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    cache = SemanticCache(max_entries=size)
+    answer = 'x' * 2400
+    started = time.perf_counter()
+    for question in questions:
+        cache.set(question, 'model', answer)
+    set_us = (time.perf_counter() - started) / size * 1e6
+    grown_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024
+
+    results = {'entries': size, 'set_us': round(set_us, 1), 'rss_growth_mb': round(grown_mb, 1)}
+    for name, probes in (('miss', [random_question(rng, vocabulary) for _ in range(repeat)]),
+                         ('hit', ['Please, ' + rng.choice(questions).upper() for _ in range(repeat)])):
+        timings = []
+        for probe in probes:
+            started = time.perf_counter()
+            cache.get(probe, 'model')
+            timings.append((time.perf_counter() - started) * 1e6)
+        results[f'{name}_us_p50'] = round(percentile(timings, 50), 1)
+        results[f'{name}_us_p99'] = round(percentile(timings, 99), 1)
+    results['hit_rate'] = cache.snapshot()['hit_rate']
+    return results
+
+
+def bench_reuse(threshold):
+    # Ask every wording in turn; each answer says which topic it was for
+    cache = SemanticCache(threshold=threshold)
+    asked = [(topic, question) for topic, questions in TOPICS.items() for question in questions]
+    random.Random(1).shuffle(asked)
+    counts = {'questions': len(asked), 'reused': 0, 'false_reuses': 0, 'possible_reuses': 0}
+    seen_topics = set()
+    for topic, question in asked:
+        counts['possible_reuses'] += topic in seen_topics
+        seen_topics.add(topic)
+        found = cache.get(question, 'model')
+        if found is None:
+            cache.set(question, 'model', topic)
+            continue
+        counts['reused'] += 1
+        if found[0] != topic:
+            counts['false_reuses'] += 1
+    counts['threshold'] = threshold
+    counts['recall'] = round(counts['reused'] / counts['possible_reuses'], 3)
+    return counts
+
+
+def check_reversed(threshold):
+    # [(cached question, question that wrongly reused its answer, similarity)]
+    wrong = []
+    for first, second in ROLE_REVERSED:
+        for cached, asked in ((first, second), (second, first)):
+            cache = SemanticCache(threshold=threshold)
+            cache.set(cached, 'model', cached)
+            found = cache.get(asked, 'model')
+            if found is not None:
+                wrong.append({'cached': cached, 'asked': asked, 'similarity': found[1]['similarity']})
+    return {'threshold': threshold, 'pairs': len(ROLE_REVERSED), 'wrong_reuses': wrong}
+
+
+def check_reworded(threshold):
+    # [(cached question, reworded question that didn't reuse its answer)]
+    missed = []
+    for first, second in REWORDED:
+        for cached, asked in ((first, second), (second, first)):
+            cache = SemanticCache(threshold=threshold)
+            cache.set(cached, 'model', cached)
+            if cache.get(asked, 'model') is None:
+                missed.append({'cached': cached, 'asked': asked})
+    return {'threshold': threshold, 'pairs': len(REWORDED), 'missed': missed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Near-duplicate question cache')
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--thresholds', default='0.5,0.6,0.7,0.8,0.9')
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    thresholds = [float(t) for t in args.thresholds.split(',')]
+    reversed_checks = [check_reversed(t) for t in thresholds]
+    reworded_checks = [check_reworded(t) for t in thresholds]
+    print(json.dumps({
+        'benchmark': 'semantic_cache',
+        'git_revision': git_revision(),
+        'lookups': [bench_lookups(rng, int(size), args.repeat) for size in args.sizes.split(',')],
+        'reuse': [bench_reuse(t) for t in thresholds],
+        'reversed': reversed_checks,
+        'reworded': reworded_checks,
+    }, indent=2))
+    if any(check['wrong_reuses'] for check in reversed_checks):
+        sys.exit('role-reversed questions reused each other\'s answers')
+    if any(check['missed'] for check in reworded_checks):
+        sys.exit('reworded questions didn\'t reuse each other\'s answers')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# Cost of the reference-data endpoints (templates, glossary, categories...)
+# Compares re-serializing the data on every request (what the routes used to
+# do) with the precomputed responses: plain, gzipped, and a revalidation
+# that ends in a 304. Reports server time per request and bytes sent.
+#
+#   python benchmarks/bench_static.py
+#   python benchmarks/bench_static.py --requests 5000
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_endpoints import git_revision
+
+PATHS = ['/api/templates', '/api/templates/nda', '/api/glossary', '/api/categories', '/api/disclaimer']
+
+
+def rebuild(legal_app, path):
+    # The old handlers: build the dict and jsonify it every time
+    from flask import jsonify
+    from legal_data import LEGAL_CATEGORIES, LEGAL_DISCLAIMER, LEGAL_GLOSSARY, LEGAL_TEMPLATES
+    if path == '/api/templates':
+        return jsonify({'templates': {key: {'name': val['name'], 'category': val['category'],
+                                            'description': val['description']}
+                                      for key, val in LEGAL_TEMPLATES.items()}})
+    if path.startswith('/api/templates/'):
+        template_id = path.rsplit('/', 1)[1]
+        return jsonify({'id': template_id, 'template': LEGAL_TEMPLATES[template_id]})
+    if path == '/api/glossary':
+        return jsonify({'glossary': LEGAL_GLOSSARY})
+    if path == '/api/categories':
+        return jsonify({'categories': LEGAL_CATEGORIES})
+    return jsonify({'disclaimer': LEGAL_DISCLAIMER})
+
+
+def time_calls(fn, count):
+    sizes = 0
+    started = time.perf_counter()
+    for _ in range(count):
+        sizes += fn()
+    elapsed = time.perf_counter() - started
+    return {'us_per_request': round(elapsed / count * 1e6, 2), 'bytes_per_request': sizes // count}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reference-data endpoint cost')
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    os.environ['MODEL_BACKEND'] = 'fake'
+    with contextlib.redirect_stdout(sys.stderr):
+        import app as legal_app
+    flask_app = legal_app.app
+
+    results = []
+    for path in PATHS:
+        name = path[len('/api/'):]
+        with flask_app.test_request_context(path):
+            rebuilt = time_calls(lambda: len(rebuild(legal_app, path).get_data()), args.requests)
+            entry = legal_app.static_responses.entries[name]
+            precomputed = time_calls(lambda: len(legal_app.static_reply(name).get_data()), args.requests)
+        with flask_app.test_request_context(path, headers={'Accept-Encoding': 'gzip'}):
+            gzipped = time_calls(lambda: len(legal_app.static_reply(name).get_data()), args.requests)
+        with flask_app.test_request_context(path, headers={'If-None-Match': entry.etag}):
+            revalidated = time_calls(lambda: len(legal_app.static_reply(name).get_data()), args.requests)
+        results.append({
+            'path': path,
+            'rebuilt_every_request': rebuilt,
+            'precomputed': precomputed,
+            'precomputed_gzip': gzipped,
+            'revalidated_304': revalidated,
+        })
+
+    print(json.dumps({
+        'benchmark': 'static_responses',
+        'git_revision': git_revision(),
+        'requests_per_path': args.requests,
+        'results': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
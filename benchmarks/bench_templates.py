@@ -0,0 +1,159 @@
+# Bulk template filling throughput, in documents per second
+#   engine   - precompiled segments vs re-scanning the template with re.sub
+#              for every row
+#   endpoint - POST a CSV of N counterparties to /api/templates/nda/fill over
+#              HTTP and read the NDJSON / zip stream back. Peak RSS is shown
+#              after each size: with streaming it should stay flat as N grows
+# Before timing, every built-in template is filled with its required fields
+# only and checked for leftover "[...]" placeholders; the script exits
+# non-zero if one survives.
+#
+#   python benchmarks/bench_templates.py
+#   python benchmarks/bench_templates.py --rows 1000,10000,100000
+
+import argparse
+import contextlib
+import csv
+import http.client
+import json
+import os
+import random
+import re
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_endpoints import git_revision
+from legal_data import LEGAL_TEMPLATES
+from template_engine import PLACEHOLDER, TemplateEngine, placeholder_name
+
+DEFAULTS = 'NAME=Acme%20Corp&ADDRESS=1%20Market%20St&DATE=2026-01-01&SPECIFY_SCOPE=all%20shared%20data&DURATION=3'
+
+
+def counterparty(rng, index):
+    return {'NAME_2': f'Counterparty {index} LLC', 'ADDRESS_2': f'{rng.randint(1, 999)} Main St',
+            'PURPOSE': rng.choice(['evaluating a partnership', 'a merger review', 'a pilot project'])}
+
+
+def rescan_render(text, values):
+    # The naive way: find the placeholders again for every document
+    seen = {}
+
+    def replace(match):
+        base = placeholder_name(match.group(1))
+        seen[base] = seen.get(base, 0) + 1
+        return values[base if seen[base] == 1 else f"{base}_{seen[base]}"]
+    return PLACEHOLDER.sub(replace, text)
+
+
+def check_placeholders():
+    # Required fields filled, optional ones left to their defaults - nothing
+    # in square brackets should be left in the document
+    leftovers = {}
+    for template_id, template in TemplateEngine(LEGAL_TEMPLATES).templates.items():
+        text = template.render({field: f'value for {field}' for field in template.required})
+        found = PLACEHOLDER.findall(text)
+        if found:
+            leftovers[template_id] = found
+    return leftovers
+
+
+def bench_engine(rng, count):
+    template = TemplateEngine(LEGAL_TEMPLATES).get('nda')
+    text = LEGAL_TEMPLATES['nda']['template']
+    base = {'NAME': 'Acme Corp', 'ADDRESS': '1 Market St', 'DATE': '2026-01-01', 'SPECIFY_SCOPE': 'all data',
+            'DURATION': '3'}
+    rows = [dict(base, **counterparty(rng, i)) for i in range(count)]
+    results = {}
+    for name, render in (('precompiled', template.render), ('rescan', lambda values: rescan_render(text, values))):
+        started = time.perf_counter()
+        for values in rows:
+            render(values)
+        results[name + '_docs_per_second'] = round(count / (time.perf_counter() - started))
+    return results
+
+
+def bench_endpoint(port, rng, rows, output):
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', delete=False) as f:
+        writer = csv.DictWriter(f, fieldnames=['NAME_2', 'ADDRESS_2', 'PURPOSE'])
+        writer.writeheader()
+        for index in range(rows):
+            writer.writerow(counterparty(rng, index))
+        path = f.name
+    try:
+        started = time.perf_counter()
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+        with open(path, 'rb') as body:
+            connection.request('POST', f'/api/templates/nda/fill?format={output}&{DEFAULTS}', body=body,
+                               headers={'Content-Type': 'text/csv', 'Content-Length': str(os.path.getsize(path))})
+        response = connection.getresponse()
+        first_byte = None
+        received = 0
+        while True:
+            data = response.read(65536)
+            if not data:
+                break
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            received += len(data)
+        elapsed = time.perf_counter() - started
+        connection.close()
+    finally:
+        os.remove(path)
+    return {
+        'format': output,
+        'rows': rows,
+        'status': response.status,
+        'duration_s': round(elapsed, 3),
+        'first_byte_s': round(first_byte or 0, 3),
+        'docs_per_second': round(rows / elapsed),
+        'response_mb': round(received / 1e6, 2),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Template filling throughput')
+    parser.add_argument('--rows', default='1000,10000,50000')
+    parser.add_argument('--engine-rows', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    os.environ['MODEL_BACKEND'] = 'fake'
+    with contextlib.redirect_stdout(sys.stderr):
+        import app as legal_app
+    from werkzeug.serving import make_server
+
+    leftovers = check_placeholders()
+    if leftovers:
+        print(json.dumps({'benchmark': 'templates', 'unfilled_placeholders': leftovers}, indent=2))
+        sys.exit(1)
+
+    rng = random.Random(args.seed)
+    engine = bench_engine(rng, args.engine_rows)
+
+    server = make_server('127.0.0.1', 0, legal_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = []
+    with contextlib.redirect_stdout(sys.stderr):
+        for rows in (int(r) for r in args.rows.split(',')):
+            for output in ('ndjson', 'zip'):
+                endpoint.append(bench_endpoint(server.server_port, rng, rows, output))
+    server.shutdown()
+
+    print(json.dumps({
+        'benchmark': 'templates',
+        'git_revision': git_revision(),
+        'engine': dict(engine, rows=args.engine_rows),
+        'endpoint': endpoint,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+# Upload text extraction: time per page and peak memory on large documents
+# Builds synthetic contracts of growing length as .txt, .docx and .pdf (PDF
+# only when pypdf is installed) and runs document_extractor over each.
+# A page is 3,000 characters of text. Peak memory is what tracemalloc sees
+# during one extraction, next to the size of the text it produced - with
+# streaming extraction it should stay close to the text, not the file.
+#
+#   python benchmarks/bench_upload.py
+#   python benchmarks/bench_upload.py --pages 10,100,1000 --formats docx,pdf
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import zipfile
+from xml.sax.saxutils import escape
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_endpoints import git_revision, percentile
+from document_extractor import PdfReader, extract_text
+
+PAGE_CHARS = 3000
+WORDS = ("party shall provide services payment invoice within thirty days notice terminate agreement confidential "
+         "information liability damages warranty license property obligations rights").split()
+
+
+def paragraphs(rng, pages):
+    # Numbered clauses of about 600 characters, five to a page
+    result = []
+    for number in range(1, pages * 5 + 1):
+        sentences = [' '.join(rng.choice(WORDS) for _ in range(14)).capitalize() + '.' for _ in range(6)]
+        result.append(f"{number}. " + ' '.join(sentences))
+    return result
+
+
+def make_text(paras):
+    return '\n\n'.join(paras).encode('utf-8')
+
+
+def make_docx(paras):
+    body = ''.join(f'<w:p><w:r><w:t xml:space="preserve">{escape(p)}</w:t></w:r></w:p>' for p in paras)
+    xml = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+           '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+           f'<w:body>{body}</w:body></w:document>')
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', '<?xml version="1.0"?><Types/>')
+        archive.writestr('word/document.xml', xml)
+    return buffer.getvalue()
+
+
+def make_pdf(paras, per_page=5, line_chars=90):
+    # Minimal hand-written PDF: one Helvetica text stream per page
+    pages = [paras[i:i + per_page] for i in range(0, len(paras), per_page)]
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for page in pages:
+        lines = []
+        for para in page:
+            lines += [para[i:i + line_chars] for i in range(0, len(para), line_chars)] + ['']
+        shown = ' '.join('(' + line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') + ") '" for line in lines)
+        stream = f'BT /F1 8 Tf 10 TL 40 800 Td {shown} ET'.encode('latin-1')
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] '
+                       b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % (len(objects)))
+        kids.append(len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(b'%d 0 R' % k for k in kids), len(kids))
+
+    out = io.BytesIO()
+    out.write(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b'%d 0 obj\n%s\nendobj\n' % (number, body))
+    xref = out.tell()
+    out.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    out.write(b''.join(b'%010d 00000 n \n' % offset for offset in offsets))
+    out.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+BUILDERS = {'text': make_text, 'docx': make_docx, 'pdf': make_pdf}
+
+
+def bench(data, pages, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = extract_text(io.BytesIO(data), max_chars=10 ** 9)
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    extract_text(io.BytesIO(data), max_chars=10 ** 9)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    median = percentile(timings, 50)
+    return {
+        'pages': pages,
+        'file_mb': round(len(data) / 1e6, 2),
+        'text_mb': round(result['chars'] / 1e6, 2),
+        'ms': round(median * 1000, 1),
+        'ms_per_page': round(median * 1000 / pages, 3),
+        'pages_per_second': round(pages / median),
+        'peak_mb': round(peak / 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Upload text extraction throughput and memory')
+    parser.add_argument('--pages', default='10,100,1000')
+    parser.add_argument('--formats', default='text,docx,pdf')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = {}
+    for kind in args.formats.split(','):
+        if kind == 'pdf' and PdfReader is None:
+            results[kind] = 'skipped - pypdf not installed'
+            continue
+        rows = []
+        for pages in (int(p) for p in args.pages.split(',')):
+            data = BUILDERS[kind](paragraphs(rng, pages))
+            rows.append(bench(data, pages, args.repeat))
+        results[kind] = rows
+
+    print(json.dumps({
+        'benchmark': 'upload',
+        'git_revision': git_revision(),
+        'page_chars': PAGE_CHARS,
+        'results': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
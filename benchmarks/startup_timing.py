@@ -0,0 +1,80 @@
+# Startup timing report - where does worker boot time go?
+# Starts a fresh interpreter with `-X importtime`, imports the app, and
+# combines the slowest imported packages with the app's own phase timings
+# (app.startup_timings).
+#
+#   python benchmarks/startup_timing.py
+#   python benchmarks/startup_timing.py --runs 5 --top 15
+#   MODEL_DISCOVERY=eager python benchmarks/startup_timing.py   # compare with the old blocking start
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = (
+    "import json, sys, time; started = time.perf_counter(); import app; "
+    "sys.stderr.write('STARTUP_JSON ' + json.dumps({"
+    "'phases_ms': {k: round(v * 1000, 2) for k, v in app.startup_timings.items()}, "
+    "'import_app_ms': round((time.perf_counter() - started) * 1000, 2), "
+    "'model': app.model.discovery_status()}) + '\\n')"
+)
+
+
+def run_once():
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE],
+        cwd=ROOT, capture_output=True, text=True, env=os.environ.copy()
+    )
+    modules = {}
+    report = None
+    for line in result.stderr.splitlines():
+        if line.startswith('STARTUP_JSON '):
+            report = json.loads(line[len('STARTUP_JSON '):])
+        elif line.startswith('import time:') and '|' in line:
+            # "import time: self [us] | cumulative | imported package"
+            _, cumulative, name = line[len('import time:'):].split('|')
+            if not cumulative.strip().isdigit():
+                continue
+            # Direct imports of app.py (one nesting level below it) - anything
+            # deeper is already counted in its parent's cumulative time
+            depth = len(name) - len(name.lstrip(' '))
+            if depth == 3:
+                top = name.strip()
+                modules[top] = modules.get(top, 0) + int(cumulative.strip())
+    if report is None:
+        raise RuntimeError(f"app import failed:\n{result.stderr[-2000:]}")
+    report['app_imports_ms'] = {name: round(us / 1000, 2) for name, us in modules.items()}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Break down app import/startup time')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10, help='how many of the slowest imports to list')
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    # Report the median run by total import time
+    runs.sort(key=lambda r: r['import_app_ms'])
+    median = runs[len(runs) // 2]
+    slowest = sorted(median['app_imports_ms'].items(), key=lambda item: -item[1])[:args.top]
+
+    print(json.dumps({
+        'benchmark': 'startup',
+        'runs': args.runs,
+        'import_app_ms': {'min': runs[0]['import_app_ms'], 'median': median['import_app_ms'],
+                          'max': runs[-1]['import_app_ms']},
+        'phases_ms': median['phases_ms'],
+        'slowest_imports_ms': dict(slowest),
+        'model_at_import': median['model'],
+        'model_discovery': os.environ.get('MODEL_DISCOVERY', 'background'),
+        'model_backend': os.environ.get('MODEL_BACKEND', 'gemini'),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+# Local legal-category classifier
+# Naive Bayes over words and word pairs, trained at startup from the
+# LEGAL_CATEGORIES names, the glossary, the templates and a keyword list per
+# category. It answers /api/analyze-category in well under a millisecond;
+# the route only asks Gemini when confidence is below the threshold.
+
+import math
+import re
+import time
+from collections import Counter
+
+WORD = re.compile(r"[a-z][a-z0-9&']+")
+
+STOPWORDS = frozenset("""
+a an the and or of to in on for with by at from as is are was were be been being it its this that
+these those i me my we our you your he she they them their what which who whom how when where why
+do does did can could should would may might must shall will not no if then than so such any all
+some about into over under after before between during also just only very more most other there
+here has have had having get got make made need want like one two
+""".split())
+
+# Words people actually use when asking about each area - the reference
+# data on its own is too thin to train on
+CATEGORY_KEYWORDS = {
+    'contract': """contract agreement nda non-disclosure confidentiality breach clause party parties
+        signed sign signature terms consideration offer acceptance vendor supplier service agreement
+        indemnification indemnify warranty liability limitation force majeure amendment renewal
+        termination terminate void enforceable counterparty obligations deliverables invoice payment terms""",
+    'employment': """employee employer employment job hire hiring fired firing termination wrongful
+        dismissal salary wage wages overtime pay payroll benefits non-compete noncompete at-will
+        workplace harassment discrimination leave fmla severance contractor worker union hr
+        promotion resignation offer letter probation""",
+    'intellectual_property': """patent patents trademark trademarks copyright copyrights trade secret
+        secrets infringement infringe invention inventor license licensing royalty royalties logo brand
+        fair use dmca ip intellectual property software code open source prior art registration""",
+    'compliance': """compliance regulation regulations regulatory requirement requirements audit
+        sox aml kyc osha epa sec filing reporting policy policies standards certification iso
+        license permit inspection violation penalty fines sanctions anti-bribery fcpa controls""",
+    'litigation': """lawsuit sue sued suing court judge trial litigation dispute claim claims plaintiff
+        defendant settlement settle damages arbitration mediation appeal jurisdiction statute limitations
+        subpoena discovery deposition verdict injunction small claims attorney complaint filed""",
+    'corporate': """corporation company llc incorporate incorporation shareholder shareholders
+        stockholder board directors officers bylaws merger acquisition acquire equity shares stock
+        investor investors funding venture capital governance partnership due diligence startup
+        dividend articles of incorporation operating agreement cap table""",
+    'privacy': """privacy data gdpr ccpa personal information pii consent cookie cookies breach
+        notification processing controller processor retention deletion tracking hipaa health records
+        user data data protection dpa opt-out subject access request encryption""",
+    'real_estate': """lease landlord tenant rent rental property real estate mortgage deed title
+        eviction evict security deposit housing apartment zoning easement closing escrow buyer seller
+        home house commercial lease sublease premises foreclosure hoa""",
+}
+
+# Which category each glossary entry / template should train
+GLOSSARY_CATEGORIES = {
+    'nda': 'contract',
+    'consideration': 'contract',
+    'liability': 'contract',
+    'jurisdiction': 'litigation',
+    'indemnification': 'contract',
+    'force_majeure': 'contract',
+    'arbitration': 'litigation',
+    'intellectual_property': 'intellectual_property',
+    'statute_of_limitations': 'litigation',
+    'due_diligence': 'corporate',
+}
+TEMPLATE_CATEGORIES = {
+    'nda': 'contract',
+    'employment_contract': 'employment',
+    'privacy_policy': 'privacy',
+    'service_agreement': 'contract',
+}
+
+# Extra weight for hand-picked keywords over running template text
+KEYWORD_WEIGHT = 3
+
+
+def tokenize(text):
+    # Lowercase words minus stopwords, plus adjacent pairs ("trade secret")
+    words = []
+    for word in WORD.findall(text.lower()):
+        word = word.strip("'")
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        if len(word) > 4 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        words.append(word)
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class CategoryClassifier:
+
+    def __init__(self, categories, training_docs):
+        # training_docs: list of (category_key, text, weight)
+        self.categories = categories
+        self.counts = {key: Counter() for key in categories}
+        for key, text, weight in training_docs:
+            for token in tokenize(text):
+                self.counts[key][token] += weight
+
+        self.vocab = set()
+        for counter in self.counts.values():
+            self.vocab.update(counter)
+        self.totals = {key: sum(counter.values()) for key, counter in self.counts.items()}
+
+        # Precompute log P(token | category) with add-one smoothing so
+        # classify() is just dictionary lookups
+        vocab_size = len(self.vocab)
+        self.log_unseen = {key: math.log(1.0 / (self.totals[key] + vocab_size)) for key in categories}
+        self.log_probs = {
+            key: {token: math.log((count + 1.0) / (self.totals[key] + vocab_size))
+                  for token, count in counter.items()}
+            for key, counter in self.counts.items()
+        }
+
+    @classmethod
+    def from_reference_data(cls, categories, glossary, templates):
+        docs = []
+        for key, info in categories.items():
+            docs.append((key, f"{info['name']} {key.replace('_', ' ')}", KEYWORD_WEIGHT))
+            docs.append((key, CATEGORY_KEYWORDS.get(key, ''), KEYWORD_WEIGHT))
+        for term_id, term in glossary.items():
+            key = GLOSSARY_CATEGORIES.get(term_id)
+            if key in categories:
+                docs.append((key, f"{term['term']} {term['definition']} {term.get('example', '')}", 1))
+        for template_id, template in templates.items():
+            key = TEMPLATE_CATEGORIES.get(template_id)
+            if key in categories:
+                docs.append((key, f"{template['name']} {template['description']} {template['template']}", 1))
+        return cls(categories, docs)
+
+    def classify(self, text):
+        # Returns {'category', 'name', 'confidence', 'matched', 'elapsed_ms'}
+        started = time.perf_counter()
+        tokens = [t for t in tokenize(text) if t in self.vocab]
+        if not tokens:
+            return {'category': None, 'name': 'Other', 'confidence': 0.0, 'matched': [],
+                    'elapsed_ms': (time.perf_counter() - started) * 1000}
+
+        scores = {}
+        for key in self.categories:
+            log_probs = self.log_probs[key]
+            unseen = self.log_unseen[key]
+            scores[key] = sum(log_probs.get(token, unseen) for token in tokens)
+
+        # Plain NB posteriors are nearly always ~1.0, so average the evidence
+        # per token and only let it build up over the first few matches
+        evidence = min(len(tokens), 6)
+        top = max(scores.values())
+        weights = {key: math.exp((score - top) / len(tokens) * evidence) for key, score in scores.items()}
+        best = max(weights, key=weights.get)
+        confidence = weights[best] / sum(weights.values())
+
+        matched = sorted({t for t in tokens if t in self.counts[best] and ' ' not in t},
+                         key=lambda t: -self.counts[best][t])[:5]
+        return {
+            'category': best,
+            'name': self.categories[best]['name'],
+            'confidence': round(confidence, 4),
+            'matched': matched,
+            'elapsed_ms': (time.perf_counter() - started) * 1000
+        }
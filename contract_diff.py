@@ -0,0 +1,213 @@
+# Clause-level comparison of two versions of an agreement
+# Both versions are split into clauses with the same splitter the chunked
+# document pipeline uses, and each clause gets a hash of its text (without
+# its number, so renumbering alone isn't a change). The clause lists are
+# diffed locally; only added, removed and modified clauses go to the model,
+# and a long modified clause is cut down to the sentences that changed plus
+# a little context. app.py caches the model's view of each change by the
+# clause hashes, so asking about v3 -> v4 after v2 -> v3 only pays for what's new.
+
+import difflib
+import hashlib
+import json
+import re
+
+from document_pipeline import SENTENCE_END, split_sections
+
+CLAUSE_NUMBER = re.compile(
+    r"^\s*(?:"
+    r"(?P<word>(?:ARTICLE|Article|SECTION|Section|CLAUSE|Clause|SCHEDULE|Schedule|EXHIBIT|Exhibit)\s+[\dIVXLC]+(?:\.\d+)*)[.:)]?"
+    r"|(?P<number>\d+(?:\.\d+)*)[.)]?(?=\s)"
+    r"|\((?P<letter>[a-z0-9]{1,4})\)"
+    r")\s*"
+)
+SPACES = re.compile(r'\s+')
+# Modified clauses to pair up must be at least this similar; below it
+# they're treated as one clause removed and another added
+MODIFIED_RATIO = 0.5
+# Within a replaced block each old clause is only compared with the new
+# clauses this many places either side of where it would sit, and blocks
+# longer than MAX_PAIRED_BLOCK are paired by position without comparing -
+# so a rewrite of the whole agreement costs linear, not quadratic, time
+PAIR_WINDOW = 3
+MAX_PAIRED_BLOCK = 100
+
+
+class Clause:
+    __slots__ = ('index', 'number', 'heading', 'text', 'body', 'hash', 'words')
+
+    def __init__(self, index, text):
+        self.index = index
+        self.text = text
+        match = CLAUSE_NUMBER.match(text)
+        self.number = None
+        if match:
+            self.number = match.group('word') or match.group('number') or f"({match.group('letter')})"
+        self.body = SPACES.sub(' ', text[match.end():] if match else text).strip()
+        self.heading = text.splitlines()[0].strip()[:80]
+        self.hash = hashlib.sha1(self.body.encode('utf-8')).hexdigest()[:16]
+        # Compared word by word when pairing - far cheaper than by character
+        self.words = self.body.split()
+
+    def describe(self):
+        return {'index': self.index, 'number': self.number, 'heading': self.heading}
+
+
+def split_clauses(text):
+    return [Clause(index, section) for index, section in enumerate(split_sections(text))]
+
+
+def excerpt(old, new, max_chars=1500, context=1):
+    # The parts of a modified clause worth sending: all of it when it's
+    # short, otherwise only the changed sentences and `context` either side
+    if len(old) + len(new) <= max_chars * 2:
+        return old, new
+    old_sentences = SENTENCE_END.split(old)
+    new_sentences = SENTENCE_END.split(new)
+    old_parts, new_parts = [], []
+    matcher = difflib.SequenceMatcher(None, old_sentences, new_sentences, autojunk=False)
+    for group in matcher.get_grouped_opcodes(context):
+        old_start, old_end = group[0][1], group[-1][2]
+        new_start, new_end = group[0][3], group[-1][4]
+        old_parts.append(' '.join(old_sentences[old_start:old_end]))
+        new_parts.append(' '.join(new_sentences[new_start:new_end]))
+    return ' [...] '.join(old_parts), ' [...] '.join(new_parts)
+
+
+def pair_modified(removed, added):
+    # Within one replaced block, match each old clause with the most
+    # similar new one near the same position. Returns [(old, new)],
+    # leftover old, leftover new
+    if max(len(removed), len(added)) > MAX_PAIRED_BLOCK:
+        # Too big to compare - first old clause with first new one, and so on
+        count = min(len(removed), len(added))
+        return list(zip(removed, added)), list(removed[count:]), list(added[count:])
+
+    pairs = []
+    taken = set()
+    leftover = []
+    scale = len(added) / len(removed) if removed else 0
+    for position, old in enumerate(removed):
+        centre = round(position * scale)
+        best, best_ratio = None, MODIFIED_RATIO
+        for candidate in range(max(0, centre - PAIR_WINDOW), min(len(added), centre + PAIR_WINDOW + 1)):
+            if candidate in taken:
+                continue
+            matcher = difflib.SequenceMatcher(None, old.words, added[candidate].words, autojunk=False)
+            if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = candidate, ratio
+        if best is None:
+            leftover.append(old)
+        else:
+            taken.add(best)
+            pairs.append((old, added[best]))
+    return pairs, leftover, [new for index, new in enumerate(added) if index not in taken]
+
+
+def diff_clauses(old_clauses, new_clauses):
+    # [{type: added|removed|modified|moved, old, new, ...}] in the order of
+    # the revised version, plus how many clauses were unchanged
+    matcher = difflib.SequenceMatcher(None, [c.hash for c in old_clauses], [c.hash for c in new_clauses],
+                                      autojunk=False)
+    changes = []
+    unchanged = 0
+    removed_all, added_all = [], []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            unchanged += i2 - i1
+            continue
+        removed, added = old_clauses[i1:i2], new_clauses[j1:j2]
+        pairs, removed, added = pair_modified(removed, added)
+        for old, new in pairs:
+            changes.append({'type': 'modified', 'old': old, 'new': new})
+        removed_all += removed
+        added_all += added
+
+    # Same text somewhere else in the document - moved, not rewritten
+    removed_by_hash = {}
+    for clause in removed_all:
+        removed_by_hash.setdefault(clause.hash, []).append(clause)
+    for new in added_all:
+        matches = removed_by_hash.get(new.hash)
+        if matches:
+            changes.append({'type': 'moved', 'old': matches.pop(0), 'new': new})
+        else:
+            changes.append({'type': 'added', 'old': None, 'new': new})
+    for clauses in removed_by_hash.values():
+        changes.extend({'type': 'removed', 'old': old, 'new': None} for old in clauses)
+
+    changes.sort(key=lambda c: (c['new'].index if c['new'] else c['old'].index, c['new'] is None))
+    return changes, unchanged
+
+
+def change_key(change):
+    # What identifies a change for the analysis cache
+    old, new = change['old'], change['new']
+    return f"{change['type']}:{old.hash if old else '-'}:{new.hash if new else '-'}"
+
+
+def needs_analysis(change):
+    return change['type'] != 'moved'
+
+
+def describe_change(number, change):
+    old, new = change['old'], change['new']
+    label = (new or old).number or (new or old).heading
+    if change['type'] == 'modified':
+        before, after = excerpt(old.body, new.body)
+        where = f"clause {label}" + (f" (was {old.number})" if old.number and old.number != new.number else "")
+        return f"Change {number} - MODIFIED {where}:\nBEFORE: {before}\nAFTER: {after}"
+    if change['type'] == 'added':
+        return f"Change {number} - ADDED clause {label}:\n{new.body}"
+    return f"Change {number} - REMOVED clause {label}:\n{old.body}"
+
+
+CHANGE_PROMPT = """You are comparing two versions of a legal agreement{title}. Only the clauses below changed - everything else in the agreement is identical, so don't comment on it.
+
+For each change, say what changed and what risk it creates for the party reviewing the revised version. Respond with only a JSON array, one object per change, in the same order:
+[{{"change": 1, "risk_level": "low|medium|high", "summary": "one sentence on what changed", "concerns": "what to watch out for, or an empty string"}}]
+
+{changes}"""
+
+
+def change_prompt(changes, title=''):
+    blocks = [describe_change(number, change) for number, change in enumerate(changes, start=1)]
+    return CHANGE_PROMPT.format(title=f' ("{title}")' if title else '', changes='\n\n'.join(blocks))
+
+
+def parse_change_analyses(text, count):
+    # The model's JSON array -> one dict (or None) per change, in order
+    start, end = text.find('['), text.rfind(']')
+    try:
+        items = json.loads(text[start:end + 1]) if start != -1 and end > start else []
+    except ValueError:
+        items = []
+    results = [None] * count
+    for position, item in enumerate(items if isinstance(items, list) else []):
+        if not isinstance(item, dict):
+            continue
+        index = item.get('change', position + 1)
+        index = index - 1 if isinstance(index, int) else position
+        if 0 <= index < count and results[index] is None:
+            risk = str(item.get('risk_level', '')).lower()
+            results[index] = {
+                'risk_level': risk if risk in ('low', 'medium', 'high') else None,
+                'summary': str(item.get('summary', '')).strip(),
+                'concerns': str(item.get('concerns', '')).strip(),
+            }
+    return results
+
+
+def change_to_dict(change):
+    old, new = change['old'], change['new']
+    data = {'type': change['type'], 'old': old.describe() if old else None, 'new': new.describe() if new else None}
+    if change['type'] == 'modified':
+        data['before'], data['after'] = excerpt(old.body, new.body)
+    elif change['type'] == 'added':
+        data['after'] = new.body
+    elif change['type'] == 'removed':
+        data['before'] = old.body
+    return data
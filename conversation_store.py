@@ -0,0 +1,366 @@
+# Conversation stores
+#   ConversationStore       - in memory, per process. Sessions idle for longer
+#                             than idle_ttl are dropped, and when the total memory
+#                             held goes over max_bytes the least recently used
+#                             sessions are evicted first.
+#   SQLiteConversationStore - one SQLite file in WAL mode shared by every
+#                             worker process, so a follow-up question can land
+#                             on any gunicorn worker and still see the history.
+# Both hand out Message objects (__slots__, interned role strings) and have
+# the same methods, so app.py doesn't care which one it's using.
+# Assistant answers carry their parsed sections (analysis_parser) in
+# `structured`; page() can filter on its risk level and risk_counts() totals
+# them up for a session. The one-line summary history_builder uses for old
+# turns is saved with each message too, so it's worked out only once even
+# when every request reads the history back from SQLite.
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+RISK_LEVELS = ('low', 'medium', 'high')
+
+
+class Message:
+    __slots__ = ('id', 'role', 'content', 'timestamp', 'is_document', 'digest', 'summary', 'structured')
+
+    def __init__(self, role, content, timestamp=None, is_document=False, digest=None, summary=None, id=None,
+                 structured=None):
+        # id is only set once the message is stored - it's the cursor for /api/history
+        self.id = id
+        # Only ever 'user' or 'assistant' - interning means every message shares one string
+        self.role = sys.intern(role)
+        self.content = content
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.is_document = is_document
+        self.digest = digest
+        self.summary = summary
+        self.structured = structured
+
+    @property
+    def risk_level(self):
+        return self.structured.get('risk_level') if self.structured else None
+
+    def size(self):
+        # Rough bytes held by this message
+        total = sys.getsizeof(self) + sys.getsizeof(self.content)
+        if self.summary:
+            total += sys.getsizeof(self.summary)
+        if self.digest:
+            total += 200
+        if self.structured:
+            total += 1000
+        return total
+
+    def to_dict(self):
+        data = {
+            'id': self.id,
+            'role': self.role,
+            'content': self.content,
+            'timestamp': datetime.fromtimestamp(self.timestamp).isoformat(),
+        }
+        if self.role == 'user':
+            data['is_document'] = self.is_document
+        elif self.structured:
+            data['structured'] = self.structured
+        return data
+
+
+class Conversation:
+    __slots__ = ('messages', 'bytes', 'last_active')
+
+    def __init__(self):
+        self.messages = []
+        self.bytes = 0
+        self.last_active = time.time()
+
+
+class ConversationStore:
+
+    def __init__(self, idle_ttl=7200, max_bytes=256 * 1024 * 1024, sweep_interval=60):
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.lock = threading.RLock()
+        # session_id -> Conversation, least recently used first
+        self.sessions = OrderedDict()
+        self.bytes_held = 0
+        self.last_sweep = time.time()
+        self.counters = {'expired_sessions': 0, 'evicted_sessions': 0}
+
+    def _touch(self, session_id, create=False):
+        # Caller holds the lock
+        conversation = self.sessions.get(session_id)
+        if conversation is None:
+            if not create:
+                return None
+            conversation = self.sessions[session_id] = Conversation()
+        conversation.last_active = time.time()
+        self.sessions.move_to_end(session_id)
+        return conversation
+
+    def _remove(self, session_id):
+        conversation = self.sessions.pop(session_id, None)
+        if conversation is not None:
+            self.bytes_held -= conversation.bytes
+        return conversation
+
+    def _sweep(self, now):
+        # Sessions are kept in last-used order, so expired ones are all at the front
+        self.last_sweep = now
+        cutoff = now - self.idle_ttl
+        while self.sessions:
+            session_id, conversation = next(iter(self.sessions.items()))
+            if conversation.last_active >= cutoff:
+                break
+            self._remove(session_id)
+            self.counters['expired_sessions'] += 1
+
+    def _enforce_limits(self, keep=None):
+        now = time.time()
+        if now - self.last_sweep >= self.sweep_interval:
+            self._sweep(now)
+        while self.bytes_held > self.max_bytes and self.sessions:
+            oldest = next(iter(self.sessions))
+            if oldest == keep:
+                # The active session alone is over the cap - nothing else to free
+                if len(self.sessions) == 1:
+                    break
+                self.sessions.move_to_end(oldest)
+                continue
+            self._remove(oldest)
+            self.counters['evicted_sessions'] += 1
+
+    def ensure(self, session_id):
+        with self.lock:
+            self._touch(session_id, create=True)
+
+    def __contains__(self, session_id):
+        with self.lock:
+            return session_id in self.sessions
+
+    def history(self, session_id):
+        # Copy of the message list, oldest first
+        with self.lock:
+            conversation = self._touch(session_id)
+            return list(conversation.messages) if conversation else []
+
+    def append(self, session_id, message):
+        with self.lock:
+            conversation = self._touch(session_id, create=True)
+            size = message.size()
+            # Position in the conversation doubles as the message id
+            message.id = len(conversation.messages) + 1
+            conversation.messages.append(message)
+            conversation.bytes += size
+            self.bytes_held += size
+            self._enforce_limits(keep=session_id)
+
+    def page(self, session_id, limit=20, before=None, risk=None):
+        # Newest `limit` messages older than message id `before`, oldest first.
+        # With `risk`, only answers assessed at that level
+        with self.lock:
+            conversation = self._touch(session_id)
+            messages = conversation.messages if conversation else []
+            end = len(messages) if before is None else max(0, min(before - 1, len(messages)))
+            if risk is not None:
+                matching = [m for m in messages[:end] if m.risk_level == risk]
+                return matching[-limit:], len(matching) > limit
+            start = max(0, end - limit)
+            return list(messages[start:end]), start > 0
+
+    def risk_counts(self, session_id):
+        # {'low': n, 'medium': n, 'high': n, 'unrated': n} over the answers
+        counts = dict.fromkeys(RISK_LEVELS + ('unrated',), 0)
+        with self.lock:
+            conversation = self._touch(session_id)
+            for message in conversation.messages if conversation else ():
+                if message.role == 'assistant':
+                    counts[message.risk_level or 'unrated'] += 1
+        return counts
+
+    def delete(self, session_id):
+        with self.lock:
+            self._remove(session_id)
+
+    def stats(self):
+        with self.lock:
+            self._enforce_limits()
+            return dict(
+                self.counters,
+                live_sessions=len(self.sessions),
+                messages=sum(len(c.messages) for c in self.sessions.values()),
+                bytes_held=self.bytes_held,
+                max_bytes=self.max_bytes,
+                idle_ttl_seconds=self.idle_ttl
+            )
+
+
+class SQLiteConversationStore:
+    # Same interface as ConversationStore, backed by a WAL-mode SQLite file.
+    # Every thread gets its own connection; WAL lets readers in other workers
+    # carry on while one worker writes.
+
+    def __init__(self, db_path, idle_ttl=7200, sweep_interval=60):
+        self.db_path = db_path
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self.local = threading.local()
+        self.last_sweep = 0.0
+        self.counters = {'expired_sessions': 0}
+
+        db = self._db()
+        db.execute('PRAGMA journal_mode=WAL')
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                last_active REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_last_active ON sessions (last_active);
+
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp REAL NOT NULL,
+                is_document INTEGER NOT NULL DEFAULT 0,
+                digest TEXT,
+                structured TEXT,
+                risk_level TEXT,
+                summary TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id);
+            CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp);
+        """)
+        # Databases from before answers were parsed / summaries were kept
+        columns = {row[1] for row in db.execute('PRAGMA table_info(messages)')}
+        for column in ('structured', 'risk_level', 'summary'):
+            if column not in columns:
+                db.execute(f'ALTER TABLE messages ADD COLUMN {column} TEXT')
+        db.execute('CREATE INDEX IF NOT EXISTS idx_messages_risk ON messages (session_id, risk_level, id)')
+        db.commit()
+
+    def _db(self):
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=10)
+            db.execute('PRAGMA synchronous=NORMAL')  # safe with WAL, much cheaper commits
+            db.execute('PRAGMA busy_timeout=10000')
+            self.local.db = db
+        return db
+
+    def _touch(self, db, session_id):
+        db.execute(
+            'INSERT INTO sessions (session_id, last_active) VALUES (?, ?) '
+            'ON CONFLICT(session_id) DO UPDATE SET last_active = excluded.last_active',
+            (session_id, time.time())
+        )
+
+    def _maybe_sweep(self, db):
+        now = time.time()
+        if now - self.last_sweep < self.sweep_interval:
+            return
+        self.last_sweep = now
+        cutoff = now - self.idle_ttl
+        expired = [row[0] for row in db.execute(
+            'SELECT session_id FROM sessions WHERE last_active < ?', (cutoff,))]
+        for session_id in expired:
+            db.execute('DELETE FROM messages WHERE session_id = ?', (session_id,))
+            db.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+        self.counters['expired_sessions'] += len(expired)
+
+    @staticmethod
+    def _message(row):
+        id, role, content, timestamp, is_document, digest, structured, summary = row
+        return Message(role, content, timestamp=timestamp,
+                       is_document=bool(is_document), digest=json.loads(digest) if digest else None, id=id,
+                       structured=json.loads(structured) if structured else None, summary=summary)
+
+    def ensure(self, session_id):
+        db = self._db()
+        with db:
+            self._touch(db, session_id)
+
+    def __contains__(self, session_id):
+        return self._db().execute(
+            'SELECT 1 FROM sessions WHERE session_id = ?', (session_id,)).fetchone() is not None
+
+    def history(self, session_id):
+        # Messages for building prompts. Document bodies stay in the database -
+        # prompts only ever use their digest, so there's no point reading them
+        rows = self._db().execute(
+            'SELECT id, role, CASE WHEN is_document THEN \'\' ELSE content END, timestamp, is_document, digest, NULL, '
+            'summary FROM messages WHERE session_id = ? ORDER BY id', (session_id,)
+        ).fetchall()
+        return [self._message(row) for row in rows]
+
+    def append(self, session_id, message):
+        db = self._db()
+        with db:
+            self._touch(db, session_id)
+            cursor = db.execute(
+                'INSERT INTO messages (session_id, role, content, timestamp, is_document, digest, structured, '
+                'risk_level, summary) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (session_id, message.role, message.content, message.timestamp, int(bool(message.is_document)),
+                 json.dumps(message.digest) if message.digest else None,
+                 json.dumps(message.structured) if message.structured else None, message.risk_level,
+                 message.summary)
+            )
+            message.id = cursor.lastrowid
+            self._maybe_sweep(db)
+
+    def page(self, session_id, limit=20, before=None, risk=None):
+        db = self._db()
+        where = 'session_id = ? AND id < ?'
+        params = [session_id, before if before is not None else sys.maxsize]
+        if risk is not None:
+            where += ' AND risk_level = ?'
+            params.append(risk)
+        rows = db.execute(
+            f'SELECT id, role, content, timestamp, is_document, digest, structured, summary FROM messages '
+            f'WHERE {where} ORDER BY id DESC LIMIT ?', params + [limit + 1]
+        ).fetchall()
+        has_more = len(rows) > limit
+        return [self._message(row) for row in reversed(rows[:limit])], has_more
+
+    def risk_counts(self, session_id):
+        counts = dict.fromkeys(RISK_LEVELS + ('unrated',), 0)
+        rows = self._db().execute(
+            "SELECT risk_level, COUNT(*) FROM messages WHERE session_id = ? AND role = 'assistant' "
+            "GROUP BY risk_level", (session_id,)
+        )
+        for level, count in rows:
+            counts[level or 'unrated'] += count
+        return counts
+
+    def delete(self, session_id):
+        db = self._db()
+        with db:
+            db.execute('DELETE FROM messages WHERE session_id = ?', (session_id,))
+            db.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+
+    def stats(self):
+        db = self._db()
+        with db:
+            self._maybe_sweep(db)
+        live = db.execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+        messages, content_bytes = db.execute(
+            'SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(content AS BLOB))), 0) FROM messages').fetchone()
+        try:
+            file_bytes = os.path.getsize(self.db_path)
+        except OSError:
+            file_bytes = None
+        return dict(
+            self.counters,
+            live_sessions=live,
+            messages=messages,
+            bytes_held=content_bytes,
+            db_file_bytes=file_bytes,
+            idle_ttl_seconds=self.idle_ttl
+        )
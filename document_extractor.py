@@ -0,0 +1,174 @@
+# Text extraction for uploaded files (/api/upload)
+# The browser used to read every upload with readAsText, which is fine for
+# .txt but turns PDFs and Word files into garbage. Uploads now come to the
+# server and are read here one page (PDF) or paragraph (DOCX) at a time, and
+# reading stops as soon as the text passes the size limit - a huge or
+# zip-bombed file never has to be held in memory in full. DOCX is a zip of
+# XML and only needs the standard library; PDF needs the optional pypdf package.
+
+import codecs
+import hashlib
+import zipfile
+from xml.etree.ElementTree import ParseError, iterparse
+
+try:
+    from pypdf import PdfReader
+    from pypdf.errors import PyPdfError
+except ImportError:  # PDF uploads get a clear 501 instead
+    PdfReader = None
+    PyPdfError = Exception
+
+# Bump when extraction changes, so text cached by file hash is redone
+EXTRACTOR_VERSION = 1
+READ_CHUNK = 64 * 1024
+
+WORD = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+PARAGRAPH = WORD + 'p'
+TEXT = WORD + 't'
+TAB = WORD + 'tab'
+BREAKS = (WORD + 'br', WORD + 'cr')
+BODY = WORD + 'body'
+
+
+class ExtractionError(Exception):
+    # The upload can't be turned into text - status is what to answer with
+
+    def __init__(self, message, status=415):
+        super().__init__(message)
+        self.status = status
+
+
+def file_digest(stream, max_bytes):
+    # sha256 and size of the upload, read in chunks; stops at max_bytes
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = stream.read(READ_CHUNK)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise ExtractionError(f'Files can be at most {max_bytes // (1024 * 1024)} MB', status=413)
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest(), size
+
+
+def detect_format(head):
+    # By content, not by file name - browsers send all sorts of MIME types
+    if head.startswith(b'%PDF-'):
+        return 'pdf'
+    if head.startswith(b'PK\x03\x04'):
+        return 'docx'
+    if head.startswith(b'\xd0\xcf\x11\xe0'):
+        raise ExtractionError('Old Word (.doc) files are not supported - save it as .docx or PDF first')
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'text'
+    if b'\x00' in head:
+        raise ExtractionError('Unsupported file type - upload a PDF, Word (.docx) or text file')
+    return 'text'
+
+
+def text_blocks(stream):
+    # Plain text, decoded incrementally so a multi-byte character split
+    # across two reads comes out whole
+    head = stream.read(2)
+    stream.seek(0)
+    encoding = 'utf-16' if head in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE) else 'utf-8-sig'
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    while True:
+        chunk = stream.read(READ_CHUNK)
+        if not chunk:
+            break
+        yield decoder.decode(chunk)
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def docx_paragraphs(stream):
+    # word/document.xml is parsed as it's decompressed. Each finished
+    # top-level paragraph or table is dropped from the tree, so memory
+    # stays at about one paragraph however long the document is
+    try:
+        archive = zipfile.ZipFile(stream)
+        part = archive.open('word/document.xml')
+    except (zipfile.BadZipFile, KeyError):
+        raise ExtractionError('Not a valid Word (.docx) file')
+    with archive, part:
+        body = None
+        depth = 0
+        runs = []
+        try:
+            for event, element in iterparse(part, events=('start', 'end')):
+                if event == 'start':
+                    depth += 1
+                    if element.tag == BODY:
+                        body = element
+                    continue
+                depth -= 1
+                tag = element.tag
+                if tag == TEXT:
+                    runs.append(element.text or '')
+                elif tag == TAB:
+                    runs.append('\t')
+                elif tag in BREAKS:
+                    runs.append('\n')
+                elif tag == PARAGRAPH:
+                    yield ''.join(runs)
+                    runs = []
+                if body is not None and depth == 2:
+                    body.clear()
+        except ParseError:
+            raise ExtractionError('Not a valid Word (.docx) file')
+
+
+def pdf_pages(stream):
+    # pypdf reads the page index up front but each page's content only when
+    # asked, so this is one page in memory at a time
+    if PdfReader is None:
+        raise ExtractionError('PDF uploads need the pypdf package on the server (pip install pypdf)', status=501)
+    try:
+        reader = PdfReader(stream)
+        if reader.is_encrypted and not reader.decrypt(''):
+            raise ExtractionError('Password-protected PDFs are not supported', status=422)
+        for page in reader.pages:
+            yield page.extract_text() or ''
+    except (PyPdfError, ValueError, KeyError) as e:
+        raise ExtractionError(f'Could not read this PDF ({type(e).__name__})', status=422)
+
+
+EXTRACTORS = {
+    # format -> (blocks, what one block is, how blocks are joined)
+    'pdf': (pdf_pages, 'pages', '\n\n'),
+    'docx': (docx_paragraphs, 'paragraphs', '\n\n'),
+    'text': (text_blocks, None, ''),
+}
+
+
+def extract_text(stream, max_chars):
+    # Returns {text, format, chars, pages|paragraphs}. Raises ExtractionError
+    # (413) as soon as the text passes max_chars rather than reading on
+    kind = detect_format(stream.read(8))
+    stream.seek(0)
+    blocks, unit, separator = EXTRACTORS[kind]
+    parts = []
+    size = 0
+    count = 0
+    for block in blocks(stream):
+        count += 1
+        if unit and not block.strip():
+            continue
+        size += len(block) + len(separator)
+        if size > max_chars:
+            raise ExtractionError(f'This file has more than {max_chars:,} characters of text', status=413)
+        parts.append(block)
+
+    text = separator.join(parts).replace('\r\n', '\n').strip()
+    if not text:
+        message = 'No text found in this PDF - scanned pages need OCR first' if kind == 'pdf' else 'No text found in this file'
+        raise ExtractionError(message, status=422)
+    result = {'text': text, 'format': kind, 'chars': len(text)}
+    if unit:
+        result[unit] = count
+    return result
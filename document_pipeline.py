@@ -0,0 +1,177 @@
+# Chunked (map-reduce) analysis for long documents
+# Big master agreements don't fit in one prompt, so we split them on
+# clause/section boundaries, pull the important bits out of each chunk in
+# parallel, then hand the merged notes to the normal analysis prompt.
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+# Lines that look like the start of a new clause or section, e.g.
+# "ARTICLE IV", "Section 12.3", "7. TERMINATION", "(b) Payment", "GOVERNING LAW"
+SECTION_START = re.compile(
+    r"^\s*(?:"
+    r"(?:ARTICLE|Article|SECTION|Section|CLAUSE|Clause|SCHEDULE|Schedule|EXHIBIT|Exhibit)\s+[\dIVXLC]+[.:)]?"
+    r"|\d+(?:\.\d+)*[.)]\s+\S"
+    r"|\d+(?:\.\d+)+\s+\S"
+    r"|\([a-z0-9]{1,4}\)\s+\S"
+    r"|[A-Z][A-Z0-9 ,&'\-]{3,80}$"
+    r")"
+)
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_END = re.compile(r"(?<=[.;:])\s+")
+
+# Headings we ask for in each chunk's notes, in the order we merge them
+NOTE_HEADINGS = ['OBLIGATIONS', 'RIGHTS', 'DEADLINES', 'RISKS', 'TERMS', 'CITATIONS']
+
+CHUNK_PROMPT = """You are reviewing part {index} of {total} of a longer legal document. Other parts are reviewed separately, so only report what appears in THIS part.
+
+List the important points under exactly these headings, one short bullet per point, quoting clause numbers where they exist. Write "None" under a heading if nothing applies.
+
+OBLIGATIONS:
+RIGHTS:
+DEADLINES:
+RISKS:
+TERMS:
+CITATIONS:
+
+Document part {index} of {total}:
+{chunk}"""
+
+
+def split_sections(text):
+    # Break the text into sections wherever a line looks like a clause heading
+    sections = []
+    current = []
+    for line in text.splitlines():
+        if current and SECTION_START.match(line):
+            sections.append('\n'.join(current).strip())
+            current = []
+        current.append(line)
+    if current:
+        sections.append('\n'.join(current).strip())
+    return [s for s in sections if s]
+
+
+def split_oversized(section, max_chars):
+    # A single clause bigger than a chunk - fall back to paragraphs, then
+    # sentences, then a hard cut so nothing is ever over the limit
+    if len(section) <= max_chars:
+        return [section]
+    for pattern in (PARAGRAPH_BREAK, SENTENCE_END):
+        pieces = [p for p in pattern.split(section) if p.strip()]
+        if len(pieces) > 1:
+            return pack(pieces, max_chars, separator='\n\n' if pattern is PARAGRAPH_BREAK else ' ')
+    return [section[i:i + max_chars] for i in range(0, len(section), max_chars)]
+
+
+def pack(pieces, max_chars, separator='\n\n'):
+    # Greedily glue neighbouring pieces together until a chunk is full
+    chunks = []
+    current = []
+    size = 0
+    for piece in pieces:
+        for part in split_oversized(piece, max_chars):
+            extra = len(part) + (len(separator) if current else 0)
+            if current and size + extra > max_chars:
+                chunks.append(separator.join(current))
+                current = []
+                size = 0
+                extra = len(part)
+            current.append(part)
+            size += extra
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
+
+
+def split_into_chunks(text, max_chars):
+    # Clause-aware chunking: never cut in the middle of a section unless the
+    # section alone is bigger than max_chars
+    return pack(split_sections(text), max_chars)
+
+
+def parse_notes(notes):
+    # Turn one chunk's notes back into {heading: [bullets]}
+    parsed = {heading: [] for heading in NOTE_HEADINGS}
+    current = None
+    for line in notes.splitlines():
+        stripped = line.strip().strip('*#').strip()
+        if not stripped:
+            continue
+        heading = stripped.rstrip(':').upper()
+        if heading in parsed:
+            current = heading
+            continue
+        # "RISKS: something" on one line
+        for name in NOTE_HEADINGS:
+            if stripped.upper().startswith(name + ':'):
+                current = name
+                stripped = stripped[len(name) + 1:].strip()
+                break
+        if current is None or not stripped:
+            continue
+        bullet = stripped.lstrip('-*• ').strip()
+        if bullet and bullet.lower().rstrip('.') != 'none':
+            parsed[current].append(bullet)
+    return parsed
+
+
+def merge_notes(all_notes):
+    # Combine every chunk's notes heading by heading, dropping repeats
+    merged = {heading: [] for heading in NOTE_HEADINGS}
+    seen = {heading: set() for heading in NOTE_HEADINGS}
+    for part, notes in enumerate(all_notes, start=1):
+        for heading, bullets in parse_notes(notes).items():
+            for bullet in bullets:
+                key = ' '.join(bullet.lower().split())
+                if key in seen[heading]:
+                    continue
+                seen[heading].add(key)
+                merged[heading].append(f"[part {part}] {bullet}")
+    return merged
+
+
+class DocumentPipeline:
+    # generate is a function prompt -> text so this doesn't care which model is used
+
+    def __init__(self, generate, chunk_chars=12000, threshold_chars=20000, max_workers=4):
+        self.generate = generate
+        self.chunk_chars = chunk_chars
+        self.threshold_chars = threshold_chars
+        # Shared by every request so total upstream calls stay bounded
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='doc-chunk')
+
+    def should_chunk(self, text):
+        return len(text) > self.threshold_chars
+
+    def analyse_chunks(self, chunks):
+        # Map step - every chunk goes to the model at the same time (up to the pool size)
+        total = len(chunks)
+        futures = [
+            self.executor.submit(self.generate, CHUNK_PROMPT.format(index=i, total=total, chunk=chunk))
+            for i, chunk in enumerate(chunks, start=1)
+        ]
+        return [future.result() for future in futures]
+
+    def condense(self, text):
+        # Reduce step input - merged notes that stand in for the full document
+        chunks = split_into_chunks(text, self.chunk_chars)
+        merged = merge_notes(self.analyse_chunks(chunks))
+
+        lines = [
+            f"[This document is {len(text):,} characters long, so it was reviewed in "
+            f"{len(chunks)} parts. Below are the combined notes from every part - base the "
+            f"analysis on them as if you had read the whole document.]",
+            "",
+            "Document opening:",
+            chunks[0][:1500],
+        ]
+        for heading in NOTE_HEADINGS:
+            lines.append("")
+            lines.append(f"{heading}:")
+            if merged[heading]:
+                lines.extend(f"- {bullet}" for bullet in merged[heading])
+            else:
+                lines.append("- None found")
+        return '\n'.join(lines), len(chunks)
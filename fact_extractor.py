@@ -0,0 +1,236 @@
+# Rule-based fact extraction for documents
+# Dates, notice periods, deadlines, money amounts, percentages, parties and
+# the governing law can all be found with a handful of compiled patterns, in
+# a few milliseconds, before the model is even called. The facts go back to
+# the client straight away and a compact summary of them goes into the
+# analysis prompt, so the model checks them rather than hunting for them.
+# Each fact remembers the clause it's in (the nearest "12.1" style number
+# before it) so the summary can point at it.
+
+import bisect
+import re
+from datetime import date
+
+MONTHS = {name: number for number, names in enumerate((
+    ('january', 'jan'), ('february', 'feb'), ('march', 'mar'), ('april', 'apr'), ('may',), ('june', 'jun'),
+    ('july', 'jul'), ('august', 'aug'), ('september', 'sep', 'sept'), ('october', 'oct'),
+    ('november', 'nov'), ('december', 'dec')), start=1) for name in names}
+MONTH = r'(?:' + '|'.join(sorted(MONTHS, key=len, reverse=True)) + r')\.?'
+
+DATE = re.compile(
+    r'\b(?:'
+    r'(?P<m1>' + MONTH + r')\s+(?P<d1>\d{1,2})(?:st|nd|rd|th)?,?\s+(?P<y1>\d{4})'      # January 5, 2025
+    r'|(?P<d2>\d{1,2})(?:st|nd|rd|th)?\s+(?:day\s+of\s+)?(?P<m2>' + MONTH + r'),?\s+(?P<y2>\d{4})'  # 5th (day of) January 2025
+    r'|(?P<y3>\d{4})-(?P<m3>\d{2})-(?P<d3>\d{2})'                                    # 2025-01-05
+    r'|(?P<m4>\d{1,2})/(?P<d4>\d{1,2})/(?P<y4>\d{4})'                                 # 01/05/2025 (US order)
+    r')\b',
+    re.IGNORECASE
+)
+
+NUMBER_WORDS = {word: value for value, word in enumerate(
+    'zero one two three four five six seven eight nine ten eleven twelve thirteen fourteen fifteen sixteen '
+    'seventeen eighteen nineteen twenty'.split())}
+NUMBER_WORDS.update({'thirty': 30, 'forty': 40, 'forty-five': 45, 'sixty': 60, 'ninety': 90,
+                     'one hundred twenty': 120, 'one hundred eighty': 180})
+COUNT = r'(?:' + '|'.join(sorted(map(re.escape, NUMBER_WORDS), key=len, reverse=True)) + r'|\d{1,4})'
+# "thirty (30) business days", "12 months", "two years"
+PERIOD = re.compile(
+    r'\b(?P<count>' + COUNT + r')(?:\s*\((?P<digits>\d{1,4})\))?[\s-]+'
+    r'(?P<kind>business\s+|calendar\s+|working\s+)?(?P<unit>day|week|month|year)s?\b(?:\'|’)?',
+    re.IGNORECASE
+)
+DEADLINE_CUE = re.compile(r'\b(?:within|no\s+later\s+than|not\s+later\s+than|at\s+least|before|after|prior\s+to'
+                          r'|following|upon|by)\s*$', re.IGNORECASE)
+NOTICE_CUE = re.compile(r'^\W{0,3}(?:\w+\s+){0,3}?(?:prior\s+|advance\s+)?(?:written\s+)?notice', re.IGNORECASE)
+TERM_CUE = re.compile(r'\b(?:term|period|duration|renew\w*)\b[^.;]{0,40}$', re.IGNORECASE)
+
+AMOUNT = re.compile(
+    r'(?:(?P<symbol>[$€£])\s?|\b(?P<code>USD|EUR|GBP|CAD|AUD)\s?)'
+    r'(?P<value>\d{1,3}(?:,\d{3})+(?:\.\d{1,2})?|\d+(?:\.\d{1,2})?)'
+    r'(?:\s?(?P<scale>million|billion|thousand|[mk])\b)?'
+    r'|\b(?P<value2>\d{1,3}(?:,\d{3})+(?:\.\d{1,2})?|\d+(?:\.\d{1,2})?)\s?(?P<scale2>million|billion|thousand)?\s?'
+    r'(?P<word>dollars|euros|pounds)\b',
+    re.IGNORECASE
+)
+CURRENCIES = {'$': 'USD', '€': 'EUR', '£': 'GBP', 'dollars': 'USD', 'euros': 'EUR', 'pounds': 'GBP'}
+SCALES = {'thousand': 1e3, 'k': 1e3, 'million': 1e6, 'm': 1e6, 'billion': 1e9}
+PERCENT = re.compile(r'\b(\d{1,3}(?:\.\d{1,3})?)\s?(?:%|percent\b|per\s+cent\b)', re.IGNORECASE)
+
+# Acme Corp, a Delaware corporation ("Company") / Jane Doe (the "Employee")
+DEFINED_PARTY = re.compile(
+    r'(?P<name>(?:[A-Z][\w&.\'-]*\s+){0,6}?[A-Z][\w&.\'-]*)'
+    r'(?:,\s*(?P<description>an?\s+[^()\n]{3,80}?))?,?\s*'
+    r'\(\s*(?:hereinafter\s+)?(?:referred\s+to\s+as\s+)?(?:the\s+)?["“](?P<role>[A-Z][\w ]{1,30})["”]\s*\)'
+)
+# Fallback - "between Acme Corp and Beta LLC"
+BETWEEN = re.compile(r'\bbetween\s+(?P<a>[A-Z][\w&.\' -]{1,60}?)\s+and\s+(?P<b>[A-Z][\w&.\' -]{1,60}?)(?=[,.;(\n])')
+GOVERNING_LAW = re.compile(
+    r'\bgoverned\s+by[^.;]{0,60}?\blaws?\s+of\s+(?:the\s+)?(?P<place>(?:State|Commonwealth|Province|Republic)\s+of\s+'
+    r'[A-Z][\w]*(?:\s+[A-Z][\w]*)?|[A-Z][\w]*(?:\s+[A-Z][\w]*){0,2})',
+    re.IGNORECASE
+)
+JURISDICTION = re.compile(
+    r'\b(?:exclusive\s+)?jurisdiction\s+of\s+the\s+(?:state\s+|federal\s+)*courts?\s+(?:located\s+)?(?:of|in)\s+'
+    r'(?P<place>[A-Z][\w]*(?:[ ,]+[A-Z][\w]*){0,3})'
+)
+CLAUSE_START = re.compile(r'^[ \t]*(?:(?:Section|SECTION|Article|ARTICLE|Clause|CLAUSE)\s+)?(\d+(?:\.\d+)*)[.):]?[ \t]+\S',
+                          re.MULTILINE)
+SENTENCE_STOP = re.compile(r'[.;\n]')
+# Words that can start a capitalised run but aren't part of a party's name
+NAME_NOISE = re.compile(r'^(?:(?:This|The|By|And|Between|Agreement|Is|Made|Entered|Into|Of)\s+)+')
+MAX_PER_KIND = 50
+
+
+def clause_finder(text):
+    starts, numbers = [], []
+    for match in CLAUSE_START.finditer(text):
+        starts.append(match.start())
+        numbers.append(match.group(1))
+
+    def clause_at(offset):
+        index = bisect.bisect_right(starts, offset) - 1
+        return numbers[index] if index >= 0 else None
+    return clause_at
+
+
+def sentence_around(text, start, end, reach=100):
+    # The part of the sentence around text[start:end], at most `reach`
+    # characters either side
+    window = text[max(0, start - reach):start]
+    cut = max(window.rfind('. '), window.rfind('; '), window.rfind('\n'))
+    before = window[cut + 1:] if cut >= 0 else window
+    stop = SENTENCE_STOP.search(text, end, end + reach)
+    after = text[end:stop.start()] if stop else text[end:end + reach]
+    return ' '.join((before + text[start:end] + after).split())
+
+
+def to_int(count):
+    count = count.lower()
+    return int(count) if count.isdigit() else NUMBER_WORDS.get(count)
+
+
+def iso_date(match):
+    for suffix in '1234':
+        year = match.group('y' + suffix)
+        if year:
+            month = match.group('m' + suffix)
+            month = int(month) if month.isdigit() else MONTHS[month.lower().rstrip('.')]
+            try:
+                return date(int(year), month, int(match.group('d' + suffix))).isoformat()
+            except ValueError:
+                return None
+    return None
+
+
+def amount_value(match):
+    raw = match.group('value') or match.group('value2')
+    scale = (match.group('scale') or match.group('scale2') or '').lower()
+    value = float(raw.replace(',', '')) * SCALES.get(scale, 1)
+    currency = CURRENCIES.get(match.group('symbol') or (match.group('word') or '').lower()) or match.group('code').upper()
+    return round(value, 2), currency
+
+
+def add(facts, seen, kind, key, fact):
+    # First mention of each fact wins; at most MAX_PER_KIND of a kind
+    if key in seen[kind] or len(facts[kind]) >= MAX_PER_KIND:
+        return
+    seen[kind].add(key)
+    facts[kind].append(fact)
+
+
+def extract_facts(text):
+    facts = {kind: [] for kind in ('parties', 'governing_law', 'dates', 'notice_periods', 'deadlines', 'terms',
+                                   'amounts', 'percentages')}
+    if not text:
+        return facts
+    seen = {kind: set() for kind in facts}
+    clause_at = clause_finder(text)
+
+    for match in DATE.finditer(text):
+        iso = iso_date(match)
+        if iso:
+            add(facts, seen, 'dates', iso, {'text': match.group(0), 'date': iso, 'clause': clause_at(match.start())})
+
+    for match in PERIOD.finditer(text):
+        count = to_int(match.group('digits') or match.group('count'))
+        if count is None:
+            continue
+        unit = match.group('unit').lower()
+        kind = (match.group('kind') or '').strip().lower() or None
+        before = text[max(0, match.start() - 60):match.start()]
+        after = text[match.end():match.end() + 40]
+        fact = {'text': match.group(0).strip(" '’"), 'count': count, 'unit': unit, 'day_kind': kind,
+                'clause': clause_at(match.start())}
+        if NOTICE_CUE.match(after):
+            bucket = 'notice_periods'
+        elif DEADLINE_CUE.search(before):
+            bucket = 'deadlines'
+            fact['cue'] = DEADLINE_CUE.search(before).group(0).strip().lower()
+        elif TERM_CUE.search(before):
+            bucket = 'terms'
+        else:
+            continue
+        # Keep the sentence around it - "payable within 30 days of receipt"
+        fact['context'] = sentence_around(text, match.start(), match.end())
+        add(facts, seen, bucket, (count, unit, kind, fact['clause']), fact)
+
+    for match in AMOUNT.finditer(text):
+        value, currency = amount_value(match)
+        add(facts, seen, 'amounts', (value, currency, clause_at(match.start())),
+            {'text': match.group(0).strip(), 'value': value, 'currency': currency, 'clause': clause_at(match.start())})
+
+    for match in PERCENT.finditer(text):
+        add(facts, seen, 'percentages', (match.group(1), clause_at(match.start())),
+            {'text': match.group(0), 'value': float(match.group(1)), 'clause': clause_at(match.start())})
+
+    # Parties are nearly always defined in the opening paragraphs
+    opening = text[:5000]
+    for match in DEFINED_PARTY.finditer(opening):
+        name = NAME_NOISE.sub('', match.group('name')).strip()
+        if name and name.lower() != match.group('role').lower():
+            add(facts, seen, 'parties', name.lower(), {'name': name, 'role': match.group('role'),
+                                                       'description': match.group('description')})
+    if not facts['parties']:
+        match = BETWEEN.search(opening)
+        if match:
+            for name in (match.group('a'), match.group('b')):
+                add(facts, seen, 'parties', name.lower(), {'name': name.strip(), 'role': None, 'description': None})
+
+    for pattern, source in ((GOVERNING_LAW, 'governing law'), (JURISDICTION, 'jurisdiction')):
+        for match in pattern.finditer(text):
+            place = match.group('place').strip()
+            add(facts, seen, 'governing_law', place.lower(), {'place': place, 'source': source,
+                                                              'clause': clause_at(match.start())})
+    return facts
+
+
+def count_facts(facts):
+    return sum(len(found) for found in facts.values())
+
+
+def _where(fact):
+    return f" (cl. {fact['clause']})" if fact.get('clause') else ''
+
+
+def facts_summary(facts, max_items=12):
+    # A few lines for the prompt; None when nothing was found
+    lines = []
+    if facts['parties']:
+        lines.append('- Parties: ' + '; '.join(
+            f"{p['name']}" + (f" (\"{p['role']}\")" if p['role'] else '') for p in facts['parties'][:max_items]))
+    if facts['governing_law']:
+        lines.append('- Governing law / jurisdiction: ' + '; '.join(
+            f"{g['place']} ({g['source']}{', cl. ' + g['clause'] if g['clause'] else ''})"
+            for g in facts['governing_law'][:max_items]))
+    for kind, label in (('notice_periods', 'Notice periods'), ('deadlines', 'Deadlines'), ('terms', 'Terms')):
+        if facts[kind]:
+            # Two periods in one sentence would quote it twice
+            quoted = dict.fromkeys(f"\"{f['context']}\"{_where(f)}" for f in facts[kind][:max_items])
+            lines.append(f'- {label}: ' + '; '.join(quoted))
+    if facts['dates']:
+        lines.append('- Dates: ' + '; '.join(f"{f['date']}{_where(f)}" for f in facts['dates'][:max_items]))
+    if facts['amounts']:
+        lines.append('- Amounts: ' + '; '.join(f"{f['text']}{_where(f)}" for f in facts['amounts'][:max_items]))
+    if facts['percentages']:
+        lines.append('- Percentages: ' + '; '.join(f"{f['text']}{_where(f)}" for f in facts['percentages'][:max_items]))
+    return '\n'.join(lines) or None
@@ -0,0 +1,251 @@
+# Glossary term index
+# Every way of writing a glossary term ("Non-Disclosure Agreement", "NDA",
+# "NDAs", any listed synonyms) goes into one Aho-Corasick automaton, built
+# once at startup. annotate() then finds all of them in an answer in a
+# single pass over the text, so the cost depends on the answer length and
+# not on how many terms the glossary has. The automaton's trie also
+# answers /api/glossary/search: prefix lookup walks down to the prefix, and
+# fuzzy lookup is an edit-distance search over the same trie.
+# load_glossary() reads extra terms from a JSON or CSV file.
+
+import csv
+import json
+import os
+import re
+import time
+from collections import deque
+
+PARENTHESES = re.compile(r'\s*\(([^)]*)\)\s*')
+SPACES = re.compile(r'\s+')
+
+
+def normalise(text):
+    return SPACES.sub(' ', text.strip().lower())
+
+
+def fold(text):
+    # Lowercase without changing the length, so offsets still line up
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return ''.join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+def utf16_offsets(text):
+    # Python index -> UTF-16 index (what JavaScript strings use), or None
+    # when the two are the same
+    if text.isascii() or max(text) < '\U00010000':
+        return None
+    offsets = [0] * (len(text) + 1)
+    position = 0
+    for index, char in enumerate(text):
+        offsets[index] = position
+        position += 2 if char >= '\U00010000' else 1
+    offsets[len(text)] = position
+    return offsets
+
+
+def surface_forms(term_id, entry):
+    # The strings that count as a mention of this term
+    forms = set()
+    term = entry.get('term', '')
+    # "Non-Disclosure Agreement (NDA)" -> "non-disclosure agreement", "nda"
+    for inner in PARENTHESES.findall(term):
+        forms.add(inner)
+    forms.add(PARENTHESES.sub(' ', term))
+    forms.add(term_id.replace('_', ' '))
+    forms.update(entry.get('synonyms', ()))
+    forms = {normalise(form) for form in forms}
+    # Simple plurals - "NDAs", "indemnifications"
+    forms |= {form + 's' for form in forms if form[-1:].isalpha() and not form.endswith('s')}
+    return {form for form in forms if len(form) >= 2}
+
+
+class GlossaryIndex:
+
+    def __init__(self, glossary):
+        started = time.perf_counter()
+        self.glossary = glossary
+        # Trie / automaton nodes: goto edges, failure link, the pattern that
+        # ends here as (form, term_id), and the nearest node down the failure
+        # chain that also ends a pattern
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [None]
+        self.output_link = [0]
+
+        self.forms = 0
+        for term_id, entry in glossary.items():
+            for form in surface_forms(term_id, entry):
+                self._insert(form, term_id)
+        self._link()
+        self.build_seconds = time.perf_counter() - started
+
+    def _insert(self, form, term_id):
+        node = 0
+        for char in form:
+            next_node = self.goto[node].get(char)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto[node][char] = next_node
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(None)
+                self.output_link.append(0)
+            node = next_node
+        if self.output[node] is None:
+            self.output[node] = (form, term_id)
+            self.forms += 1
+
+    def _link(self):
+        # Breadth-first, so every failure link points at a finished node
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and char not in self.goto[state]:
+                    state = self.fail[state]
+                fallback = self.fail[child] = self.goto[state].get(char, 0)
+                self.output_link[child] = fallback if self.output[fallback] is not None else self.output_link[fallback]
+
+    def annotate(self, text, utf16=False):
+        # [{'start', 'end', 'id', 'text'}] - whole words only, longest match
+        # wins where mentions overlap
+        if not text:
+            return []
+        folded = fold(text)
+        goto, fail, output, output_link = self.goto, self.fail, self.output, self.output_link
+        found = []
+        node = 0
+        for index, char in enumerate(folded):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            match = node if output[node] is not None else output_link[node]
+            while match:
+                form, term_id = output[match]
+                start = index + 1 - len(form)
+                end = index + 1
+                if (start == 0 or not folded[start - 1].isalnum()) and (end == len(folded) or not folded[end].isalnum()):
+                    found.append((start, -end, term_id))
+                match = output_link[match]
+
+        found.sort()
+        annotations = []
+        last_end = 0
+        offsets = utf16_offsets(text) if utf16 else None
+        for start, end, term_id in found:
+            end = -end
+            if start < last_end:
+                continue
+            last_end = end
+            annotations.append({
+                'start': offsets[start] if offsets else start,
+                'end': offsets[end] if offsets else end,
+                'id': term_id,
+                'text': text[start:end]
+            })
+        return annotations
+
+    def _collect(self, node, limit, results, seen):
+        # Terms under `node`, shortest forms first
+        queue = deque([node])
+        while queue and len(results) < limit:
+            node = queue.popleft()
+            if self.output[node] is not None:
+                form, term_id = self.output[node]
+                if term_id not in seen:
+                    seen.add(term_id)
+                    results.append(self._result(term_id, form, 'prefix', 0))
+            for char in sorted(self.goto[node]):
+                queue.append(self.goto[node][char])
+
+    def _result(self, term_id, form, match, distance):
+        entry = self.glossary[term_id]
+        return {'id': term_id, 'term': entry.get('term', term_id), 'definition': entry.get('definition', ''),
+                'matched': form, 'match': match, 'distance': distance}
+
+    def search(self, query, limit=10, max_distance=None):
+        query = normalise(query)
+        if not query:
+            return []
+        results = []
+        seen = set()
+
+        node = 0
+        for char in query:
+            node = self.goto[node].get(char)
+            if node is None:
+                break
+        if node is not None:
+            self._collect(node, limit, results, seen)
+
+        if len(results) < limit:
+            if max_distance is None:
+                max_distance = 1 if len(query) <= 5 else 2
+            # Typos are rarely in the first letter, and starting from it
+            # skips most of a big trie - only search everything if that fails
+            fuzzy = self._fuzzy(query, max_distance, first_letters=query[0]) or self._fuzzy(query, max_distance)
+            fuzzy.sort(key=lambda r: (r[0], len(r[1]), r[1]))
+            for distance, form, term_id in fuzzy:
+                if len(results) >= limit:
+                    break
+                if term_id not in seen:
+                    seen.add(term_id)
+                    results.append(self._result(term_id, form, 'fuzzy', distance))
+        return results
+
+    def _fuzzy(self, query, max_distance, first_letters=None):
+        # Levenshtein against every form in the trie, one DP row per trie
+        # node; a branch is dropped as soon as its whole row is over the limit
+        matches = []
+        first_row = list(range(len(query) + 1))
+        stack = [(child, char, first_row) for char, child in self.goto[0].items()
+                 if first_letters is None or char in first_letters]
+        while stack:
+            node, char, previous = stack.pop()
+            row = [previous[0] + 1]
+            for column in range(1, len(query) + 1):
+                cost = 0 if query[column - 1] == char else 1
+                row.append(min(row[column - 1] + 1, previous[column] + 1, previous[column - 1] + cost))
+            if self.output[node] is not None and row[-1] <= max_distance:
+                form, term_id = self.output[node]
+                matches.append((row[-1], form, term_id))
+            if min(row) <= max_distance:
+                for next_char, child in self.goto[node].items():
+                    stack.append((child, next_char, row))
+        return matches
+
+    def snapshot(self):
+        return {'terms': len(self.glossary), 'forms': self.forms, 'nodes': len(self.goto),
+                'build_ms': round(self.build_seconds * 1000, 2)}
+
+
+def load_glossary(path, base=None):
+    # Terms from a JSON file ({id: entry} or [entry with "id"]) or a CSV file
+    # with id,term,definition,example,synonyms columns (synonyms split on |),
+    # added on top of `base`
+    glossary = dict(base or {})
+    if not path:
+        return glossary
+
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            entries = []
+            for row in csv.DictReader(f):
+                row['synonyms'] = [s.strip() for s in (row.get('synonyms') or '').split('|') if s.strip()]
+                entries.append(row)
+    else:
+        with open(path, encoding='utf-8') as f:
+            entries = json.load(f)
+        if isinstance(entries, dict):
+            entries = [dict(entry, id=term_id) for term_id, entry in entries.items()]
+
+    for entry in entries:
+        term_id = (entry.get('id') or '').strip()
+        if not term_id or not entry.get('term') or not entry.get('definition'):
+            raise ValueError(f"{os.path.basename(path)}: every entry needs an id, a term and a definition")
+        glossary[term_id] = {key: value for key, value in entry.items() if key != 'id' and value not in (None, '')}
+    return glossary
@@ -0,0 +1,124 @@
+# Builds the "previous conversation" part of the prompt within a size budget
+# Uploaded documents are referred to by a short digest instead of being
+# pasted again, recent turns are sent in full while they fit, and anything
+# older is squeezed down to a one-line summary. app.py works that out when
+# the message is saved and the store keeps it, so it's done once per message
+# whichever store (or worker) later reads the history back.
+
+import hashlib
+import re
+
+MARKDOWN_NOISE = re.compile(r"[*#`>_]+")
+WHITESPACE = re.compile(r"\s+")
+SENTENCE = re.compile(r"(?<=[.!?])\s+")
+RISK_LEVEL = re.compile(r"RISK ASSESSMENT\W+(?:\w+\W+){0,6}?(Low|Medium|High)\b", re.IGNORECASE)
+
+SUMMARY_CHARS = 240
+DOCUMENT_PREVIEW_CHARS = 300
+
+
+def clean_text(text):
+    return WHITESPACE.sub(' ', MARKDOWN_NOISE.sub('', text)).strip()
+
+
+def document_digest(text):
+    # Stored next to the uploaded document so later prompts can point at it
+    return {
+        'id': hashlib.sha256(text.encode('utf-8')).hexdigest()[:12],
+        'chars': len(text),
+        'preview': clean_text(text[:DOCUMENT_PREVIEW_CHARS * 2])[:DOCUMENT_PREVIEW_CHARS]
+    }
+
+
+def summarise_turn(msg):
+    # One line per old turn - cached on the message (and saved with it by the
+    # store) so it's only done once
+    if msg.summary:
+        return msg.summary
+
+    if msg.is_document:
+        digest = msg.digest or document_digest(msg.content)
+        summary = f"shared document doc:{digest['id']} ({digest['chars']:,} chars)"
+    else:
+        text = clean_text(msg.content)
+        # Skip headings like "CATEGORY TAG: Contract Law" and take the first real sentence
+        sentences = [s for s in SENTENCE.split(text) if len(s) > 40] or [text]
+        summary = sentences[0][:SUMMARY_CHARS]
+        risk = RISK_LEVEL.search(msg.content)
+        if risk:
+            summary += f" (risk: {risk.group(1).title()})"
+
+    msg.summary = summary
+    return summary
+
+
+def render_turn(msg):
+    # Full version of a turn, except documents which are always referenced by digest
+    if msg.is_document:
+        digest = msg.digest or document_digest(msg.content)
+        return (f"[Document doc:{digest['id']}, {digest['chars']:,} characters, analysed in the "
+                f"reply below. Opening: \"{digest['preview']}...\"]")
+    return msg.content
+
+
+def role_label(msg):
+    return "User" if msg.role == 'user' else "Assistant"
+
+
+def raw_size(msg):
+    # Bytes the turn took when it was pasted in full. The SQLite store doesn't
+    # read document bodies back, so those are sized from their digest
+    # (characters, close enough for the savings figure)
+    if msg.is_document and msg.digest and not msg.content:
+        return len(f"{role_label(msg)}: \n".encode('utf-8')) + msg.digest['chars']
+    return len(f"{role_label(msg)}: {msg.content}\n".encode('utf-8'))
+
+
+def build_history_context(conversation_history, budget_chars=6000, recent_turns=6):
+    # Returns (context text, stats) - stats compare against pasting the last
+    # recent_turns messages in full, which is what we used to do
+    stats = {'turns': len(conversation_history), 'full_turns': 0, 'summarised_turns': 0,
+             'sent_bytes': 0, 'raw_bytes': 0, 'saved_bytes': 0}
+    if not conversation_history:
+        return '', stats
+
+    stats['raw_bytes'] = sum(raw_size(msg) for msg in conversation_history[-recent_turns:])
+
+    remaining = budget_chars
+    recent = []
+    older = list(conversation_history[:-recent_turns]) if len(conversation_history) > recent_turns else []
+
+    # Newest first, full text while it fits, otherwise fall back to the summary
+    for msg in reversed(conversation_history[-recent_turns:]):
+        line = f"{role_label(msg)}: {render_turn(msg)}"
+        if len(line) > remaining:
+            line = f"{role_label(msg)} (summary): {summarise_turn(msg)}"
+            if len(line) > remaining:
+                continue
+            stats['summarised_turns'] += 1
+        else:
+            stats['full_turns'] += 1
+        recent.append(line)
+        remaining -= len(line) + 1
+
+    # Whatever budget is left goes to one-liners for older turns, newest first
+    earlier = []
+    for msg in reversed(older):
+        line = f"- {role_label(msg)}: {summarise_turn(msg)}"
+        if len(line) > remaining:
+            break
+        earlier.append(line)
+        remaining -= len(line) + 1
+    stats['summarised_turns'] += len(earlier)
+
+    parts = []
+    if earlier:
+        parts.append("Earlier in the conversation (summarised):")
+        parts.extend(reversed(earlier))
+        parts.append('')
+    parts.extend(reversed(recent))
+    context = '\n'.join(parts) + '\n'
+
+    stats['sent_bytes'] = len(context.encode('utf-8'))
+    stats['saved_bytes'] = stats['raw_bytes'] - stats['sent_bytes']
+    return context, stats
@@ -0,0 +1,250 @@
+# Reference data for LegalEase - disclaimer, templates, glossary and categories
+# Kept out of app.py so other modules (classifier, benchmarks) can use it
+# without starting the Flask app.
+
+LEGAL_DISCLAIMER = """
+IMPORTANT DISCLAIMER
+
+This system (LegalEase) is an AI-powered advisory tool designed to assist with understanding legal documents and compliance requirements.
+
+This system is NOT a substitute for professional legal counsel. The information provided is:
+
+- For educational and informational purposes only
+- Not legal advice or opinion
+- Not a replacement for consultation with qualified legal professionals
+- Provided "as-is" without warranties of any kind
+
+You should always consult with a licensed attorney for:
+
+- Important legal decisions
+- Legal document review and drafting
+- Compliance matters affecting your business
+- Any situation with legal or financial consequences
+
+By using this system, you acknowledge and agree that you will not hold the developers, operators, or any related parties liable for any decisions made based on information provided by this tool.
+"""
+
+# Legal document templates - these are just basic ones, could add more later
+LEGAL_TEMPLATES = {
+    'nda': {
+        'name': 'Non-Disclosure Agreement (NDA)',
+        'category': 'Contracts',
+        'description': 'Template for protecting confidential information',
+        'template': """NON-DISCLOSURE AGREEMENT
+
+This Non-Disclosure Agreement ("Agreement") is entered into on [DATE] between:
+Disclosing Party: [NAME], [ADDRESS]
+Receiving Party: [NAME], [ADDRESS]
+
+1. DEFINITION OF CONFIDENTIAL INFORMATION
+Confidential Information includes, but is not limited to: [SPECIFY SCOPE]
+
+2. OBLIGATIONS
+The Receiving Party agrees to:
+- Maintain confidentiality of all Confidential Information
+- Use Confidential Information solely for [PURPOSE]
+- Not disclose Confidential Information to third parties without prior written consent
+
+3. EXCEPTIONS
+Confidential Information does not include information that:
+- Is publicly known at the time of disclosure
+- Was independently developed without use of Confidential Information
+- Is required to be disclosed by law
+
+4. DURATION
+This Agreement shall remain in effect for [DURATION] years from the date of execution.
+
+5. REMEDIES
+Breach of this Agreement may result in irreparable harm, and the Disclosing Party may seek injunctive relief.
+
+IN WITNESS WHEREOF, the parties have executed this Agreement as of the date first written above.
+
+Disclosing Party: _________________    Receiving Party: _________________
+Date: _______________                 Date: _______________"""
+    },
+    'employment_contract': {
+        'name': 'Employment Contract',
+        'category': 'Employment',
+        'description': 'Standard employment agreement template',
+        'template': """EMPLOYMENT AGREEMENT
+
+This Employment Agreement ("Agreement") is made on [DATE] between:
+Employer: [COMPANY NAME], [ADDRESS]
+Employee: [NAME], [ADDRESS]
+
+1. POSITION AND DUTIES
+Employee agrees to serve as [POSITION] and perform duties as assigned by Employer.
+
+2. COMPENSATION
+- Base Salary: $[AMOUNT] per [PERIOD]
+- Benefits: [SPECIFY BENEFITS]
+- Bonus: [IF APPLICABLE]
+
+3. TERM
+Employment shall commence on [START DATE] and continue until terminated by either party with [NOTICE PERIOD] notice.
+
+4. CONFIDENTIALITY
+Employee agrees to maintain confidentiality of all proprietary information during and after employment.
+
+5. NON-COMPETE
+[IF APPLICABLE: Specify geographic and temporal restrictions]
+
+6. TERMINATION
+Either party may terminate this Agreement with or without cause, subject to notice requirements.
+
+IN WITNESS WHEREOF, the parties have executed this Agreement.
+
+Employer: _________________           Employee: _________________
+Date: _______________                 Date: _______________"""
+    },
+    'privacy_policy': {
+        'name': 'Privacy Policy',
+        'category': 'Compliance',
+        'description': 'Website privacy policy template',
+        'template': """PRIVACY POLICY
+
+Effective Date: [DATE]
+
+[COMPANY NAME] ("we," "our," or "us") respects your privacy. This Privacy Policy explains how we collect, use, and protect your personal information.
+
+1. INFORMATION WE COLLECT
+- Personal Information: Name, email, address, phone number
+- Technical Information: IP address, browser type, device information
+- Usage Data: How you interact with our services
+
+2. HOW WE USE YOUR INFORMATION
+We use collected information to:
+- Provide and improve our services
+- Communicate with you
+- Comply with legal obligations
+- Protect our rights and prevent fraud
+
+3. INFORMATION SHARING
+We do not sell your personal information. We may share information with:
+- Service providers who assist in operations
+- Legal authorities when required by law
+- Business partners with your consent
+
+4. DATA SECURITY
+We implement reasonable security measures to protect your information.
+
+5. YOUR RIGHTS
+You have the right to:
+- Access your personal information
+- Request correction or deletion
+- Opt-out of certain communications
+- File a complaint with relevant authorities
+
+6. COOKIES
+We use cookies to enhance user experience. You can control cookies through your browser settings.
+
+7. CHANGES TO THIS POLICY
+We may update this Privacy Policy. Continued use constitutes acceptance of changes.
+
+Contact Us: [EMAIL] | [ADDRESS]"""
+    },
+    'service_agreement': {
+        'name': 'Service Agreement',
+        'category': 'Contracts',
+        'description': 'Template for service provider agreements',
+        'template': """SERVICE AGREEMENT
+
+This Service Agreement ("Agreement") is entered into on [DATE] between:
+Service Provider: [NAME], [ADDRESS]
+Client: [NAME], [ADDRESS]
+
+1. SERVICES
+Service Provider agrees to provide the following services: [DESCRIBE SERVICES]
+
+2. PAYMENT
+- Service Fee: $[AMOUNT]
+- Payment Terms: [NET 30/UPFRONT/etc.]
+- Late Fees: [IF APPLICABLE]
+
+3. TERM AND TERMINATION
+This Agreement shall commence on [START DATE] and continue until [END DATE] or terminated by either party with [NOTICE] days' notice.
+
+4. INTELLECTUAL PROPERTY
+All work product shall be owned by [SPECIFY OWNERSHIP].
+
+5. WARRANTIES AND DISCLAIMERS
+Service Provider warrants services will be performed in a professional manner. [DISCLAIMERS]
+
+6. LIMITATION OF LIABILITY
+Service Provider's liability is limited to the amount paid for services.
+
+7. GOVERNING LAW
+This Agreement shall be governed by the laws of [JURISDICTION].
+
+IN WITNESS WHEREOF, the parties have executed this Agreement.
+
+Service Provider: _________________    Client: _________________
+Date: _______________                 Date: _______________"""
+    }
+}
+
+# Legal terms dictionary - common terms users might not know
+LEGAL_GLOSSARY = {
+    'nda': {
+        'term': 'Non-Disclosure Agreement (NDA)',
+        'definition': 'A legal contract that creates a confidential relationship between parties to protect sensitive information from being disclosed to third parties.',
+        'example': 'An NDA is commonly used when companies discuss potential business partnerships.'
+    },
+    'consideration': {
+        'term': 'Consideration',
+        'definition': 'Something of value given in exchange for a promise, necessary for a contract to be legally binding.',
+        'example': 'In a sale contract, money is the consideration given in exchange for goods.'
+    },
+    'liability': {
+        'term': 'Liability',
+        'definition': 'Legal responsibility or obligation. A person or entity can be held liable for damages, debts, or legal obligations.',
+        'example': 'If a company breaches a contract, it may face liability for resulting damages.'
+    },
+    'jurisdiction': {
+        'term': 'Jurisdiction',
+        'definition': 'The authority of a court to hear and decide a case, or the geographic area over which a court has authority.',
+        'example': 'A contract may specify that disputes will be resolved in California courts.'
+    },
+    'indemnification': {
+        'term': 'Indemnification',
+        'definition': 'A contractual obligation where one party agrees to compensate another for losses or damages arising from specific circumstances.',
+        'example': 'A service agreement may include indemnification clauses protecting one party from third-party claims.'
+    },
+    'force_majeure': {
+        'term': 'Force Majeure',
+        'definition': 'A clause that excuses a party from performing contractual obligations due to extraordinary circumstances beyond their control (e.g., natural disasters, war).',
+        'example': 'A force majeure clause may excuse performance during a pandemic or natural disaster.'
+    },
+    'arbitration': {
+        'term': 'Arbitration',
+        'definition': 'A method of dispute resolution where parties submit their case to a neutral third party (arbitrator) instead of going to court.',
+        'example': 'Many contracts include arbitration clauses requiring disputes to be resolved through arbitration rather than litigation.'
+    },
+    'intellectual_property': {
+        'term': 'Intellectual Property (IP)',
+        'definition': 'Legal rights protecting creations of the mind, including patents, trademarks, copyrights, and trade secrets.',
+        'example': 'A software company may protect its code through copyright and trade secret laws.'
+    },
+    'statute_of_limitations': {
+        'term': 'Statute of Limitations',
+        'definition': 'A law that sets the maximum time period after an event within which legal proceedings may be initiated.',
+        'example': 'Many states have a 3-year statute of limitations for breach of contract claims.'
+    },
+    'due_diligence': {
+        'term': 'Due Diligence',
+        'definition': 'The investigation or audit of a business or person before signing a contract or agreement.',
+        'example': 'Before acquiring a company, the buyer conducts due diligence to review financial records and legal matters.'
+    }
+}
+
+# Categories for organizing legal stuff
+LEGAL_CATEGORIES = {
+    'contract': {'name': 'Contract Law', 'color': '#2563eb', 'icon': ''},
+    'employment': {'name': 'Employment Law', 'color': '#10b981', 'icon': ''},
+    'intellectual_property': {'name': 'Intellectual Property', 'color': '#8b5cf6', 'icon': ''},
+    'compliance': {'name': 'Compliance', 'color': '#f59e0b', 'icon': ''},
+    'litigation': {'name': 'Litigation', 'color': '#ef4444', 'icon': ''},
+    'corporate': {'name': 'Corporate Law', 'color': '#6366f1', 'icon': ''},
+    'privacy': {'name': 'Privacy & Data', 'color': '#06b6d4', 'icon': ''},
+    'real_estate': {'name': 'Real Estate', 'color': '#ec4899', 'icon': ''}
+}
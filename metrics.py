@@ -0,0 +1,153 @@
+# Prometheus-style metrics without the client library
+# Counters and histograms are updated as requests run; "collected" metrics
+# are read from a function when /metrics is scraped (cache counters, live
+# sessions...) so the numbers those objects already keep aren't duplicated.
+# render() returns the Prometheus text exposition format.
+
+import threading
+
+# Seconds - from a cached lookup up to a long document analysis
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Characters
+SIZE_BUCKETS = (100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 1000000)
+# Conversation turns
+TURN_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128)
+
+
+def format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        return [(self.name, format_labels(self.labels, key), value) for key, value in items]
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self.values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self.lock:
+            items = [(key, list(series)) for key, series in self.values.items()]
+        samples = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                samples.append((self.name + '_bucket',
+                                format_labels(self.labels, key, ('le', format_value(float(bound)))), cumulative))
+            samples.append((self.name + '_sum', format_labels(self.labels, key), round(series[-1], 6)))
+            samples.append((self.name + '_count', format_labels(self.labels, key), cumulative))
+        return samples
+
+
+class Collected:
+    # Values read from `collect()` at scrape time: a number, or a list of
+    # (labels dict, number)
+    def __init__(self, name, help_text, kind, collect):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.collect = collect
+
+    def samples(self):
+        result = self.collect()
+        if result is None:
+            return []
+        if not isinstance(result, list):
+            return [(self.name, '', result)]
+        samples = []
+        for labels, value in result:
+            if value is None:
+                continue
+            names = tuple(labels)
+            samples.append((self.name, format_labels(names, [labels[n] for n in names]), value))
+        return samples
+
+
+class Registry:
+
+    def __init__(self, prefix=''):
+        self.prefix = prefix
+        self.metrics = []
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Counter(self.prefix + name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(self.prefix + name, help_text, labels, buckets))
+
+    def collected(self, name, help_text, kind, collect):
+        return self._add(Collected(self.prefix + name, help_text, kind, collect))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                # One broken collector shouldn't take the whole scrape down
+                lines.append(f"# {metric.name} failed: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{labels} {format_value(value)}")
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,410 @@
+# Model backends - everything in app.py talks to `model.generate_content`
+# and doesn't care which one is behind it.
+#   gemini - the real thing (google-generativeai)
+#   fake   - offline, deterministic answers with configurable latency,
+#            streaming and injected errors, for load tests and benchmarks
+# Pick one with MODEL_BACKEND=gemini|fake.
+# Both also have generate_content_async for the ASGI mode (asgi_app.py).
+# The real backend finds its model lazily (see GeminiBackend), so importing
+# the app never waits on the network.
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+
+from google.api_core import exceptions as api_exceptions
+
+# google.generativeai takes most of a second to import, so only the real
+# backend pays for it (see load_genai)
+genai = None
+
+
+def load_genai():
+    global genai
+    if genai is None:
+        import google.generativeai
+        genai = google.generativeai
+    return genai
+
+
+class GeminiBackend:
+    # Model discovery (list_models + trying each model) costs network round
+    # trips and the client library is slow to import, so none of it runs on
+    # the import path any more:
+    #   background - start discovery in a thread, first model call waits for it
+    #   lazy       - discover on the first model call
+    #   eager      - discover right away (old behaviour)
+    # Whatever gets picked is saved to cache_file and reused for cache_ttl
+    # seconds, so most worker starts skip discovery completely.
+    name = 'gemini'
+
+    def __init__(self, api_key, discovery='background', cache_file='.model_cache.json', cache_ttl=86400):
+        self.api_key = api_key
+        self.model = None
+        self._model_name = None
+        self.cache_file = cache_file
+        self.cache_ttl = cache_ttl
+        self.discovery_seconds = None
+        self.discovery_source = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+        if discovery == 'eager':
+            self._run_discovery()
+        elif discovery == 'background':
+            threading.Thread(target=self._run_discovery, name='model-discovery', daemon=True).start()
+        elif discovery != 'lazy':
+            raise ValueError(f"Unknown MODEL_DISCOVERY: {discovery}")
+
+    def _key_fingerprint(self):
+        # Don't reuse a cached choice made with a different key
+        return hashlib.sha256(self.api_key.encode('utf-8')).hexdigest()[:16]
+
+    def _load_cached_choice(self):
+        if not self.cache_file or not self.api_key:
+            return False
+        try:
+            with open(self.cache_file) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if cached.get('key') != self._key_fingerprint() or time.time() - cached.get('saved_at', 0) > self.cache_ttl:
+            return False
+        try:
+            self.model = genai.GenerativeModel(cached['model_name'])
+        except Exception:
+            return False
+        self._model_name = cached['model_name']
+        self.discovery_source = 'cache'
+        print(f"✓ Using cached model choice: {self._model_name}")
+        return True
+
+    def _save_choice(self):
+        if not self.cache_file or not self.api_key:
+            return
+        try:
+            # Write then rename so another worker never reads half a file
+            tmp_path = f"{self.cache_file}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'model_name': self._model_name, 'key': self._key_fingerprint(),
+                           'saved_at': time.time()}, f)
+            os.replace(tmp_path, self.cache_file)
+        except OSError as e:
+            print(f"Could not save model cache: {e}")
+
+    def _run_discovery(self):
+        with self._lock:
+            if self._ready.is_set():
+                return
+            started = time.perf_counter()
+            try:
+                # Even importing the client library happens here, off the import path
+                load_genai().configure(api_key=self.api_key)
+                if not self._load_cached_choice():
+                    self._discover()
+            finally:
+                self.discovery_seconds = time.perf_counter() - started
+                self._ready.set()
+        # Only remember models the API actually told us about
+        if self.discovery_source == 'list_models':
+            self._save_choice()
+
+    def wait_until_ready(self):
+        # Blocks until we know which model to use
+        if not self._ready.is_set():
+            self._run_discovery()
+        self._ready.wait()
+
+    @property
+    def model_name(self):
+        self.wait_until_ready()
+        return self._model_name
+
+    def discovery_status(self):
+        # Doesn't wait - safe to call from a status endpoint
+        return {
+            'backend': self.name,
+            'ready': self._ready.is_set(),
+            'model_name': self._model_name,
+            'source': self.discovery_source,
+            'discovery_seconds': round(self.discovery_seconds, 3) if self.discovery_seconds is not None else None,
+        }
+
+    def _discover(self):
+        # Initialize the model - find what's actually available
+        # List available models and find one that works
+        if self.api_key:
+            try:
+                print("\nChecking available models...")
+                available_models = genai.list_models()
+                print("Available models with generateContent:")
+                for m in available_models:
+                    if 'generateContent' in m.supported_generation_methods:
+                        print(f"  - {m.name}")
+                        # Extract just the model name (remove 'models/' prefix if present)
+                        model_name = m.name.replace('models/', '')
+                        # Try to use this model
+                        if not self.model:
+                            try:
+                                self.model = genai.GenerativeModel(model_name)
+                                self._model_name = model_name
+                                self.discovery_source = 'list_models'
+                                print(f"\n✓ Successfully initialized: {model_name}\n")
+                            except Exception as e:
+                                print(f"  ✗ Could not use {model_name}: {str(e)[:80]}")
+                                continue
+            except Exception as e:
+                print(f"Could not list models: {e}")
+                print("Trying common model names...")
+
+        # If listing didn't work, try common names
+        if not self.model:
+            model_names_to_try = [
+                'gemini-pro',  # Try the older one first
+                'gemini-1.5-flash',
+                'gemini-1.5-pro',
+            ]
+
+            for model_name in model_names_to_try:
+                try:
+                    self.model = genai.GenerativeModel(model_name)
+                    self._model_name = model_name
+                    self.discovery_source = 'fallback'
+                    print(f"\n✓ Using model: {model_name}\n")
+                    break
+                except Exception as e:
+                    print(f"✗ {model_name} failed: {str(e)[:80]}")
+                    continue
+
+        if not self.model:
+            print("\n" + "=" * 60)
+            print("ERROR: Could not initialize any Gemini model!")
+            print("Please check:")
+            print("  1. Your API key is valid")
+            print("  2. The Generative Language API is enabled in Google Cloud Console")
+            print("  3. Your API key has the correct permissions")
+            print("=" * 60 + "\n")
+            # Set a default - will fail on first use but at least the app starts
+            try:
+                self.model = genai.GenerativeModel('gemini-pro')
+                self._model_name = 'gemini-pro'
+            except Exception:
+                self.model = None
+
+    def __bool__(self):
+        self.wait_until_ready()
+        return self.model is not None
+
+    def generate_content(self, prompt, stream=False):
+        self.wait_until_ready()
+        return self.model.generate_content(prompt, stream=stream)
+
+    async def wait_until_ready_async(self):
+        # Discovery blocks on the network, keep it off the event loop
+        if not self._ready.is_set():
+            await asyncio.to_thread(self.wait_until_ready)
+
+    async def generate_content_async(self, prompt):
+        await self.wait_until_ready_async()
+        return await self.model.generate_content_async(prompt)
+
+
+class FakeResponse:
+    # Looks enough like a genai response (and streamed chunk) for our code
+    def __init__(self, text):
+        self.text = text
+
+
+def parse_latency(spec):
+    # "fixed:0.5", "uniform:0.2,1.5", "normal:1.0,0.3", "lognormal:-0.5,0.6", "exp:0.8"
+    # all in seconds - returns a function rng -> seconds
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',') if v.strip()]
+    kind = kind.strip().lower()
+    if kind == 'fixed':
+        return lambda rng: values[0]
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'normal':
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == 'lognormal':
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    if kind == 'exp':
+        return lambda rng: rng.expovariate(1.0 / values[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+# What injected errors look like - the same exceptions the real client raises
+FAKE_ERROR_TYPES = {
+    'unavailable': lambda: api_exceptions.ServiceUnavailable('fake backend: injected 503'),
+    'quota': lambda: api_exceptions.ResourceExhausted('fake backend: injected quota error'),
+    'timeout': lambda: api_exceptions.DeadlineExceeded('fake backend: injected timeout'),
+    'internal': lambda: api_exceptions.InternalServerError('fake backend: injected 500'),
+    'invalid': lambda: api_exceptions.InvalidArgument('fake backend: injected bad request'),
+}
+
+
+def parse_errors(spec):
+    # "unavailable:0.02,quota:0.01" -> [('unavailable', 0.02), ('quota', 0.01)]
+    errors = []
+    for part in filter(None, (p.strip() for p in spec.split(','))):
+        kind, _, rate = part.partition(':')
+        if kind not in FAKE_ERROR_TYPES:
+            raise ValueError(f"Unknown fake error type: {kind}")
+        errors.append((kind, float(rate)))
+    return errors
+
+
+FAKE_SECTIONS = [
+    ("CATEGORY TAG", "{category}"),
+    ("SIMPLE EXPLANATION", "This is a simulated answer from the offline test backend. The question was "
+                           "{chars} characters long and is treated as a {category} matter."),
+    ("KEY POINTS", "- **Obligations**: Keep information confidential.\n- **Rights**: Terminate with notice.\n"
+                   "- **Deadlines**: Notice within 30 days.\n- **Risks**: Unlimited liability."),
+    ("RISK ASSESSMENT", "{risk} Risk - simulated assessment."),
+    ("LEGAL TERMINOLOGY", "- **Indemnification**: A promise to cover someone else's losses."),
+    ("CITATION FORMAT", "Cal. Civ. Code § 1542"),
+    ("RECOMMENDED NEXT STEPS", "1. Review the agreement.\n2. Consult an attorney."),
+    ("RELATED RESOURCES", "- NDA template"),
+]
+FAKE_CHANGE = re.compile(r'^Change (\d+) - ', re.MULTILINE)
+FAKE_CATEGORIES = ['Contract Law', 'Employment Law', 'Intellectual Property', 'Compliance',
+                   'Litigation', 'Corporate Law', 'Privacy & Data', 'Real Estate']
+
+
+class FakeBackend:
+    # Offline stand-in for load testing: answers are a pure function of the
+    # prompt, latency comes from a seeded distribution
+    name = 'fake'
+
+    def __init__(self, latency='lognormal:-1.0,0.5', first_chunk_fraction=0.2, chunks=8,
+                 errors='', seed=None, answer_chars=2400):
+        self.model_name = 'fake-legal-model'
+        self.latency = parse_latency(latency)
+        self.latency_spec = latency
+        self.first_chunk_fraction = first_chunk_fraction
+        self.chunks = max(1, chunks)
+        self.errors = parse_errors(errors)
+        self.answer_chars = answer_chars
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        # Prompt sizes seen so far, for benchmarks
+        self.stats = {'calls': 0, 'stream_calls': 0, 'errors': 0, 'prompt_chars_total': 0,
+                      'prompt_chars_max': 0}
+        self.prompt_sizes = deque(maxlen=100000)
+
+    @classmethod
+    def from_env(cls):
+        seed = os.environ.get('FAKE_SEED')
+        return cls(
+            latency=os.environ.get('FAKE_LATENCY', 'lognormal:-1.0,0.5'),
+            first_chunk_fraction=float(os.environ.get('FAKE_FIRST_CHUNK_FRACTION', 0.2)),
+            chunks=int(os.environ.get('FAKE_CHUNKS', 8)),
+            errors=os.environ.get('FAKE_ERRORS', ''),
+            seed=int(seed) if seed else None,
+            answer_chars=int(os.environ.get('FAKE_ANSWER_CHARS', 2400)),
+        )
+
+    def __bool__(self):
+        return True
+
+    def discovery_status(self):
+        return {'backend': self.name, 'ready': True, 'model_name': self.model_name,
+                'source': 'fake', 'discovery_seconds': 0.0}
+
+    def _draw(self, prompt, stream):
+        # Record the call and decide latency / injected error under the lock
+        # so a seeded run is reproducible
+        with self.lock:
+            self.stats['calls'] += 1
+            self.stats['stream_calls'] += stream
+            self.stats['prompt_chars_total'] += len(prompt)
+            self.stats['prompt_chars_max'] = max(self.stats['prompt_chars_max'], len(prompt))
+            self.prompt_sizes.append(len(prompt))
+            delay = self.latency(self.rng)
+            error = None
+            for kind, rate in self.errors:
+                if self.rng.random() < rate:
+                    error = kind
+                    self.stats['errors'] += 1
+                    break
+        return delay, error
+
+    def answer_for(self, prompt):
+        digest = hashlib.sha256(prompt.encode('utf-8')).digest()
+        values = {
+            'category': FAKE_CATEGORIES[digest[0] % len(FAKE_CATEGORIES)],
+            'risk': ('Low', 'Medium', 'High')[digest[1] % 3],
+            'chars': len(prompt),
+        }
+        changes = FAKE_CHANGE.findall(prompt)
+        if changes:
+            # /api/compare asks for a JSON array, one entry per changed clause
+            return json.dumps([{'change': int(number), 'risk_level': values['risk'].lower(),
+                                'summary': f"Simulated summary of change {number}.", 'concerns': ''}
+                               for number in changes])
+        text = '\n\n'.join(f"{i}. **{title}**: {body.format(**values)}"
+                           for i, (title, body) in enumerate(FAKE_SECTIONS, start=1))
+        # Pad to a realistic answer length
+        if len(text) < self.answer_chars:
+            filler = f" (ref {digest.hex()[:8]})"
+            text += '\n\n' + (filler * math.ceil((self.answer_chars - len(text)) / len(filler)))
+        return text
+
+    def generate_content(self, prompt, stream=False):
+        delay, error = self._draw(prompt, stream)
+        text = self.answer_for(prompt)
+        if not stream:
+            time.sleep(delay)
+            if error:
+                raise FAKE_ERROR_TYPES[error]()
+            return FakeResponse(text)
+        return self._stream(text, delay, error)
+
+    async def wait_until_ready_async(self):
+        pass
+
+    async def generate_content_async(self, prompt):
+        # Same as generate_content but sleeps without holding a thread
+        delay, error = self._draw(prompt, False)
+        text = self.answer_for(prompt)
+        await asyncio.sleep(delay)
+        if error:
+            raise FAKE_ERROR_TYPES[error]()
+        return FakeResponse(text)
+
+    def _stream(self, text, delay, error):
+        # First chunk after first_chunk_fraction of the total latency, the
+        # rest spread evenly over what's left
+        size = math.ceil(len(text) / self.chunks)
+        pieces = [text[i:i + size] for i in range(0, len(text), size)]
+        time.sleep(delay * self.first_chunk_fraction)
+        if error:
+            raise FAKE_ERROR_TYPES[error]()
+        gap = delay * (1 - self.first_chunk_fraction) / max(1, len(pieces) - 1)
+        for index, piece in enumerate(pieces):
+            if index:
+                time.sleep(gap)
+            yield FakeResponse(piece)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats, latency=self.latency_spec)
+
+
+def create_backend(name, api_key='', **gemini_options):
+    name = (name or 'gemini').lower()
+    if name == 'fake':
+        backend = FakeBackend.from_env()
+        print(f"Using fake model backend (latency={backend.latency_spec})")
+        return backend
+    if name == 'gemini':
+        return GeminiBackend(api_key, **gemini_options)
+    raise ValueError(f"Unknown MODEL_BACKEND: {name}")
@@ -0,0 +1,109 @@
+# Opt-in sampling profiler for slow requests
+# While a request runs, a background thread looks at that request's stack
+# every `interval` seconds. If the request ends up slower than the threshold,
+# the samples are written out in collapsed-stack format ("a;b;c count"),
+# which flamegraph.pl, speedscope and friends read directly. Requests that
+# finish in time just throw their samples away.
+# Turned on with PROFILE_SLOW_MS - with it off none of this runs.
+
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+
+def collapse(frame):
+    # Root-first "file:function" stack for one sample
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SlowRequestProfiler:
+
+    def __init__(self, threshold_ms, interval_ms=5, output_dir='./profiles', max_files=200):
+        self.threshold = threshold_ms / 1000.0
+        self.interval = interval_ms / 1000.0
+        self.output_dir = output_dir
+        self.max_files = max_files
+        self.lock = threading.Lock()
+        # thread id -> Counter of collapsed stacks, for requests in progress
+        self.active = {}
+        self.sampler = None
+        self.stats = {'profiled_requests': 0, 'profiles_written': 0, 'samples': 0}
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _ensure_sampler(self):
+        if self.sampler is None:
+            self.sampler = threading.Thread(target=self._sample_forever, name='slow-request-profiler', daemon=True)
+            self.sampler.start()
+
+    def _sample_forever(self):
+        me = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                if not self.active:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self.active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None and thread_id != me:
+                        stacks[collapse(frame)] += 1
+                        self.stats['samples'] += 1
+
+    def start(self):
+        # Call at the start of a request, on the thread that handles it
+        with self.lock:
+            self._ensure_sampler()
+            self.active[threading.get_ident()] = Counter()
+            self.stats['profiled_requests'] += 1
+        return time.perf_counter()
+
+    def stop(self, started, label):
+        # Call when the request is finished. Returns the file written, if any
+        with self.lock:
+            stacks = self.active.pop(threading.get_ident(), None)
+        elapsed = time.perf_counter() - started
+        if not stacks or elapsed < self.threshold:
+            return None
+        return self._write(stacks, label, elapsed)
+
+    def _write(self, stacks, label, elapsed):
+        safe_label = re.sub(r'[^A-Za-z0-9_.-]+', '_', label).strip('_') or 'request'
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(elapsed * 1000)}ms-{safe_label}-{uuid.uuid4().hex[:6]}.folded"
+        path = os.path.join(self.output_dir, name)
+        try:
+            with open(path, 'w') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            print(f"[profile] could not write {path}: {e}")
+            return None
+        with self.lock:
+            self.stats['profiles_written'] += 1
+        self._prune()
+        print(f"[profile] {label} took {elapsed * 1000:.0f}ms, stacks in {path}")
+        return path
+
+    def _prune(self):
+        # Keep only the newest max_files profiles
+        try:
+            files = sorted(
+                (os.path.join(self.output_dir, name) for name in os.listdir(self.output_dir) if name.endswith('.folded')),
+                key=os.path.getmtime
+            )
+            for path in files[:-self.max_files]:
+                os.remove(path)
+        except OSError:
+            pass
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats, in_progress=len(self.active))
@@ -0,0 +1,186 @@
+# Prompt building
+# Every prompt app.py sends is put together here. The fixed parts - the
+# ~3KB analysis instructions, the citation and category instructions - are
+# module constants, and each prompt is assembled from named sections with a
+# single join instead of growing a string with += (which copied the user's
+# document into a new string at every step). Section sizes are reported as
+# they're built, and a prompt over the limit is refused here with the sizes
+# of its parts, rather than being sent off to fail at the model.
+
+import threading
+
+ANALYSIS_INSTRUCTIONS = """You are LegalEase, an expert legal document analysis and compliance advisory AI assistant. Your role is to help users understand legal documents and compliance requirements in clear, layman-friendly language.
+
+LEGAL EXPERTISE AREAS:
+- Contract Law (NDAs, service agreements, employment contracts)
+- Employment Law (hiring, termination, workplace policies)
+- Intellectual Property (patents, trademarks, copyrights, trade secrets)
+- Corporate Law (business formation, governance, mergers)
+- Privacy & Data Protection (GDPR, CCPA, privacy policies)
+- Compliance (regulatory requirements, industry standards)
+- Real Estate Law (leases, property transactions)
+- Litigation (disputes, settlements, court procedures)
+
+Your responses should be structured and include the following sections when analyzing legal content:
+
+1. **CATEGORY TAG**: Identify the primary legal category (Contract Law, Employment, IP, Compliance, etc.)
+
+2. **SIMPLE EXPLANATION**: Provide a clear, jargon-free explanation of the legal content or question (2-3 paragraphs).
+
+3. **KEY POINTS**:
+   - **Obligations**: What the user must do or comply with
+   - **Rights**: What rights or protections the user has
+   - **Deadlines**: Any time-sensitive requirements or dates mentioned
+   - **Risks**: Potential issues or concerns to be aware of
+
+4. **RISK ASSESSMENT**: Provide a risk score (Low / Medium / High) with a brief justification.
+
+5. **LEGAL TERMINOLOGY**: If complex legal terms are used, provide brief definitions in plain language.
+
+6. **CITATION FORMAT**: If referencing specific laws, statutes, or regulations, format citations appropriately (e.g., "Title 15 U.S.C. § 45" or "Cal. Civ. Code § 1542").
+
+7. **RECOMMENDED NEXT STEPS**: Actionable advice on what the user should consider doing next (2-3 specific recommendations).
+
+8. **RELATED RESOURCES**: Suggest relevant legal resources, templates, or further reading when applicable.
+
+IMPORTANT GUIDELINES:
+- Use simple, accessible language. Avoid legal jargon when possible, or explain it clearly when necessary.
+- Be accurate but conversational. Help users feel informed, not intimidated.
+- Focus on practical implications and actionable insights.
+- If the input is a question rather than document analysis, adapt the format accordingly.
+- Always maintain professional tone while being approachable.
+- Do NOT provide definitive legal advice - frame suggestions as "you may want to consider" or "it would be wise to consult about"
+- When appropriate, reference applicable statutes, regulations, or case law (with proper citations)
+- Identify potential compliance issues and regulatory considerations
+
+Now, analyze the following legal content or question:"""
+HISTORY_HEADER = "\n\nPrevious conversation context:\n"
+FACTS_HEADER = ("\n\nFacts already extracted from the document automatically (check them against the text, "
+                "use them for the Deadlines and Obligations points, and correct any that are wrong):\n")
+INPUT_HEADER = "\n\nUser Input:\n"
+ANALYSIS_CLOSING = "\n\nPlease provide your analysis in the structured format above."
+
+CITATION_INSTRUCTIONS = 'Format the following legal citation in proper Bluebook or standard legal citation format:\n\n"'
+CITATION_CLOSING = """"
+
+Provide:
+1. Formatted citation in proper legal style
+2. Citation type (Case, Statute, Regulation, etc.)
+3. Jurisdiction (if applicable)
+4. Brief explanation of the source
+
+Format your response as JSON with keys: formatted_citation, citation_type, jurisdiction, explanation"""
+
+CATEGORY_INSTRUCTIONS = 'Analyze the following legal text/question and identify the primary legal category:\n\n"'
+CATEGORY_CLOSING = """"
+
+Categories: Contract Law, Employment Law, Intellectual Property, Compliance, Corporate Law, Privacy & Data, Real Estate, Litigation, or Other.
+
+Respond with only the category name and a brief 1-sentence explanation."""
+
+# Input window of the models model_backend.py may pick, in tokens. Anything
+# not listed (and the fake backend) gets the smallest one
+MODEL_INPUT_TOKENS = (
+    ('gemini-1.5-pro', 2097152),
+    ('gemini-1.5-flash', 1048576),
+    ('gemini-2', 1048576),
+    ('gemini-1.0-pro', 30720),
+    ('gemini-pro', 30720),
+)
+DEFAULT_INPUT_TOKENS = 30720
+# Google's rule of thumb for English text
+CHARS_PER_TOKEN = 4
+
+
+def model_char_limit(model_name):
+    for prefix, tokens in MODEL_INPUT_TOKENS:
+        if model_name and model_name.startswith(prefix):
+            return tokens * CHARS_PER_TOKEN
+    return DEFAULT_INPUT_TOKENS * CHARS_PER_TOKEN
+
+
+class PromptTooLarge(Exception):
+    # A prompt over the limit - nothing was sent to the model
+
+    def __init__(self, kind, chars, limit, sections):
+        super().__init__(f"The {kind} prompt would be {chars:,} characters, more than the model accepts "
+                         f"({limit:,}). Try a shorter text or clear the conversation.")
+        self.kind = kind
+        self.chars = chars
+        self.limit = limit
+        self.sections = sections
+
+    def to_dict(self):
+        return {'error': str(self), 'prompt': self.kind, 'prompt_chars': self.chars, 'limit': self.limit,
+                'sections': self.sections}
+
+
+class PromptBuilder:
+
+    def __init__(self, max_chars, on_section=None):
+        # max_chars: a number, or a function returning one (the limit can
+        # depend on which model was picked). on_section(kind, section, chars)
+        # is called for every section of every prompt built
+        self.max_chars = max_chars
+        self.on_section = on_section
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def limit(self):
+        return self.max_chars() if callable(self.max_chars) else self.max_chars
+
+    def _count(self, kind, name):
+        with self.lock:
+            counts = self.stats.setdefault(kind, {'built': 0, 'rejected': 0})
+            counts[name] += 1
+
+    def assemble(self, kind, sections):
+        # sections: [(name, pieces or None)] in prompt order. A name can
+        # appear more than once (e.g. instructions before and after the input)
+        pieces = []
+        sizes = {}
+        for name, parts in sections:
+            if not parts:
+                continue
+            sizes[name] = sizes.get(name, 0) + sum(map(len, parts))
+            pieces.extend(parts)
+        if self.on_section:
+            for name, chars in sizes.items():
+                self.on_section(kind, name, chars)
+        self.check(kind, sum(sizes.values()), sizes)
+        self._count(kind, 'built')
+        return ''.join(pieces)
+
+    def check(self, kind, chars, sections=None):
+        # Also used for prompts built elsewhere (document chunks, clause changes)
+        limit = self.limit()
+        if limit and chars > limit:
+            self._count(kind, 'rejected')
+            raise PromptTooLarge(kind, chars, limit, sections or {})
+
+    def analysis(self, user_input, history_context=None, facts_summary=None):
+        return self.assemble('analysis', [
+            ('instructions', (ANALYSIS_INSTRUCTIONS,)),
+            ('history', (HISTORY_HEADER, history_context) if history_context else None),
+            ('facts', (FACTS_HEADER, facts_summary) if facts_summary else None),
+            ('input', (INPUT_HEADER, user_input)),
+            ('instructions', (ANALYSIS_CLOSING,)),
+        ])
+
+    def citation(self, citation_text):
+        return self.assemble('citation', [
+            ('instructions', (CITATION_INSTRUCTIONS,)),
+            ('input', (citation_text,)),
+            ('instructions', (CITATION_CLOSING,)),
+        ])
+
+    def category(self, text):
+        return self.assemble('category', [
+            ('instructions', (CATEGORY_INSTRUCTIONS,)),
+            ('input', (text,)),
+            ('instructions', (CATEGORY_CLOSING,)),
+        ])
+
+    def snapshot(self):
+        with self.lock:
+            return {'limit': self.limit(), 'prompts': {kind: dict(counts) for kind, counts in self.stats.items()}}
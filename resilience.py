@@ -0,0 +1,350 @@
+# Resilience for model calls: deadlines, retries, hedging and a circuit breaker
+#   deadline - a call (all attempts together) gives up after this many
+#              seconds. The 0.3.1 client has no per-request timeout, so the
+#              call runs on a worker thread and we stop waiting for it. The
+#              thread can't be stopped and carries on until the model answers;
+#              `max_workers` is therefore the real cap on calls to the model,
+#              abandoned ones included (app.py sets it to the admission limit).
+#              An attempt that times out before a worker was free to start it
+#              is cancelled instead.
+#   retries  - transient errors (503, quota, 500, deadline) are retried with
+#              full-jitter exponential backoff, inside the deadline
+#   hedging  - optional: if an attempt is slower than the recent p95, a second
+#              identical request is fired and whichever answers first wins
+#   breaker  - after `failure_threshold` transient failures in a row, calls
+#              fail fast with CircuitOpen for `reset_timeout` seconds, then
+#              one probe call decides whether to close it again. Only errors
+#              from the model count - running out of our own deadline
+#              (CallTimedOut) is retried like one but says nothing about it
+#   streams  - can't be retried or hedged once text has gone out. stream()
+#              reads one on a worker thread and gives up if the first chunk
+#              takes longer than the deadline, or the next one longer than
+#              `stream_idle_timeout`
+# call() is for threads, call_async() for the ASGI event loop.
+
+import asyncio
+import math
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+from google.api_core import exceptions as api_exceptions
+
+TRANSIENT_ERRORS = (
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.ResourceExhausted,
+    api_exceptions.DeadlineExceeded,
+    api_exceptions.InternalServerError,
+)
+
+
+class CallTimedOut(api_exceptions.DeadlineExceeded):
+    # We stopped waiting - the model itself never returned an error
+    pass
+
+
+class CircuitOpen(Exception):
+    # The model has been failing - we're not calling it for a while
+    def __init__(self, retry_after):
+        super().__init__(f"Model temporarily unavailable, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.stats = {'opened': 0, 'rejected': 0}
+
+    def retry_after(self):
+        return max(1, math.ceil(self.opened_at + self.reset_timeout - time.monotonic()))
+
+    def before_call(self):
+        # Raises CircuitOpen unless the call may go ahead. Returns True if the
+        # call is the half-open probe - pass that on to record()
+        if self.failure_threshold <= 0:
+            return False
+        with self.lock:
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+            if self.state == 'closed':
+                return False
+            if self.state == 'half_open' and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            self.stats['rejected'] += 1
+            raise CircuitOpen(self.retry_after())
+
+    def record(self, success, probe=False):
+        # success: True / False, or None when the outcome says nothing about
+        # the model (e.g. our own queue was full). Calls that started before
+        # the breaker opened can finish during the probe - only the probe
+        # itself lets another one through
+        if self.failure_threshold <= 0:
+            return
+        with self.lock:
+            if probe:
+                self.probe_in_flight = False
+            if success is None:
+                return
+            if success:
+                self.failures = 0
+                self.state = 'closed'
+                return
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.stats['opened'] += 1
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats, state=self.state, consecutive_failures=self.failures,
+                        failure_threshold=self.failure_threshold, reset_timeout_seconds=self.reset_timeout)
+
+
+class Resilience:
+
+    def __init__(self, deadline=30.0, retries=2, retry_base=0.5, retry_max=4.0, hedge=False,
+                 hedge_min_delay=0.5, breaker=None, max_workers=64, stream_idle_timeout=None):
+        self.deadline = deadline
+        self.stream_idle_timeout = stream_idle_timeout or deadline
+        self.retries = retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='model-call')
+        self.lock = threading.Lock()
+        # Recent successful attempt times, for the hedging threshold
+        self.latencies = deque(maxlen=200)
+        self.stats = {'calls': 0, 'retries': 0, 'deadline_exceeded': 0, 'hedges': 0, 'hedge_wins': 0,
+                      'failures': 0}
+
+    def _count(self, name, amount=1):
+        with self.lock:
+            self.stats[name] += amount
+
+    def hedge_delay(self):
+        # p95 of recent attempts, once we've seen enough of them
+        if not self.hedge:
+            return None
+        with self.lock:
+            if len(self.latencies) < 20:
+                return None
+            ordered = sorted(self.latencies)
+        return max(self.hedge_min_delay, ordered[int(len(ordered) * 0.95) - 1])
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.retry_max, self.retry_base * (2 ** (attempt - 1))))
+
+    def _outcome(self, error):
+        # How an error counts for the breaker
+        if error is None:
+            return True
+        if isinstance(error, CallTimedOut):
+            return None
+        if isinstance(error, TRANSIENT_ERRORS):
+            return False
+        return None
+
+    def _before_retry(self):
+        try:
+            return self.breaker.before_call()
+        except CircuitOpen:
+            self._count('failures')
+            raise
+
+    def call(self, fn):
+        # fn runs on a worker thread and is left behind if it runs out of
+        # time, so it mustn't hold anything (like an admission slot) that the
+        # caller expects back - take those around call() instead
+        probe = self.breaker.before_call()
+        self._count('calls')
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = self._attempt(fn, deadline - time.monotonic())
+            except Exception as e:
+                self.breaker.record(self._outcome(e), probe)
+                delay = self.backoff(attempt)
+                if (not isinstance(e, TRANSIENT_ERRORS) or attempt > self.retries
+                        or time.monotonic() + delay >= deadline):
+                    self._count('failures')
+                    raise
+                self._count('retries')
+                time.sleep(delay)
+                # A retry needs the breaker's permission too
+                probe = self._before_retry()
+                continue
+            self.breaker.record(True, probe)
+            return result
+
+    def _attempt(self, fn, timeout):
+        started = time.monotonic()
+        first = self.executor.submit(fn)
+        pending = {first}
+        hedge_delay = self.hedge_delay()
+        if hedge_delay is not None and hedge_delay < timeout:
+            done, _ = wait(pending, timeout=hedge_delay)
+            if not done:
+                self._count('hedges')
+                pending.add(self.executor.submit(fn))
+
+        error = None
+        while pending:
+            left = started + timeout - time.monotonic()
+            if left <= 0:
+                break
+            done, pending = wait(pending, timeout=left, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not first:
+                        self._count('hedge_wins')
+                    with self.lock:
+                        self.latencies.append(time.monotonic() - started)
+                    return future.result()
+                error = future.exception()
+        if error is not None and not pending:
+            raise error
+        # Whatever is still running finishes in the background and is ignored;
+        # whatever hasn't started yet never will
+        for future in pending:
+            future.cancel()
+        self._count('deadline_exceeded')
+        raise CallTimedOut(f"model call took longer than {timeout:.1f}s")
+
+    def stream(self, make_iterator):
+        # Yields what make_iterator() yields, read on a worker thread so a
+        # stalled stream can be given up on. The worker stops at its next
+        # chunk once we've stopped reading
+        items = queue.Queue()
+        stopped = threading.Event()
+
+        def read():
+            try:
+                for item in make_iterator():
+                    if stopped.is_set():
+                        return
+                    items.put((True, item))
+                items.put((False, None))
+            except Exception as e:
+                items.put((False, e))
+
+        reader = self.executor.submit(read)
+        timeout, waiting_for = self.deadline, 'first chunk'
+        try:
+            while True:
+                try:
+                    more, item = items.get(timeout=timeout)
+                except queue.Empty:
+                    self._count('deadline_exceeded')
+                    raise CallTimedOut(f"model stream sent no {waiting_for} for {timeout:.1f}s") from None
+                if not more:
+                    if item is not None:
+                        raise item
+                    return
+                yield item
+                timeout, waiting_for = self.stream_idle_timeout, 'chunk'
+        finally:
+            stopped.set()
+            reader.cancel()
+
+    @contextmanager
+    def guard(self):
+        # For calls that can't go through call() (streams): just the breaker
+        probe = self.breaker.before_call()
+        try:
+            yield
+        except Exception as e:
+            self.breaker.record(self._outcome(e), probe)
+            raise
+        except BaseException:
+            # Client went away mid-stream - says nothing about the model
+            self.breaker.record(None, probe)
+            raise
+        self.breaker.record(True, probe)
+
+    async def call_async(self, make_coro):
+        probe = self.breaker.before_call()
+        self._count('calls')
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = await self._attempt_async(make_coro, deadline - time.monotonic())
+            except asyncio.CancelledError:
+                self.breaker.record(None, probe)
+                raise
+            except Exception as e:
+                self.breaker.record(self._outcome(e), probe)
+                delay = self.backoff(attempt)
+                if (not isinstance(e, TRANSIENT_ERRORS) or attempt > self.retries
+                        or time.monotonic() + delay >= deadline):
+                    self._count('failures')
+                    raise
+                self._count('retries')
+                await asyncio.sleep(delay)
+                probe = self._before_retry()
+                continue
+            self.breaker.record(True, probe)
+            return result
+
+    async def _attempt_async(self, make_coro, timeout):
+        started = time.monotonic()
+        first = asyncio.ensure_future(make_coro())
+        pending = {first}
+        try:
+            hedge_delay = self.hedge_delay()
+            if hedge_delay is not None and hedge_delay < timeout:
+                done, _ = await asyncio.wait(pending, timeout=hedge_delay)
+                if not done:
+                    self._count('hedges')
+                    pending.add(asyncio.ensure_future(make_coro()))
+
+            error = None
+            while pending:
+                left = started + timeout - time.monotonic()
+                if left <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=left, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self._count('hedge_wins')
+                        with self.lock:
+                            self.latencies.append(time.monotonic() - started)
+                        return task.result()
+                    error = task.exception()
+            if error is not None and not pending:
+                raise error
+            self._count('deadline_exceeded')
+            raise CallTimedOut(f"model call took longer than {timeout:.1f}s")
+        finally:
+            # Unlike threads, the losers can actually be stopped
+            for task in pending:
+                task.cancel()
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats, deadline_seconds=self.deadline, max_retries=self.retries,
+                         hedging=self.hedge, recent_samples=len(self.latencies))
+        stats['stream_idle_timeout_seconds'] = self.stream_idle_timeout
+        stats['hedge_after_seconds'] = self.hedge_delay()
+        stats['breaker'] = self.breaker.snapshot()
+        return stats
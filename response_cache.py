@@ -0,0 +1,149 @@
+# Small content-addressed cache for model answers
+# Keys are a hash of (kind, model name, normalised input) so the same
+# citation or category question asked by different users hits the same
+# entry. In memory it's an LRU with a TTL and a size cap; optionally every
+# entry is also written to SQLite so the cache survives restarts.
+# Expired entries stay around until they're evicted, so get_stale() can
+# still hand out an old answer while the model is down - also after a
+# restart: SQLite rows are only deleted at startup once they're
+# stale_ttl_seconds past expiry, and otherwise only by the size cap in set().
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalise(text):
+    # Whitespace differences shouldn't cause a miss. Case stays - in a
+    # citation it's meaningful (party names, reporter abbreviations)
+    return ' '.join(text.split())
+
+
+def make_key(kind, model_name, text):
+    raw = f"{kind}\x00{model_name or ''}\x00{normalise(text)}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+
+    def __init__(self, max_entries=1000, ttl_seconds=86400, max_bytes=16 * 1024 * 1024, db_path=None,
+                 stale_ttl_seconds=7 * 86400):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stale_ttl_seconds = stale_ttl_seconds
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # key -> (expires_at, serialised value)
+        self.entries = OrderedDict()
+        self.bytes_held = 0
+        self.stats = {'hits': 0, 'misses': 0, 'disk_hits': 0, 'sets': 0,
+                      'evictions': 0, 'expirations': 0, 'stale_hits': 0}
+
+        self.db = None
+        if db_path:
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS response_cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            self.db.execute('DELETE FROM response_cache WHERE expires_at < ?',
+                            (time.time() - stale_ttl_seconds,))
+            self.db.commit()
+
+    def get(self, key):
+        # Returns the cached value or None
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, raw = entry
+                if expires_at >= now:
+                    self.entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return json.loads(raw)
+                self.stats['expirations'] += 1
+
+            if self.db is not None:
+                row = self.db.execute(
+                    'SELECT value, expires_at FROM response_cache WHERE key = ?', (key,)
+                ).fetchone()
+                if row and row[1] >= now:
+                    # Warm the memory copy so the next hit skips SQLite
+                    self._store(key, row[0], row[1])
+                    self.stats['hits'] += 1
+                    self.stats['disk_hits'] += 1
+                    return json.loads(row[0])
+
+            self.stats['misses'] += 1
+            return None
+
+    def get_stale(self, key):
+        # Like get(), but expired entries count too - only for when the
+        # model can't give us a fresh answer
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None and self.db is not None:
+                row = self.db.execute(
+                    'SELECT expires_at, value FROM response_cache WHERE key = ?', (key,)
+                ).fetchone()
+                entry = tuple(row) if row else None
+            if entry is None:
+                return None
+            self.stats['stale_hits'] += 1
+            return json.loads(entry[1])
+
+    def set(self, key, value):
+        raw = json.dumps(value)
+        expires_at = time.time() + self.ttl_seconds
+        with self.lock:
+            self._store(key, raw, expires_at)
+            self.stats['sets'] += 1
+            if self.db is not None:
+                self.db.execute(
+                    'INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)',
+                    (key, raw, expires_at)
+                )
+                # Keep the table from growing forever too
+                self.db.execute(
+                    'DELETE FROM response_cache WHERE key IN (SELECT key FROM response_cache '
+                    'ORDER BY expires_at DESC LIMIT -1 OFFSET ?)', (self.max_entries * 10,)
+                )
+                self.db.commit()
+
+    def _store(self, key, raw, expires_at):
+        # Caller holds the lock
+        if key in self.entries:
+            self._drop(key)
+        self.entries[key] = (expires_at, raw)
+        self.bytes_held += len(raw)
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes_held > self.max_bytes):
+            oldest = next(iter(self.entries))
+            self._drop(oldest)
+            self.stats['evictions'] += 1
+
+    def _drop(self, key):
+        _, raw = self.entries.pop(key)
+        self.bytes_held -= len(raw)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes_held = 0
+            if self.db is not None:
+                self.db.execute('DELETE FROM response_cache')
+                self.db.commit()
+
+    def snapshot(self):
+        with self.lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return dict(
+                self.stats,
+                entries=len(self.entries),
+                bytes=self.bytes_held,
+                hit_rate=round(self.stats['hits'] / lookups, 4) if lookups else None,
+                persistent=self.db is not None
+            )
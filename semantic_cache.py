@@ -0,0 +1,262 @@
+# Near-duplicate question cache for /api/chat
+# "what does an NDA cover" and "What is covered by an NDA?" should get the
+# same answer, but an exact-match cache sees two different keys. Here each
+# question becomes its set of words - lowercased, simple suffixes dropped, and
+# without the words that only carry grammar (articles, "is"/"does", "by",
+# fillers like "exactly"). Question words, modals, pronouns and "not" all
+# stay. A MinHash signature of the set goes into an LSH index: banded
+# signature hashes, so a lookup only looks at the handful of questions that
+# share a band instead of every entry. Candidates are then checked with the
+# exact Jaccard similarity of the word sets, and a hit needs the same model,
+# the same numbers ("30 days" is not "60 days"), similarity >= threshold, and
+# no sign of the parties being swapped:
+#   "can my landlord sue me" / "can I sue my landlord" use the same words for
+#   opposite questions. The words both questions share must come in the same
+#   order - unless exactly one of them is passive ("what is covered by an
+#   NDA" / "what does an NDA cover"), where they must not. So "can I be sued
+#   by my landlord" doesn't match "can I sue my landlord" either.
+# Only for stateless questions - app.py decides that. Reuses are kept in an
+# audit log; one can be flagged as a false reuse, which also drops the entry.
+
+import itertools
+import random
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+
+WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+# Only words that never change what is asked - pronouns, modals, question
+# words and negation all stay. "by" marks a passive question, which is
+# noted before it's dropped
+STOP_WORDS = frozenset("""a an the please is are was were be been being am do does did by
+    exactly actually really basically just""".split())
+# Tried in order, longest first - enough to make "covers"/"covered"/"covering" agree
+SUFFIXES = ('ing', 'ed', 'es', 's')
+PRIME = (1 << 61) - 1
+
+
+def stem(word):
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokens(text):
+    # (distinct words in order, whether the question is passive)
+    # "what's" -> "what", "landlord's" -> "landlord"
+    words = [word[:-2] if word.endswith("'s") else word for word in WORD.findall(text.casefold())]
+    kept = [stem(word) for word in words if word not in STOP_WORDS]
+    return tuple(dict.fromkeys(kept)), 'by' in words
+
+
+def same_order(a, b):
+    # Do the words a and b share come in the same order in both?
+    shared = set(a) & set(b)
+    return [word for word in a if word in shared] == [word for word in b if word in shared]
+
+
+def swapped(words, passive, entry):
+    # Reordered shared words mean swapped parties, unless one question is
+    # passive and the other isn't - then it's the other way round
+    return same_order(words, entry.words) == (passive != entry.passive)
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class Entry:
+    __slots__ = ('id', 'model', 'question', 'words', 'passive', 'numbers', 'answer', 'expires_at', 'hits')
+
+    def __init__(self, id, model, question, words, passive, numbers, answer, expires_at):
+        self.id = id
+        self.model = model
+        self.question = question
+        # In question order - the set is only built for the few candidates checked
+        self.words = words
+        self.passive = passive
+        self.numbers = numbers
+        self.answer = answer
+        self.expires_at = expires_at
+        self.hits = 0
+
+
+class SemanticCache:
+
+    def __init__(self, max_entries=10000, ttl_seconds=86400, threshold=0.8, permutations=30, band_rows=3,
+                 min_words=2, max_bucket=32, audit_size=200, seed=1):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.band_rows = band_rows
+        self.bands = permutations // band_rows
+        self.min_words = min_words
+        self.max_bucket = max_bucket
+        rng = random.Random(seed)
+        # h(x) = (a*x + b) mod p, one per signature slot
+        self.hashes = [(rng.randrange(1, PRIME), rng.randrange(0, PRIME)) for _ in range(permutations)]
+        self.lock = threading.Lock()
+        # id -> Entry, least recently used first
+        self.entries = OrderedDict()
+        # band hash -> entry id, or [entry id...] once a second one shares
+        # it (at most max_bucket, newest kept). Most bands are only ever
+        # hit once, and a bare int is far smaller than a list
+        self.buckets = {}
+        self.ids = itertools.count(1)
+        # Recent reuses, newest last, for /api/semantic-cache/audit
+        self.audit = deque(maxlen=audit_size)
+        self.reuse_ids = itertools.count(1)
+        self.stats = {'hits': 0, 'misses': 0, 'skipped': 0, 'sets': 0, 'evictions': 0, 'expirations': 0,
+                      'candidates_checked': 0, 'false_reuses': 0, 'audited': 0, 'audit_mismatches': 0}
+
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _signature(self, words):
+        values = [zlib.crc32(word.encode('utf-8')) for word in words]
+        return [min((a * value + b) % PRIME for value in values) for a, b in self.hashes]
+
+    def _band_keys(self, model, signature):
+        rows = self.band_rows
+        return [hash((model, band, tuple(signature[band * rows:(band + 1) * rows])))
+                for band in range(self.bands)]
+
+    def _band_ids(self, key):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            return ()
+        return bucket if type(bucket) is list else (bucket,)
+
+    def _remove(self, entry):
+        # Caller holds the lock. Band keys aren't kept per entry (ten more ints
+        # each), so work them out again
+        self.entries.pop(entry.id, None)
+        for key in self._band_keys(entry.model, self._signature(entry.words)):
+            bucket = self.buckets.get(key)
+            if bucket == entry.id:
+                del self.buckets[key]
+            elif type(bucket) is list and entry.id in bucket:
+                bucket.remove(entry.id)
+                if len(bucket) == 1:
+                    self.buckets[key] = bucket[0]
+
+    def get(self, question, model):
+        # (answer, reuse record) for a close enough earlier question, else None
+        words, passive = tokens(question)
+        if len(words) < self.min_words:
+            with self.lock:
+                self.stats['skipped'] += 1
+            return None
+        band_keys = self._band_keys(model, self._signature(words))
+        numbers = frozenset(word for word in words if word.isdigit())
+        word_set = frozenset(words)
+        now = time.time()
+        with self.lock:
+            best, best_score = None, 0.0
+            seen = set()
+            for key in band_keys:
+                for entry_id in self._band_ids(key):
+                    if entry_id in seen:
+                        continue
+                    seen.add(entry_id)
+                    entry = self.entries.get(entry_id)
+                    if entry is None or entry.numbers != numbers:
+                        continue
+                    score = jaccard(word_set, frozenset(entry.words))
+                    if score > best_score and not swapped(words, passive, entry):
+                        best, best_score = entry, score
+            self.stats['candidates_checked'] += len(seen)
+            if best is not None and best.expires_at < now:
+                self._remove(best)
+                self.stats['expirations'] += 1
+                best = None
+            if best is None or best_score < self.threshold:
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(best.id)
+            best.hits += 1
+            self.stats['hits'] += 1
+            reuse = {'reuse_id': next(self.reuse_ids), 'entry_id': best.id, 'question': question,
+                     'matched_question': best.question, 'similarity': round(best_score, 3),
+                     'time': now, 'flagged': None}
+            self.audit.append(reuse)
+            return best.answer, dict(reuse)
+
+    def set(self, question, model, answer):
+        words, passive = tokens(question)
+        if len(words) < self.min_words or not self.enabled():
+            return
+        band_keys = self._band_keys(model, self._signature(words))
+        numbers = frozenset(word for word in words if word.isdigit())
+        with self.lock:
+            entry = Entry(next(self.ids), model, question, words, passive, numbers, answer,
+                          time.time() + self.ttl_seconds)
+            self.entries[entry.id] = entry
+            buckets = self.buckets
+            for key in band_keys:
+                bucket = buckets.get(key)
+                if bucket is None:
+                    buckets[key] = entry.id
+                elif type(bucket) is list:
+                    bucket.append(entry.id)
+                    if len(bucket) > self.max_bucket:
+                        # A crowded band - the oldest ids just stop being found through it
+                        del bucket[0]
+                else:
+                    buckets[key] = [bucket, entry.id]
+            self.stats['sets'] += 1
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries.values())))
+                self.stats['evictions'] += 1
+
+    def flag(self, reuse_id, reason='reported'):
+        # Mark a reuse as wrong; the entry it came from won't be handed out again
+        with self.lock:
+            for reuse in self.audit:
+                if reuse['reuse_id'] == reuse_id:
+                    break
+            else:
+                return None
+            if not reuse['flagged']:
+                reuse['flagged'] = reason
+                self.stats['false_reuses'] += 1
+                entry = self.entries.get(reuse['entry_id'])
+                if entry is not None:
+                    self._remove(entry)
+            return dict(reuse)
+
+    def record_audit(self, reuse_id, matched):
+        # Result of re-asking the model for a reused answer in the background
+        with self.lock:
+            self.stats['audited'] += 1
+            if not matched:
+                self.stats['audit_mismatches'] += 1
+        if not matched:
+            self.flag(reuse_id, reason='audit')
+
+    def recent(self, limit=50, flagged_only=False):
+        with self.lock:
+            reuses = [dict(r) for r in self.audit if r['flagged'] or not flagged_only]
+        return reuses[-limit:][::-1]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.buckets.clear()
+
+    def snapshot(self):
+        with self.lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return dict(
+                self.stats,
+                entries=len(self.entries),
+                buckets=len(self.buckets),
+                threshold=self.threshold,
+                hit_rate=round(self.stats['hits'] / lookups, 4) if lookups else None,
+                false_reuse_rate=round(self.stats['false_reuses'] / self.stats['hits'], 4) if self.stats['hits'] else None
+            )
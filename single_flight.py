@@ -0,0 +1,103 @@
+# Single-flight for model calls
+# If the same prompt is already being sent to the model, later callers wait
+# for that call and get its answer (or its error) instead of sending their
+# own. Nothing is kept once the call finishes - that's the response cache's
+# job - so there's no staleness, just fewer duplicate calls during a spike.
+# do() is for threads (Flask), do_async() for the ASGI mode's event loop.
+
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.tasks = {}
+        self.stats = {'requests': 0, 'upstream_calls': 0, 'collapsed': 0, 'shared_errors': 0}
+
+    def do(self, key, fn):
+        # Run fn() unless a call for `key` is already running, then wait for that one
+        with self.lock:
+            self.stats['requests'] += 1
+            call = self.calls.get(key) if self.enabled else None
+            leader = call is None
+            if leader:
+                self.stats['upstream_calls'] += 1
+                call = _Call()
+                if self.enabled:
+                    self.calls[key] = call
+            else:
+                self.stats['collapsed'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                with self.lock:
+                    self.stats['shared_errors'] += 1
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                if self.calls.get(key) is call:
+                    del self.calls[key]
+            call.done.set()
+
+    async def do_async(self, key, make_coro):
+        # Same for coroutines. The upstream call runs as its own task, so one
+        # caller disconnecting doesn't cancel it for everyone else
+        with self.lock:
+            self.stats['requests'] += 1
+            task = self.tasks.get(key) if self.enabled else None
+            leader = task is None
+            if leader:
+                self.stats['upstream_calls'] += 1
+                task = asyncio.ensure_future(make_coro())
+                if self.enabled:
+                    self.tasks[key] = task
+                    task.add_done_callback(lambda _, key=key, task=task: self._forget(key, task))
+            else:
+                self.stats['collapsed'] += 1
+
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            if not leader:
+                with self.lock:
+                    self.stats['shared_errors'] += 1
+            raise
+
+    def _forget(self, key, task):
+        with self.lock:
+            if self.tasks.get(key) is task:
+                del self.tasks[key]
+
+    def snapshot(self):
+        with self.lock:
+            requests = self.stats['requests']
+            return dict(
+                self.stats,
+                enabled=self.enabled,
+                in_flight=len(self.calls) + len(self.tasks),
+                collapse_rate=round(self.stats['collapsed'] / requests, 4) if requests else 0.0
+            )
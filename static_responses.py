@@ -0,0 +1,113 @@
+# Precomputed responses for the reference-data endpoints
+# Templates, glossary, categories and the disclaimer never change while the
+# server runs, so each body is serialized (and gzipped) once at startup and
+# given a strong ETag. A request then costs a dict lookup: a 304 when the
+# client already has that version, otherwise the stored bytes.
+# Framework-free - respond() returns (status, body, headers).
+
+import gzip
+import hashlib
+import threading
+
+
+def parse_etags(header):
+    # If-None-Match: '"a", W/"b"' -> {'"a"', '"b"'} (weak comparison, RFC 9110)
+    tags = set()
+    for part in header.split(','):
+        part = part.strip()
+        if part.startswith('W/'):
+            part = part[2:]
+        if part:
+            tags.add(part)
+    return tags
+
+
+def accepts_gzip(header):
+    # True unless gzip is missing from Accept-Encoding or has q=0
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        if coding.strip().lower() not in ('gzip', '*'):
+            continue
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+class StaticResponse:
+    __slots__ = ('body', 'etag', 'gzipped', 'gzip_etag')
+
+    def __init__(self, body, min_gzip_bytes=256):
+        self.body = body
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        # Each encoding is its own representation, so it gets its own ETag
+        self.gzipped = None
+        self.gzip_etag = None
+        if len(body) >= min_gzip_bytes:
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.gzipped = compressed
+                self.gzip_etag = f'"{digest}-gzip"'
+
+
+class StaticResponses:
+
+    def __init__(self, max_age=3600, content_type='application/json'):
+        self.max_age = max_age
+        self.content_type = content_type
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.stats = {'served': 0, 'served_gzip': 0, 'not_modified': 0}
+
+    def add(self, name, body):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.entries[name] = StaticResponse(body)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def respond(self, name, if_none_match='', accept_encoding=''):
+        # None if there's no such response
+        entry = self.entries.get(name)
+        if entry is None:
+            return None
+
+        use_gzip = entry.gzipped is not None and accepts_gzip(accept_encoding or '')
+        etag = entry.gzip_etag if use_gzip else entry.etag
+        headers = {
+            'ETag': etag,
+            'Cache-Control': f'public, max-age={self.max_age}',
+            'Vary': 'Accept-Encoding',
+        }
+
+        if if_none_match:
+            tags = parse_etags(if_none_match)
+            if '*' in tags or entry.etag in tags or (entry.gzip_etag and entry.gzip_etag in tags):
+                with self.lock:
+                    self.stats['not_modified'] += 1
+                return 304, b'', headers
+
+        headers['Content-Type'] = self.content_type
+        with self.lock:
+            self.stats['served'] += 1
+            if use_gzip:
+                self.stats['served_gzip'] += 1
+        if use_gzip:
+            headers['Content-Encoding'] = 'gzip'
+            return 200, entry.gzipped, headers
+        return 200, entry.body, headers
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats['responses'] = len(self.entries)
+        stats['bytes'] = sum(len(e.body) for e in self.entries.values())
+        stats['gzip_bytes'] = sum(len(e.gzipped or e.body) for e in self.entries.values())
+        stats['max_age_seconds'] = self.max_age
+        return stats
@@ -0,0 +1,154 @@
+# Template filling for LEGAL_TEMPLATES
+# Each template is split once, at startup, into literal text and [PLACEHOLDER]
+# slots, so filling a row is one join over precomputed pieces - the template
+# text is never scanned again. Fields are named after the placeholder
+# ("[START DATE]" -> START_DATE); when a placeholder appears more than once
+# the later ones get their own field (NAME, NAME_2...), since e.g. the two
+# [NAME]s in the NDA are different parties. Anything in square brackets is a
+# placeholder; a hint after ":" or a list of choices after "/" isn't part of
+# the name ("[NET 30/UPFRONT/etc.]" -> NET_30, "[IF APPLICABLE: Specify ...]"
+# -> IF_APPLICABLE).
+# zip_stream() writes a zip archive a file at a time, for streaming responses.
+
+import re
+import struct
+import time
+import zlib
+
+PLACEHOLDER = re.compile(r'\[([^\]]+)\]')
+HINT = re.compile(r'[:/]')
+REPEAT_SUFFIX = re.compile(r'_\d+$')
+# Placeholders that may be left out - filled with a default instead
+OPTIONAL_FIELDS = {'IF_APPLICABLE': 'Not applicable'}
+
+
+def field_name(label):
+    # "start date" / "Start-Date" / "START_DATE" -> "START_DATE"
+    return re.sub(r'[\s\-]+', '_', label.strip()).upper()
+
+
+def placeholder_name(text):
+    # "IF APPLICABLE: Specify ..." -> "IF_APPLICABLE"
+    return field_name(HINT.split(text, 1)[0])
+
+
+def normalise_row(row):
+    # CSV headers / JSON keys in any case -> field names, empty cells dropped
+    values = {}
+    for key, value in row.items():
+        if key is None or value is None:
+            continue
+        value = str(value).strip()
+        if value:
+            values[field_name(key)] = value
+    return values
+
+
+class CompiledTemplate:
+
+    def __init__(self, template_id, text):
+        self.id = template_id
+        # literals[0] slot[0] literals[1] slot[1] ... literals[-1]
+        self.literals = []
+        self.slots = []
+        seen = {}
+        position = 0
+        for match in PLACEHOLDER.finditer(text):
+            self.literals.append(text[position:match.start()])
+            base = placeholder_name(match.group(1))
+            seen[base] = seen.get(base, 0) + 1
+            self.slots.append(base if seen[base] == 1 else f"{base}_{seen[base]}")
+            position = match.end()
+        self.literals.append(text[position:])
+        # Field order as they first appear
+        self.fields = list(dict.fromkeys(self.slots))
+        # NAME_2 is optional if NAME is
+        self.optional = {}
+        for field in self.fields:
+            default = OPTIONAL_FIELDS.get(REPEAT_SUFFIX.sub('', field))
+            if default is not None:
+                self.optional[field] = default
+        self.required = [field for field in self.fields if field not in self.optional]
+
+    def missing(self, values):
+        return [field for field in self.required if field not in values]
+
+    def render(self, values):
+        # values must already hold every required field (see missing())
+        optional = self.optional
+        parts = [self.literals[0]]
+        for field, literal in zip(self.slots, self.literals[1:]):
+            value = values.get(field)
+            parts.append(value if value is not None else optional[field])
+            parts.append(literal)
+        return ''.join(parts)
+
+    def describe(self):
+        return {'fields': self.fields, 'required': self.required, 'optional': sorted(self.optional)}
+
+
+class TemplateEngine:
+
+    def __init__(self, templates):
+        self.templates = {template_id: CompiledTemplate(template_id, info['template'])
+                          for template_id, info in templates.items()}
+
+    def get(self, template_id):
+        return self.templates.get(template_id)
+
+
+def _dos_time(when):
+    t = time.localtime(when)
+    return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+            ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+
+def zip_stream(files, compresslevel=6):
+    # files: iterable of (name, text). Yields a zip archive one file at a
+    # time. zipfile keeps a ZipInfo object per file (~1KB); here only the
+    # packed central directory record is kept (~70 bytes per file), so
+    # 100k documents don't add up to a hundred megabytes
+    mod_time, mod_date = _dos_time(time.time())
+    directory = bytearray()
+    offset = 0
+    count = 0
+    for name, text in files:
+        name = name.encode('utf-8')
+        data = text.encode('utf-8')
+        compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+        crc = zlib.crc32(data)
+        if offset > 0xFFFFFFFF or len(data) > 0xFFFFFFFF:
+            raise ValueError("zip_stream doesn't do archives over 4GB")
+        header = struct.pack('<IHHHHHIIIHH', 0x04034b50, 20, 0x0800, 8, mod_time, mod_date,
+                             crc, len(compressed), len(data), len(name), 0)
+        directory += struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, 0x0314, 20, 0x0800, 8, mod_time, mod_date,
+                                 crc, len(compressed), len(data), len(name), 0, 0, 0, 0, 0o644 << 16, offset)
+        directory += name
+        yield header + name + compressed
+        offset += len(header) + len(name) + len(compressed)
+        count += 1
+
+    end = bytes(directory)
+    if count > 0xFFFF or offset > 0xFFFFFFFF:
+        # Zip64 end records - only needed for the file count in practice
+        zip64_at = offset + len(directory)
+        end += struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, 45, 45, 0, 0, count, count, len(directory), offset)
+        end += struct.pack('<IIQI', 0x07064b50, 0, zip64_at, 1)
+    end += struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                       len(directory), min(offset, 0xFFFFFFFF), 0)
+    yield end
+
+
+def in_pieces(chunks, size=65536):
+    # Joins small byte chunks into ~size pieces - one response write per
+    # piece instead of one per document
+    buffered, held = [], 0
+    for chunk in chunks:
+        buffered.append(chunk)
+        held += len(chunk)
+        if held >= size:
+            yield b''.join(buffered)
+            buffered, held = [], 0
+    if buffered:
+        yield b''.join(buffered)